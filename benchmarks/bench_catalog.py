@@ -0,0 +1,121 @@
+"""
+======================
+Metadata Catalog Timer
+======================
+
+Times a selective characteristic query (one species and one bond) on a
+synthetic investigation of simulated RDF assays, answered three ways:
+by loading the metadata file and building a CharacteristicIndex, by
+opening an existing SQLite catalog, and by a query on an open catalog.
+The time to build the catalog is shown as well.
+
+Run from the repository root, optionally giving the numbers of assays:
+
+    python benchmarks/bench_catalog.py [10000 100000]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.utils import load_metadata
+from vis.isa_index import CharacteristicIndex
+from vis.catalog import build_catalog, open_catalog
+
+# Default numbers of assays.
+ASSAY_COUNTS = [10000, 100000]
+
+# The benchmarked query.
+CRITERIA = {
+    'Aluminate Species': ['species 7'],
+    'Inter-atom distances': ['Al-Ob'],
+}
+
+
+def _characteristic(term_source, value):
+    """ISA-JSON characteristic category of an assay."""
+    return dict(characteristicType=dict(
+        termSource=term_source, annotationValue=value))
+
+
+def write_investigation(directory, n_assays):
+    """
+    Write a metadata.json of n_assays RDF assays, each with one data file,
+    over 50 species. Returns its path.
+    """
+    assays = [
+        dict(
+            measurementType=dict(annotationValue='Simulated RDF'),
+            characteristicCategories=[
+                _characteristic('Aluminate Species',
+                                'species {}'.format(idx % 50)),
+                _characteristic('Simulated Data', 'Simulated RDF'),
+                _characteristic('Inter-atom distances', 'Al-Ob'),
+                _characteristic('Inter-atom distances', 'Al-Oh'),
+            ],
+            dataFiles=[dict(name='run_{}.RDF'.format(idx),
+                            type='Maxime-RDF')],
+        )
+        for idx in range(n_assays)
+    ]
+    metadata = dict(studies=[dict(
+        identifier='synthetic',
+        publications=[dict(doi='10.0000/synthetic')],
+        assays=assays,
+    )])
+    metadata_path = os.path.join(directory, 'metadata.json')
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f)
+    return metadata_path
+
+
+def timed(func):
+    """Return the wall clock time of func() and its result."""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or ASSAY_COUNTS
+    for n_assays in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            metadata_path = write_investigation(directory, n_assays)
+            database_path = os.path.join(directory, 'catalog.sqlite')
+
+            def index_query():
+                index = CharacteristicIndex(load_metadata(metadata_path))
+                return index.data_files(index.query(CRITERIA))
+
+            def catalog_query():
+                catalog = open_catalog(
+                    metadata_path, database_path=database_path)
+                files = catalog.data_files(catalog.query(CRITERIA))
+                catalog.close()
+                return files
+
+            index_time, expected = timed(index_query)
+            build_time, _ = timed(
+                lambda: build_catalog(metadata_path, database_path))
+            open_time, found = timed(catalog_query)
+            catalog = open_catalog(metadata_path, database_path=database_path)
+            query_time, _ = timed(
+                lambda: catalog.data_files(catalog.query(CRITERIA)))
+            catalog.close()
+            assert found == expected
+
+        print('{} assays, {} matches'.format(n_assays, len(expected)))
+        print('    {:<30} {:>8.3f} s'.format(
+            'load JSON and index', index_time))
+        print('    {:<30} {:>8.3f} s'.format('build catalog', build_time))
+        print('    {:<30} {:>8.3f} s'.format(
+            'open catalog and query', open_time))
+        print('    {:<30} {:>8.3f} s'.format('query open catalog', query_time))
+
+
+if __name__ == '__main__':
+    main()
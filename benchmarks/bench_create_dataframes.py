@@ -0,0 +1,87 @@
+"""
+===========================
+create_dataframes Benchmark
+===========================
+
+Times vis_helper.create_dataframes on a synthetic investigation of
+csv files, serially (one worker) and with the default thread pool, for
+an increasing number of files.
+
+Run from the repository root:
+
+    python benchmarks/bench_create_dataframes.py
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.vis_helper import create_dataframes
+
+# Number of files in each synthetic investigation.
+FILE_COUNTS = [10, 50, 200]
+# Rows in each synthetic csv file.
+ROWS_PER_FILE = 20000
+
+
+def write_investigation(directory, n_files, n_rows):
+    """
+    Write n_files random csv files shaped like the Sipos tables and a
+    metadata.json listing them. Returns the path to the metadata file.
+    """
+    rng = np.random.RandomState(0)
+    data_files = []
+    for idx in range(n_files):
+        path = os.path.join(directory, 'table_{}.csv'.format(idx))
+        pd.DataFrame(dict(
+            Al_concentration=rng.uniform(0, 6, n_rows),
+            OH_concentration=rng.uniform(0, 20, n_rows),
+            Al_ppm=rng.uniform(60, 82, n_rows),
+            counter_ion=rng.choice(['Na+', 'K+', 'Li+', 'Cs+'], n_rows),
+            temperature=rng.choice([25, 50, 75], n_rows),
+        )).to_csv(path, index=False)
+        data_files.append(dict(name=path, type='Plot-csv-extract'))
+
+    metadata = dict(studies=[dict(
+        publications=[dict(doi='10.0000/synthetic')],
+        assays=[dict(dataFiles=data_files)],
+    )])
+    metadata_path = os.path.join(directory, 'metadata.json')
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f)
+    return metadata_path
+
+
+def best_time(func, repeat=3):
+    """Return the best wall clock time of func() over repeat runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print('{:>6} {:>12} {:>12} {:>8}'.format(
+        'files', 'serial (s)', 'pooled (s)', 'speedup'))
+    for n_files in FILE_COUNTS:
+        with tempfile.TemporaryDirectory() as directory:
+            metadata_path = write_investigation(
+                directory, n_files, ROWS_PER_FILE)
+            serial = best_time(
+                lambda: create_dataframes(metadata_path, max_workers=1))
+            pooled = best_time(
+                lambda: create_dataframes(metadata_path))
+        print('{:>6} {:>12.3f} {:>12.3f} {:>8.2f}'.format(
+            n_files, serial, pooled, serial / pooled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+=======================
+Dataframe Memory Report
+=======================
+
+Reports the memory footprint of a large synthetic aluminate table before
+and after vis_helper.optimize_dtypes, column by column. The
+concentrations, which are only used to select and bin points, are opted
+in to float32 within the decimals they are recorded with.
+
+Run from the repository root:
+
+    python benchmarks/bench_dtypes.py [n_rows]
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.vis_helper import optimize_dtypes
+
+DOIS = [
+    '10.1016/j.talanta.2006.02.008',
+    'http://collections.mun.ca/cdm/compoundobject/'
+    'collection/theses2/id/222115/rec/6',
+]
+
+# Columns allowed to become float32 within their recorded decimals.
+FLOAT_DECIMALS = dict(Al_concentration=3, OH_concentration=2)
+
+
+def synthetic_table(n_rows):
+    """
+    Build a table shaped like the output of create_dataframes with
+    optimize=False: float64 measurements and object string columns.
+    """
+    rng = np.random.RandomState(0)
+    al_ppm = rng.uniform(60, 82, n_rows).round(2)
+    wavelength = rng.uniform(500, 720, n_rows).round(1)
+    # NMR rows have no Raman peak and the other way around.
+    is_nmr = rng.rand(n_rows) < 0.5
+    al_ppm[~is_nmr] = np.nan
+    wavelength[is_nmr] = np.nan
+    return pd.DataFrame(dict(
+        Al_concentration=rng.uniform(0, 6, n_rows).round(3),
+        OH_concentration=rng.uniform(0, 20, n_rows).round(2),
+        Al_ppm=al_ppm,
+        wavelength=wavelength,
+        temperature=rng.choice([25.0, 50.0, 75.0], n_rows),
+        counter_ion=rng.choice(
+            ['Na+', 'K+', 'Li+', 'Cs+'], n_rows).astype(object),
+        doi=rng.choice(DOIS, n_rows).astype(object),
+    ))
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    before = synthetic_table(n_rows)
+    after = optimize_dtypes(before, float_decimals=FLOAT_DECIMALS)
+
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+
+    print('{} rows'.format(n_rows))
+    print('{:<18} {:>10} {:>10} {:>10} {:>10}'.format(
+        'column', 'dtype', 'MB', 'new dtype', 'new MB'))
+    for column in before.columns:
+        print('{:<18} {:>10} {:>10.2f} {:>10} {:>10.2f}'.format(
+            column,
+            str(before[column].dtype), before_usage[column] / 1e6,
+            str(after[column].dtype), after_usage[column] / 1e6))
+    print('{:<18} {:>10} {:>10.2f} {:>10} {:>10.2f}'.format(
+        'total', '', before_usage.sum() / 1e6, '', after_usage.sum() / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+==========================
+Fixed Width File Benchmark
+==========================
+
+Times utils.read_fixed_width against the previous create_pandas_df
+(pandas read_csv with a whitespace regex) on synthetic PWS-like files
+of increasing size, written in the Fortran E-notation of the real ones.
+
+Run from the repository root, optionally giving the file sizes in MB:
+
+    python benchmarks/bench_fixed_width.py [50 200 400]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.utils import read_fixed_width
+
+# Default file sizes, in MB.
+FILE_SIZES = [50, 200, 400]
+# Columns of the synthetic files, as in the el.PWS files.
+COLUMNS = ['wavenb', 'Al', 'Ob', 'Oh', 'Ho']
+# Rows written at a time.
+WRITE_CHUNK = 100000
+
+
+def write_pws(path, size_mb):
+    """Write a PWS-like file of about size_mb megabytes."""
+    rng = np.random.RandomState(0)
+    line = '    {:.4f}' + '       {:.9E}' * (len(COLUMNS) - 1) + '\n'
+    bytes_per_row = len(line.format(*([0.0] * len(COLUMNS))))
+    n_rows = int(size_mb * 1e6 / bytes_per_row)
+
+    with open(path, 'w') as f:
+        f.write('#   ' + '       '.join(COLUMNS) + '\n')
+        for start in range(0, n_rows, WRITE_CHUNK):
+            n = min(WRITE_CHUNK, n_rows - start)
+            values = rng.uniform(0, 1e-3, (n, len(COLUMNS)))
+            values[:, 0] = (start + np.arange(n)) * 0.5626
+            np.savetxt(
+                f, values, fmt=['    %.4f'] + ['       %.9E'] *
+                (len(COLUMNS) - 1), delimiter='')
+    return n_rows
+
+
+def regex_read(path):
+    """The previous create_pandas_df."""
+    df = pd.read_csv(
+        filepath_or_buffer=path,
+        index_col=False,
+        sep=r'\s+'
+    )
+    df_mod = df[df.columns[:-1]]
+    df_mod.columns = df.columns[1:]
+    return df_mod
+
+
+def timed(func, path):
+    """Return the wall clock time of func(path) and its result."""
+    start = time.perf_counter()
+    result = func(path)
+    return time.perf_counter() - start, result
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or FILE_SIZES
+    print('{:>8} {:>10} {:>12} {:>12} {:>8}'.format(
+        'MB', 'rows', 'regex (s)', 'numpy (s)', 'speedup'))
+    for size_mb in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.PWS')
+            n_rows = write_pws(path, size_mb)
+            regex_time, old = timed(regex_read, path)
+            numpy_time, (columns, values) = timed(read_fixed_width, path)
+            assert list(old.columns) == columns
+            assert np.allclose(old.values, values)
+        print('{:>8.0f} {:>10} {:>12.3f} {:>12.3f} {:>8.2f}'.format(
+            size_mb, n_rows, regex_time, numpy_time, regex_time / numpy_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+=============================
+ISA Metadata Generation Timer
+=============================
+
+Times generateISA.build_investigation and the serialization modes of
+serialize_metadata/write_metadata on synthetic manifests of simulated
+RDF files, one assay per file, as a large simulation campaign would
+produce.
+
+Run from the repository root, optionally giving the numbers of data
+files (requires isatools, and orjson for the orjson rows):
+
+    python benchmarks/bench_generate_isa.py [10000 100000]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from isa.generateISA import (
+    SIMULATED_RDF, build_investigation, write_metadata)
+
+# Default numbers of data files.
+FILE_COUNTS = [10000, 100000]
+
+
+def synthetic_manifest(n_files):
+    """Manifest of n_files RDF files, each in an assay of its own."""
+    return [
+        ('run_{}.RDF'.format(idx), 'Maxime-RDF', 'maxime_rdf_study',
+         'run_{}'.format(idx), 'rdf',
+         [('Aluminate Species', 'species {}'.format(idx % 50)),
+          SIMULATED_RDF,
+          ('Inter-atom distances', 'Al-Ob'),
+          ('Inter-atom distances', 'Al-Oh')])
+        for idx in range(n_files)
+    ]
+
+
+def timed(func):
+    """Return the wall clock time of func() and its result."""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or FILE_COUNTS
+    have_orjson = importlib.util.find_spec('orjson') is not None
+
+    for n_files in counts:
+        manifest = synthetic_manifest(n_files)
+        build_time, investigation = timed(
+            lambda: build_investigation('data', manifest=manifest))
+        print('{} data files, build {:.2f} s'.format(n_files, build_time))
+
+        modes = [
+            ('indented', dict()),
+            ('compact', dict(compact=True)),
+        ]
+        if have_orjson:
+            modes.append(('orjson compact', dict(compact=True,
+                                                 use_orjson=True)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label, options in modes:
+                for suffix in ('.json', '.json.gz'):
+                    path = os.path.join(directory, 'metadata' + suffix)
+                    seconds, _ = timed(
+                        lambda: write_metadata(investigation, path,
+                                               **options))
+                    print('    {:<16} {:<9} {:>8.2f} s {:>10.1f} MB'.format(
+                        label, suffix, seconds, os.path.getsize(path) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+==========================
+Crossfilter Update Payload
+==========================
+
+Compares the data sent to the browser for each widget change of the
+vis/al_crossfit.py application, on a synthetic aluminate table:
+
+    rebuild     a new figure and source holding the x, y and size
+                columns, as when every change rebuilt the figure,
+    in place    only the columns of the shared source that change, x and
+                y for an axis change and size for a size change.
+
+The columns are encoded as Bokeh sends them, numpy arrays as base64
+buffers and lists as JSON lists, and the size of the JSON message and
+the time to encode it are reported. The attributes of the new figure,
+axes and glyph models of a rebuild come on top of its columns and are
+not counted, so its payload is a lower bound.
+
+Run from the repository root:
+
+    python benchmarks/bench_source_updates.py [n_rows]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import numpy as np
+import pandas as pd
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.vis_helper import build_code_cache, palette_lookup
+
+# Sizes of the points, as in vis/al_crossfit.py.
+SIZES = list(range(6, 22, 3))
+
+# Repeats of each encoding, the best time is kept.
+REPEATS = 5
+
+
+def synthetic_table(n_rows):
+    """Build a table with the columns plotted by al_crossfit."""
+    rng = np.random.RandomState(0)
+    return pd.DataFrame(dict(
+        Al_concentration=rng.uniform(0, 6, n_rows),
+        OH_concentration=rng.uniform(0, 20, n_rows),
+        Al_ppm=rng.uniform(60, 82, n_rows),
+    ))
+
+
+def encode_column(values):
+    """Encode a column the way Bokeh serializes source data."""
+    if isinstance(values, np.ndarray):
+        return dict(
+            __ndarray__=base64.b64encode(values.tobytes()).decode('ascii'),
+            dtype=values.dtype.name, shape=list(values.shape))
+    return values
+
+
+def message_size(columns):
+    """
+    Return the size in bytes of the JSON message of the given columns and
+    the best time to encode it.
+    """
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        message = json.dumps(
+            {name: encode_column(values) for name, values in columns.items()})
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(message), best
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = synthetic_table(n_rows)
+    codes = build_code_cache(data, [], ['Al_concentration'], len(SIZES))
+    x = data['OH_concentration'].values
+    y = data['Al_ppm'].values
+    # The rebuilt figures computed the sizes as a list.
+    size_list = [SIZES[code] for code in codes['Al_concentration']]
+    size = palette_lookup(codes['Al_concentration'], SIZES)
+
+    events = [
+        ('axis change',
+         dict(x=x, y=y, size=size_list), dict(x=x, y=y)),
+        ('size change',
+         dict(x=x, y=y, size=size_list), dict(size=size)),
+    ]
+
+    print('{} rows'.format(n_rows))
+    print('{:<14} {:>12} {:>10} {:>12} {:>10}'.format(
+        'event', 'rebuild kB', 'ms', 'in place kB', 'ms'))
+    for name, rebuilt, in_place in events:
+        rebuilt_size, rebuilt_time = message_size(rebuilt)
+        in_place_size, in_place_time = message_size(in_place)
+        print('{:<14} {:>12.1f} {:>10.2f} {:>12.1f} {:>10.2f}'.format(
+            name, rebuilt_size / 1e3, rebuilt_time * 1e3,
+            in_place_size / 1e3, in_place_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
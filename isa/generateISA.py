@@ -2,14 +2,49 @@
 ===========
 ISA Backend
 ===========
+
+The investigation is described by tables rather than by hand built ISA
+objects: the publications, the kinds of assays, the studies, and a
+manifest listing every data file with its study, assay and assay
+characteristics. build_investigation() turns these tables into the ISA
+model in one pass, creating every ontology source and annotation once,
+and serialize_metadata() writes it out, optionally compact, with the
+orjson encoder and gzipped.
+
+Large investigations (e.g. tens of thousands of simulation outputs) are
+described by a manifest csv file with the MANIFEST_COLUMNS, see
+read_manifest().
+
+Every DataFile records the size, modification time and content hash of
+its file as comments (see isa.hashes). With --incremental the hashes
+recorded in the previous metadata file are passed to
+build_investigation() and reused for the files that did not change, so
+only new and modified files are read. This is a cache of the hashes
+only: the whole investigation is still built and written again (isa.scan
+and isa.hashes update an existing metadata file in place). Run from the
+repository root, as a module or as a script:
+
+    python -m isa.generateISA metadata.json --incremental
+    python isa/generateISA.py metadata.json --incremental
 """
 
 from isatools.model.v1 import *
 from isatools.isajson import ISAJSONEncoder
+import argparse
+import collections
+import csv
+import gzip
 import json
 import logging
 import os
 import sys
+# Add the parent path so that the script can import the `vis` and `isa`
+# packages when it is not run as a module.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.utils import load_metadata, file_fingerprint, recorded_fingerprints
+from isa.hashes import FINGERPRINT_COMMENTS
 
 
 class extractedCSV(DataFile):
@@ -58,181 +93,90 @@ class MaximeVib(DataFile):
         self.label = "Maxime Vibrational Spectrum"
 
 
-def create_metadata(data_path):
-    """
-    Returns an ISA-JSON object.
-
-    :return:
-    """
-
-    def join_path(filename):
-        file_path = os.path.join(data_path, filename)
-        return file_path
-
-    """
-    Ontology Sources
-    """
-    amnt_conc = OntologySource(name='Amount Concentration')
-    # aluminum = OntologySource(name='Aluminum')
-    # hydroxide = OntologySource(name='Hydroxide')
-    nmr = OntologySource(name='Nuclear Magnetic Resonance')
-    raman = OntologySource(name='Raman Spectroscopy')
-    simulation = OntologySource(name="Simulated Data")
-    aluminate = OntologySource(name="Aluminate Species")
-    inter_atom_distance = OntologySource(name="Inter-atom distances")
-
-    """
-    Ontology Annotations
-    """
-    ppm = OntologyAnnotation(term='ppm', term_source=nmr)
-    Al_nmr = OntologyAnnotation(term='27 Al NMR', term_source=nmr)
-    molarity = OntologyAnnotation(term='Molarity', term_source=amnt_conc)
-    raman_peak = OntologyAnnotation(term='cm-1', term_source=raman)
-    raman_spectra = OntologyAnnotation(term='raman spectra', term_source=raman)
-    simulated_rdf = OntologyAnnotation(term='Simulated RDF', term_source=simulation)
-
-    angstrom_interatom = OntologyAnnotation(
-        term='Angstroms',
-        term_source=inter_atom_distance,
-    )
-
-    aluminate_dimer_1 = OntologyAnnotation(
-        term='(OH)3Al-O-Al(OH)32-+ 180 H2O + 2 Na+',
-        term_source=aluminate)
-    aluminate_dimer_2 = OntologyAnnotation(
-        term='(OH)3Al-(OH)-Al(OH)3- + 179 H2O + HO- + 2 Na+',
-        term_source=aluminate)
-    aluminate_dimer_3 = OntologyAnnotation(
-        term='(OH)3Al-(OH)2 -Al(OH)3- + 179 H2O + 2 Na+',
-        term_source=aluminate)
-    aluminate_dimer_4 = OntologyAnnotation(
-        term='(OH)2Al-O2-Al(OH)2- + 181 H2O + 2 Na+',
-        term_source=aluminate)
-
-    simulated_vibrational_spectra = OntologyAnnotation(
-        term='Simulated vibrational spectrum',
-        term_source=simulation)
-
-    Al_Ob_distance = OntologyAnnotation(
-        term='Al-Ob',
-        term_source=inter_atom_distance)
-
-    Al_Oh_distance = OntologyAnnotation(
-        term='Al-Oh',
-        term_source=inter_atom_distance)
-
-
-    """
-    Sipos 2006 Publication.
-    """
-    sipos_2006_pub = Publication(
+# The publications of the studies, by key.
+PUBLICATIONS = {
+    'sipos_2006': dict(
         title=(
             '$^{27}\\text{Al}$ NMR and Raman spectroscopic studies of '
             'alkaline aluminate solutions with extremely high caustic '
             'content - Does the octahedral species $\\text{Al(OH)}_6^{-3}$ '
             'exist in solution?'),
-        doi="10.1016/j.talanta.2006.02.008"
-    )
-
-    sipos2006_nmr_assay = Assay(
-        measurement_type=ppm,
-        technology_type=Al_nmr,
+        doi="10.1016/j.talanta.2006.02.008",
+    ),
+    'zhou_thesis': dict(
+        title=(
+            'Raman studies on the aluminate and carbonate '
+            'anions in aqueous solutions.'),
+        doi=(
+            'http://collections.mun.ca/cdm/compoundobject/'
+            'collection/theses2/id/222115/rec/6'),
+    ),
+}
+
+# The kinds of assays. Annotations are (ontology source, term) pairs.
+NMR = ('Nuclear Magnetic Resonance', 'ppm')
+MOLARITY = ('Amount Concentration', 'Molarity')
+RAMAN_PEAK = ('Raman Spectroscopy', 'cm-1')
+RAMAN_SPECTRA = ('Raman Spectroscopy', 'raman spectra')
+SIMULATED_RDF = ('Simulated Data', 'Simulated RDF')
+ANGSTROMS = ('Inter-atom distances', 'Angstroms')
+
+ASSAY_TYPES = {
+    'nmr': dict(
+        measurement_type=NMR,
+        technology_type=('Nuclear Magnetic Resonance', '27 Al NMR'),
         technology_platform='Bruker',
-        units=[ppm, molarity],
-        data_files=[
-            extractedCSV(filename=join_path('sipos2006-fig2.csv')),
-            extractedCSV(filename=join_path('sipos_2006_table1_nmr.csv')),
-            extractedCSV(filename=join_path('sipos_2006_table2.csv')),
-            extractedCSV(filename=join_path('sipos_2006_fig3.csv')),
-        ]
-    )
-
-    sipos2006_raman_assay = Assay(
-        measurement_type=raman_peak,
-        technology_type=raman_spectra,
+        units=[NMR, MOLARITY],
+    ),
+    'raman': dict(
+        measurement_type=RAMAN_PEAK,
+        technology_type=RAMAN_SPECTRA,
         technology_platform='Unknown',
-        units=[raman_peak, molarity],
-        data_files=[
-            extractedCSV(filename=join_path('sipos_2006_figure_1.csv')),
-            extractedCSV(filename=join_path('sipos_2006_table1_raman.csv')),
-        ]
-    )
+        units=[RAMAN_PEAK, MOLARITY],
+    ),
+    'rdf': dict(
+        measurement_type=SIMULATED_RDF,
+        technology_type=SIMULATED_RDF,
+        technology_platform='To be filled out.',
+        units=[ANGSTROMS],
+    ),
+}
 
-    sipos2006_raman_study = Study(
+# The studies, in the order of the investigation.
+STUDIES = [
+    dict(
         identifier='raman',
         title='Raman Studies',
         description='Peaks from Raman Spectra',
-        publications=[sipos_2006_pub],
-        assays=[sipos2006_raman_assay],
-    )
-
-    sipos2006_nmr_study = Study(
+        publications=['sipos_2006'],
+    ),
+    dict(
         identifier='1d_nmr',
         title='1D NMR Studies',
         description='One dimensional NMR studies',
-        publications=[sipos_2006_pub],
-        assays=[sipos2006_nmr_assay]
-    )
-
-
-
-    """Zhou Publication"""
-    zhou_thesis = Publication(
-        title=(
-            'Raman studies on the aluminate and carbonate '
-            'anions in aqueous solutions.'),
-        doi=(
-            'http://collections.mun.ca/cdm/compoundobject/'
-            'collection/theses2/id/222115/rec/6')
-    )
-
-    zhou_raman_assay = Assay(
-        measurement_type=raman_peak,
-        technology_type=raman_spectra,
-        technology_platform='Unknown',
-        units=[raman_peak, molarity],
-        data_files=[
-            extractedCSV(filename=join_path('zhou_thesis.csv'))
-        ]
-    )
-
-    zhou_raman_study = Study(
+        publications=['sipos_2006'],
+    ),
+    dict(
         identifier='Raman',
         title='Zhou Raman studies',
         description='Peaks from Raman Spectra',
-        publications=[zhou_thesis],
-        assays=[zhou_raman_assay]
-
-    )
-
-    #######################
-    ## MAXIME
-    #######################
-
-
-    maxime_vib_assay = Assay(
-        measurement_type=raman_peak,
-        technology_type=raman_spectra,
-        technology_platform='Unknown',
-        units=[raman_peak, molarity],
-        data_files=[
-            MaximeVib(filename=join_path('d1.AlO.PWS')),
-            MaximeVib(filename=join_path('d1.el.PWS')),
-
-            MaximeVib(filename=join_path('d2.AlO.PWS')),
-            MaximeVib(filename=join_path('d2.el.PWS')),
-
-            MaximeVib(filename=join_path('d3.AlO.PWS')),
-            MaximeVib(filename=join_path('d3.el.PWS')),
-
-            MaximeVib(filename=join_path('d4.AlO.PWS')),
-            MaximeVib(filename=join_path('d4.el.PWS')),
-
-        ]
-    )
-
-
-    maxime_vibrational_dimer_study = Study(
+        publications=['zhou_thesis'],
+    ),
+    dict(
+        identifier="maxime_rdf_study",
+        title="Explore various aluminate dimers.",
+        description=(
+            "RDFs are obtained from the atomic positions. "
+            "1st column: r (distance with respect to the 1st"
+            " atom of the pair type) in angstroms."
+            " The following columns are the RDFs for different "
+            "pair types (i.e. 'Al-O') mentioned in the header, "
+            "and finally the columns correspond to the running "
+            "coordination numbers for these same pair types."
+        ),
+        publications=[],
+    ),
+    dict(
         identifier="maxime_vibrational_dimer_study",
         title="Explore various aluminate dimers.",
         description=(
@@ -245,132 +189,298 @@ def create_metadata(data_path):
             "the frequencies corresponding to the most intense bands as you will "
             "very likely find those in the IR and/or Raman spectra."
         ),
-        assays=[maxime_vib_assay]
-    )
-
-    ## MAXIME RDF ASSAYS
-    maxime_d1_rdf_assay = Assay(
-        measurement_type=simulated_rdf,
-        technology_type=simulated_rdf,
-        technology_platform='To be filled out.',
-        units=[angstrom_interatom],
-        characteristic_categories=[
-            aluminate_dimer_1,
-            simulated_rdf,
-            Al_Ob_distance,
-            Al_Oh_distance,
-        ],
-        data_files=[
-            MaximeRDF(filename=join_path('d1.RDF')),
-        ]
-    )
-
-    maxime_d2_rdf_assay = Assay(
-        measurement_type=simulated_rdf,
-        technology_type=simulated_rdf,
-        technology_platform='To be filled out.',
-        units=[angstrom_interatom],
-        characteristic_categories=[
-            aluminate_dimer_2,
-            simulated_rdf,
-            Al_Ob_distance,
-            Al_Oh_distance,
-        ],
-        data_files=[
-            MaximeRDF(filename=join_path('d2.RDF')),
-        ]
-    )
-    maxime_d3_rdf_assay = Assay(
-        measurement_type=simulated_rdf,
-        technology_type=simulated_rdf,
-        technology_platform='To be filled out.',
-        units=[angstrom_interatom],
-        characteristic_categories=[
-            aluminate_dimer_3,
-            simulated_rdf,
-            Al_Ob_distance,
-            Al_Oh_distance,
-        ],
-        data_files=[
-            MaximeRDF(filename=join_path('d3.RDF')),
-        ]
-    )
-
-    maxime_d4_rdf_assay = Assay(
-        measurement_type=simulated_rdf,
-        technology_type=simulated_rdf,
-        technology_platform='To be filled out.',
-        units=[angstrom_interatom],
-        characteristic_categories=[
-            aluminate_dimer_4,
-            simulated_rdf,
-            Al_Ob_distance,
-            Al_Oh_distance,
-        ],
-        data_files=[
-            MaximeRDF(filename=join_path('d4.RDF')),
-        ]
-    )
-
-    maxime_rdf_study = Study(
-        identifier="maxime_rdf_study",
-        title="Explore various aluminate dimers.",
-        description=(
-            "RDFs are obtained from the atomic positions. "
-            "1st column: r (distance with respect to the 1st"
-            " atom of the pair type) in angstroms."
-            " The following columns are the RDFs for different "
-            "pair types (i.e. 'Al-O') mentioned in the header, "
-            "and finally the columns correspond to the running "
-            "coordination numbers for these same pair types."
-        ),
-
-        assays=[
-            maxime_d1_rdf_assay,
-            maxime_d2_rdf_assay,
-            maxime_d3_rdf_assay,
-            maxime_d4_rdf_assay,
-        ]
-    )
-
-    ###########################################################################
-    """Create the overall investigation."""
-    Al_inv = Investigation(
+        publications=[],
+    ),
+]
+
+# The DataFile class of each data file type.
+FILE_CLASSES = {
+    'Plot-csv-extract': extractedCSV,
+    'Maxime-RDF': MaximeRDF,
+    'Maxime Vibrational Spectrum': MaximeVib,
+}
+
+# Columns of a manifest, one row per data file. Rows with the same study
+# and assay make up one assay, characteristics is a '; ' separated list
+# of 'ontology source=term' pairs.
+MANIFEST_COLUMNS = [
+    'name', 'type', 'study', 'assay', 'assay_type', 'characteristics']
+
+
+def _rdf_rows(dimer, species):
+    """Manifest row of the RDF file of one of Maxime's dimers."""
+    return [(
+        'd{}.RDF'.format(dimer), 'Maxime-RDF', 'maxime_rdf_study',
+        'd{}'.format(dimer), 'rdf',
+        [('Aluminate Species', species),
+         SIMULATED_RDF,
+         ('Inter-atom distances', 'Al-Ob'),
+         ('Inter-atom distances', 'Al-Oh')],
+    )]
+
+
+def _vib_rows(dimer):
+    """Manifest rows of the PWS files of one of Maxime's dimers."""
+    return [
+        ('d{}.{}.PWS'.format(dimer, kind), 'Maxime Vibrational Spectrum',
+         'maxime_vibrational_dimer_study', 'vib', 'raman', [])
+        for kind in ('AlO', 'el')
+    ]
+
+
+# The data files of the aluminate investigation, as rows of the
+# MANIFEST_COLUMNS.
+MANIFEST = [
+    ('sipos2006-fig2.csv', 'Plot-csv-extract', '1d_nmr', 'sipos', 'nmr', []),
+    ('sipos_2006_table1_nmr.csv', 'Plot-csv-extract', '1d_nmr', 'sipos',
+     'nmr', []),
+    ('sipos_2006_table2.csv', 'Plot-csv-extract', '1d_nmr', 'sipos', 'nmr',
+     []),
+    ('sipos_2006_fig3.csv', 'Plot-csv-extract', '1d_nmr', 'sipos', 'nmr', []),
+    ('sipos_2006_figure_1.csv', 'Plot-csv-extract', 'raman', 'sipos',
+     'raman', []),
+    ('sipos_2006_table1_raman.csv', 'Plot-csv-extract', 'raman', 'sipos',
+     'raman', []),
+    ('zhou_thesis.csv', 'Plot-csv-extract', 'Raman', 'zhou', 'raman', []),
+] + _rdf_rows(1, '(OH)3Al-O-Al(OH)32-+ 180 H2O + 2 Na+') \
+  + _rdf_rows(2, '(OH)3Al-(OH)-Al(OH)3- + 179 H2O + HO- + 2 Na+') \
+  + _rdf_rows(3, '(OH)3Al-(OH)2 -Al(OH)3- + 179 H2O + 2 Na+') \
+  + _rdf_rows(4, '(OH)2Al-O2-Al(OH)2- + 181 H2O + 2 Na+') \
+  + _vib_rows(1) + _vib_rows(2) + _vib_rows(3) + _vib_rows(4)
+
+
+def read_manifest(path):
+    """
+    Read a manifest csv file with a header of the MANIFEST_COLUMNS into
+    a list of manifest rows.
+    """
+    rows = list()
+    with open(path, 'r', newline='') as f:
+        for record in csv.DictReader(f):
+            characteristics = [
+                tuple(pair.split('=', 1))
+                for pair in record['characteristics'].split('; ')
+                if pair
+            ]
+            rows.append((
+                record['name'], record['type'], record['study'],
+                record['assay'], record['assay_type'], characteristics))
+    return rows
+
+
+def _fingerprint_comments(path, rehash=False, recorded=None):
+    """
+    The ISA Comments recording the size, modification time and hash of
+    a data file, none if the file does not exist. recorded is the
+    fingerprint recorded earlier for the file, if any.
+    """
+    try:
+        fingerprint = file_fingerprint(
+            path, rehash=rehash, recorded=recorded)
+    except OSError:
+        logging.warning('%s not found, no hash recorded.', path)
+        return []
+    return [
+        Comment(name=name, value=str(value))
+        for name, value in zip(FINGERPRINT_COMMENTS, fingerprint)
+    ]
+
+
+def build_investigation(data_path, manifest=MANIFEST, studies=STUDIES,
+                        assay_types=ASSAY_TYPES, publications=PUBLICATIONS,
+                        record_hashes=False, rehash=False, recorded=None):
+    """
+    Build the ISA Investigation described by the tables, with the data
+    file names of the manifest joined to data_path.
+
+    Each ontology source and annotation is created once and shared by
+    every object using it. Assays are ordered by their first data file
+    in the manifest, studies as in the studies table.
+
+    With record_hashes=True every DataFile gets the fingerprint comments
+    of its file. recorded is a dictionary of absolute data file paths to
+    the (size, mtime_ns, sha1) recorded earlier, as returned by
+    utils.recorded_fingerprints(). Files keeping their recorded size and
+    modification time are only read again if rehash is True.
+    """
+    recorded = recorded or dict()
+    sources = dict()
+    annotations = dict()
+
+    def annotation(pair):
+        """The shared OntologyAnnotation of a (source, term) pair."""
+        if pair not in annotations:
+            source_name, term = pair
+            if source_name not in sources:
+                sources[source_name] = OntologySource(name=source_name)
+            annotations[pair] = OntologyAnnotation(
+                term=term, term_source=sources[source_name])
+        return annotations[pair]
+
+    # Group the manifest rows by assay, keeping the manifest order.
+    assay_rows = collections.OrderedDict()
+    for row in manifest:
+        name, file_type, study, assay, assay_type, characteristics = row
+        assay_rows.setdefault((study, assay), []).append(row)
+
+    study_assays = collections.defaultdict(list)
+    for (study, assay), rows in assay_rows.items():
+        assay_type = assay_types[rows[0][4]]
+        study_assays[study].append(Assay(
+            measurement_type=annotation(assay_type['measurement_type']),
+            technology_type=annotation(assay_type['technology_type']),
+            technology_platform=assay_type['technology_platform'],
+            units=[annotation(unit) for unit in assay_type['units']],
+            characteristic_categories=[
+                annotation(tuple(pair)) for pair in rows[0][5]],
+            data_files=[
+                FILE_CLASSES[file_type](
+                    filename=os.path.join(data_path, name),
+                    comments=_fingerprint_comments(
+                        os.path.join(data_path, name), rehash=rehash,
+                        recorded=recorded.get(
+                            os.path.abspath(os.path.join(data_path, name))))
+                    if record_hashes else None)
+                for name, file_type, _, _, _, _ in rows
+            ],
+        ))
+
+    publication_objects = {
+        key: Publication(**fields) for key, fields in publications.items()}
+
+    return Investigation(
         identifier='Al_investigation',
         title='Aluminate Investigation',
         description='Investigation into the properties of aluminate',
         studies=[
-            sipos2006_raman_study,
-            sipos2006_nmr_study,
-            zhou_raman_study,
-            maxime_rdf_study,
-            maxime_vibrational_dimer_study,
+            Study(
+                identifier=study['identifier'],
+                title=study['title'],
+                description=study['description'],
+                publications=[
+                    publication_objects[key]
+                    for key in study['publications']],
+                assays=study_assays[study['identifier']],
+            )
+            for study in studies
         ]
     )
 
+
+def serialize_metadata(investigation, compact=False, use_orjson=False):
     """
-    Create the metadata json entry.
-    """
+    Return the ISA-JSON text of an investigation.
 
-    metadata_json = json.dumps(
-        Al_inv,
+    By default the keys are sorted and indented by four spaces. With
+    compact=True there is no indentation nor sorting, which is much
+    smaller and faster for large investigations. use_orjson=True uses
+    the optional orjson package, which only indents by two spaces.
+    """
+    if use_orjson:
+        import orjson
+
+        option = 0 if compact else orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        # The ISA encoder turns the model into dictionaries for orjson.
+        return orjson.dumps(
+            investigation,
+            default=ISAJSONEncoder().default,
+            option=option,
+        ).decode('utf-8')
+
+    if compact:
+        return json.dumps(
+            investigation, cls=ISAJSONEncoder, separators=(',', ':'))
+
+    return json.dumps(
+        investigation,
         cls=ISAJSONEncoder,
         sort_keys=True,
         indent=4,
         separators=(',', ':')
     )
 
-    return metadata_json
+
+def write_metadata(investigation, path, compact=False, use_orjson=False):
+    """
+    Write the ISA-JSON of an investigation to path, gzipped if path ends
+    with '.gz'. See serialize_metadata() for the options.
+    """
+    metadata_json = serialize_metadata(
+        investigation, compact=compact, use_orjson=use_orjson)
+    if path.endswith('.gz'):
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(metadata_json)
+    else:
+        with open(path, 'w') as f:
+            f.write(metadata_json)
+    return
+
+
+def create_metadata(data_path, manifest=MANIFEST, compact=False,
+                    use_orjson=False):
+    """
+    Returns an ISA-JSON object.
+
+    :return:
+    """
+    investigation = build_investigation(data_path, manifest=manifest)
+    return serialize_metadata(
+        investigation, compact=compact, use_orjson=use_orjson)
 
 
 def main():
     """Writes the aluminate json entry to a specified folder."""
-    my_data_path = os.path.abspath('data')
-    nmr_metadata = create_metadata(data_path=my_data_path)
-    logging.info(nmr_metadata)
-    path = 'metadata.json'
-    with open(path, 'w') as f:
-        f.write(nmr_metadata)
+    parser = argparse.ArgumentParser(
+        description='Write the ISA-JSON metadata of the investigation.')
+    parser.add_argument(
+        'output', nargs='?', default='metadata.json',
+        help='metadata file, gzipped if it ends with .gz')
+    parser.add_argument(
+        '--data', default='data', help='directory of the data files')
+    parser.add_argument(
+        '--manifest', help='manifest csv file of the data files')
+    parser.add_argument(
+        '--compact', action='store_true',
+        help='no indentation nor sorted keys')
+    parser.add_argument(
+        '--orjson', action='store_true', help='use the orjson encoder')
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='reuse the hashes of the existing output for unchanged files '
+             '(the metadata is still rebuilt in full)')
+    args = parser.parse_args()
+
+    manifest = MANIFEST
+    if args.manifest:
+        manifest = read_manifest(args.manifest)
+
+    # The hashes recorded in the previous metadata, the unchanged files
+    # are then not read again.
+    previous = dict()
+    if args.incremental and os.path.exists(args.output):
+        previous = recorded_fingerprints(load_metadata(args.output))
+
+    investigation = build_investigation(
+        os.path.abspath(args.data), manifest=manifest, record_hashes=True,
+        rehash=not args.incremental, recorded=previous)
+    write_metadata(
+        investigation, args.output, compact=args.compact,
+        use_orjson=args.orjson)
+
+    if args.incremental:
+        for study in investigation.studies:
+            for assay in study.assays:
+                for data_file in assay.data_files:
+                    recorded = previous.get(
+                        os.path.abspath(data_file.filename))
+                    try:
+                        current = file_fingerprint(
+                            data_file.filename, recorded=recorded)
+                    except OSError:
+                        continue
+                    if recorded is None or recorded[2] != current[2]:
+                        logging.info('Changed: %s', data_file.filename)
+    logging.info('Wrote %s', args.output)
 
 if __name__ == '__main__':
     main()
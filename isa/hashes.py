@@ -0,0 +1,125 @@
+"""
+================
+Data File Hashes
+================
+
+Records the size, modification time and sha1 content hash of every data
+file as comments of its DataFile entry in the ISA-JSON metadata:
+
+    {"name": "file_size", "value": "12345"}
+    {"name": "file_mtime_ns", "value": "1500000000000000000"}
+    {"name": "file_sha1", "value": "3f786850e387550fdab836ed7e6dc881de23001b"}
+
+Updating the hashes is incremental: a file with the recorded size and
+modification time is not read again. The caches of the vis package
+(parsed RDF files, analysis results) are keyed on these hashes, and
+vis.utils.remember_file_hashes() reuses them, so unchanged inputs are
+neither hashed nor processed again.
+
+Run from the repository root:
+
+    python -m isa.hashes metadata.json [--rehash]
+"""
+
+import os
+import logging
+import argparse
+from vis.utils import (
+    SIZE_COMMENT, MTIME_COMMENT, HASH_COMMENT, load_metadata, save_metadata,
+    recorded_fingerprint, file_fingerprint)
+
+# The comment names written by this module.
+FINGERPRINT_COMMENTS = (SIZE_COMMENT, MTIME_COMMENT, HASH_COMMENT)
+
+
+def fingerprint_comments(fingerprint):
+    """ISA-JSON comments of a (size, mtime_ns, sha1) fingerprint."""
+    return [
+        {'name': name, 'value': str(value)}
+        for name, value in zip(FINGERPRINT_COMMENTS, fingerprint)
+    ]
+
+
+def set_fingerprint(data_file, fingerprint):
+    """Replace the fingerprint comments of a data file entry."""
+    data_file['comments'] = [
+        comment for comment in data_file.get('comments', [])
+        if comment.get('name') not in FINGERPRINT_COMMENTS
+    ] + fingerprint_comments(fingerprint)
+    return
+
+
+def update_fingerprints(metadata, rehash=False):
+    """
+    Bring the fingerprint comments of every data file of the metadata up
+    to date. Only the files whose size or modification time differ from
+    the recorded ones are hashed, or every file if rehash is True.
+
+    Returns a dictionary of lists of data file names:
+
+        changed     content differs from the recorded hash, or none was
+                    recorded,
+        updated     comments rewritten (changed, or only touched),
+        missing     file not found.
+    """
+    report = dict(changed=[], updated=[], missing=[])
+    for study in metadata['studies']:
+        for assay in study['assays']:
+            for data_file in assay['dataFiles']:
+                name = data_file['name']
+                recorded = recorded_fingerprint(data_file)
+                try:
+                    stat = os.stat(name)
+                except OSError:
+                    report['missing'].append(name)
+                    continue
+
+                if not rehash and recorded is not None and \
+                        recorded[:2] == (stat.st_size, stat.st_mtime_ns):
+                    continue
+
+                fingerprint = file_fingerprint(name, rehash=rehash)
+                if recorded is None or recorded[2] != fingerprint[2]:
+                    report['changed'].append(name)
+                if recorded != fingerprint:
+                    set_fingerprint(data_file, fingerprint)
+                    report['updated'].append(name)
+    return report
+
+
+def refresh_metadata(json_metadata_path, rehash=False):
+    """
+    Update the fingerprints of a metadata file in place, see
+    update_fingerprints(). The file is only written if an entry changed.
+    """
+    metadata = load_metadata(json_metadata_path)
+    report = update_fingerprints(metadata, rehash=rehash)
+    if report['updated']:
+        save_metadata(metadata, json_metadata_path)
+    return report
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Record the size, modification time and content hash '
+                    'of the data files of an ISA-JSON metadata file.')
+    parser.add_argument('metadata', help='path to the ISA-JSON metadata')
+    parser.add_argument(
+        '--rehash', action='store_true',
+        help='hash every file, even those that look unchanged')
+    args = parser.parse_args()
+
+    report = refresh_metadata(args.metadata, rehash=args.rehash)
+    for name in report['changed']:
+        print('changed\t{}'.format(name))
+    for name in report['missing']:
+        print('missing\t{}'.format(name))
+    logging.info(
+        '%d changed, %d updated, %d missing', len(report['changed']),
+        len(report['updated']), len(report['missing']))
+    return
+
+
+if __name__ == '__main__':
+    main()
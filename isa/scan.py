@@ -0,0 +1,315 @@
+"""
+=======================
+Simulation File Scanner
+=======================
+
+Registers new simulation outputs into an existing ISA-JSON metadata
+file, without regenerating the whole investigation.
+
+The scanner walks a directory for files matching the FILE_PATTERNS,
+reads the header line of each to find its data file type and hashes the
+files of a known type (in parallel, as this is mostly waiting on the
+disk), and appends the files that are not yet listed to the metadata:
+
+    'RDF_' columns      Maxime-RDF, one new assay per file in the RDF
+                        study, with the pair types of the header as
+                        'Inter-atom distances' characteristics and its
+                        'Aluminate Species' characteristic, see below.
+    'wavenb' column     Maxime Vibrational Spectrum, added to the
+                        assay of the vibrational study.
+    comma separated     Plot-csv-extract, added to the assay of the
+                        scanned csv study.
+
+The RDF files do not name their species, which the applications
+select RDF files by. It is given with --species (for every new RDF
+file) or --species-file (a 'file name,species' csv), otherwise the file
+name without its extension is used.
+
+Each new entry records the size, modification time and hash of its
+file (see isa.hashes), under its name relative to the metadata file
+(see vis.utils.save_metadata). The metadata file is replaced atomically
+once every file is added.
+
+Run from the repository root:
+
+    python -m isa.scan metadata.json data [--species 'Al(OH)4- + 2 Na+']
+"""
+
+import os
+import csv
+import uuid
+import fnmatch
+import logging
+import argparse
+import concurrent.futures
+from vis.utils import (
+    load_metadata, save_metadata, data_file_paths, file_fingerprint)
+from isa.hashes import fingerprint_comments
+
+# File name patterns of the candidate files.
+FILE_PATTERNS = ('*.RDF', '*.PWS', '*.csv')
+
+# Study receiving the new files of each data file type.
+TYPE_STUDIES = {
+    'Maxime-RDF': 'maxime_rdf_study',
+    'Maxime Vibrational Spectrum': 'maxime_vibrational_dimer_study',
+    'Plot-csv-extract': 'scanned_csv',
+}
+
+
+def sniff_header(path):
+    """
+    Return (data file type, pair types) of a file from its first line,
+    or (None, None) if it is not a known format. The pair types are only
+    found for RDF files, e.g. ['Al-Ob', 'Al-Oh'].
+    """
+    try:
+        with open(path, 'r') as f:
+            header = f.readline()
+    except (OSError, UnicodeDecodeError):
+        return None, None
+
+    names = header.lstrip('#').split()
+    if header.startswith('#') and any(n.startswith('RDF_') for n in names):
+        pairs = [n[len('RDF_'):] for n in names if n.startswith('RDF_')]
+        return 'Maxime-RDF', pairs
+    if header.startswith('#') and 'wavenb' in names:
+        return 'Maxime Vibrational Spectrum', None
+    if ',' in header:
+        return 'Plot-csv-extract', None
+    return None, None
+
+
+def inspect_file(path):
+    """
+    Return (data file type, pair types, fingerprint) of a file, see
+    sniff_header(). The (size, mtime_ns, sha1) fingerprint is only
+    computed for files of a known type, else it is None.
+    """
+    file_type, pairs = sniff_header(path)
+    if file_type is None:
+        return None, None, None
+    return file_type, pairs, file_fingerprint(path)
+
+
+def find_files(directory, patterns=FILE_PATTERNS):
+    """Return the sorted paths under directory matching the patterns."""
+    found = list()
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def _annotation(term_source, value):
+    """ISA-JSON ontology annotation dictionary."""
+    return {
+        '@id': '#ontology_annotation/{}'.format(uuid.uuid4()),
+        'annotationValue': value,
+        'comments': [],
+        'termAccession': '',
+        'termSource': term_source,
+    }
+
+
+def _characteristic(term_source, value):
+    """ISA-JSON characteristic category dictionary."""
+    return {
+        '@id': '#characteristic_category/{}'.format(uuid.uuid4()),
+        'characteristicType': _annotation(term_source, value),
+    }
+
+
+def _data_file(path, file_type, fingerprint=None):
+    """
+    ISA-JSON data file dictionary, with the comments of the (size,
+    mtime_ns, sha1) fingerprint, computed here if not given.
+    """
+    if fingerprint is None:
+        fingerprint = file_fingerprint(path)
+    return {
+        '@id': '#data/{}-{}'.format(
+            file_type.lower().replace(' ', '').replace('-', ''),
+            uuid.uuid4().hex),
+        'comments': fingerprint_comments(fingerprint),
+        'name': path,
+        'type': file_type,
+    }
+
+
+def _assay(measurement_type, units, characteristics, data_files):
+    """
+    ISA-JSON assay dictionary. measurement_type and units are
+    (termSource, value) pairs, characteristics a list of them.
+    """
+    measurement = _annotation(*measurement_type)
+    return {
+        'characteristicCategories': [
+            _characteristic(*pair) for pair in characteristics],
+        'comments': [],
+        'dataFiles': data_files,
+        'filename': '',
+        'materials': {'otherMaterials': [], 'samples': []},
+        'measurementType': measurement,
+        'processSequence': [],
+        'technologyPlatform': 'To be filled out.',
+        'technologyType': measurement,
+        'unitCategories': [_annotation(*unit) for unit in units],
+    }
+
+
+def _study(metadata, identifier):
+    """Return the study of the metadata with identifier, added if new."""
+    for study in metadata['studies']:
+        if study['identifier'] == identifier:
+            return study
+    study = {
+        'assays': [],
+        'characteristicCategories': [],
+        'comments': [],
+        'description': 'Files registered by isa.scan.',
+        'factors': [],
+        'filename': '',
+        'identifier': identifier,
+        'materials': {'otherMaterials': [], 'samples': [], 'sources': []},
+        'people': [],
+        'processSequence': [],
+        'protocols': [],
+        'publicReleaseDate': '',
+        'publications': [],
+        'studyDesignDescriptors': [],
+        'submissionDate': '',
+        'title': identifier,
+        'unitCategories': [],
+    }
+    metadata['studies'].append(study)
+    return study
+
+
+def species_of(path, species=None):
+    """
+    Return the aluminate species of an RDF file: species if it is a
+    string, species[file name] if it is a dictionary having the file,
+    otherwise the file name without its extension.
+    """
+    name = os.path.basename(path)
+    if isinstance(species, str):
+        return species
+    if species and name in species:
+        return species[name]
+    logging.warning('No species given for %s, named after the file.', path)
+    return os.path.splitext(name)[0]
+
+
+def read_species_file(path):
+    """Read a 'file name,species' csv into a dictionary."""
+    with open(path, 'r', newline='') as f:
+        return {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+
+
+def register_file(metadata, path, file_type, pairs=None, species=None,
+                  fingerprint=None):
+    """
+    Append one data file of the given type to the metadata. species is
+    the 'Aluminate Species' of an RDF file, see species_of(). The file
+    is hashed unless its fingerprint is given.
+    """
+    study = _study(metadata, TYPE_STUDIES[file_type])
+    data_file = _data_file(path, file_type, fingerprint)
+
+    if file_type == 'Maxime-RDF':
+        # One assay per simulation, with the characteristics in the
+        # order of generateISA.
+        study['assays'].append(_assay(
+            ('Simulated Data', 'Simulated RDF'),
+            [('Inter-atom distances', 'Angstroms')],
+            [('Aluminate Species', species_of(path, species)),
+             ('Simulated Data', 'Simulated RDF')] +
+            [('Inter-atom distances', pair) for pair in pairs or []],
+            [data_file]))
+    elif study['assays']:
+        study['assays'][0]['dataFiles'].append(data_file)
+    elif file_type == 'Maxime Vibrational Spectrum':
+        study['assays'].append(_assay(
+            ('Simulated Data', 'Simulated vibrational spectrum'),
+            [('Raman Spectroscopy', 'cm-1')], [], [data_file]))
+    else:
+        study['assays'].append(_assay(
+            ('Extracted Data', 'Plot csv extract'), [], [], [data_file]))
+    return
+
+
+def scan_directory(json_metadata_path, directory, patterns=FILE_PATTERNS,
+                   max_workers=None, dry_run=False, species=None):
+    """
+    Register the files under directory matching the patterns that are
+    not yet in the metadata file. Returns the list of (path, data file
+    type) added. With dry_run=True the metadata file is left as is.
+    species gives the species of the RDF files, see species_of().
+    """
+    metadata = load_metadata(json_metadata_path)
+    known = set(
+        os.path.abspath(name) for name in data_file_paths(metadata))
+    candidates = [
+        path for path in find_files(directory, patterns)
+        if os.path.abspath(path) not in known
+    ]
+
+    # Reading the headers and hashing the files is mostly waiting on the
+    # disk, and hashlib releases the GIL, so both are done in threads.
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        inspected = list(executor.map(inspect_file, candidates))
+
+    added = list()
+    for path, (file_type, pairs, fingerprint) in zip(candidates, inspected):
+        if file_type is None:
+            logging.warning('Unknown format, %s skipped.', path)
+            continue
+        # Names are absolute in memory, and written relative to the
+        # metadata file by save_metadata().
+        register_file(
+            metadata, os.path.abspath(path), file_type, pairs, species,
+            fingerprint)
+        added.append((path, file_type))
+
+    if added and not dry_run:
+        save_metadata(metadata, json_metadata_path)
+    return added
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Register new simulation outputs in an ISA-JSON '
+                    'metadata file.')
+    parser.add_argument('metadata', help='path to the ISA-JSON metadata')
+    parser.add_argument('directory', help='directory to scan')
+    parser.add_argument(
+        '--pattern', action='append',
+        help='file name pattern, may be repeated (default: {})'.format(
+            ' '.join(FILE_PATTERNS)))
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='only list the files that would be added')
+    species = parser.add_mutually_exclusive_group()
+    species.add_argument(
+        '--species', help='aluminate species of every new RDF file')
+    species.add_argument(
+        '--species-file',
+        help="csv of 'file name,species' rows for the new RDF files")
+    args = parser.parse_args()
+
+    added = scan_directory(
+        args.metadata, args.directory,
+        patterns=args.pattern or FILE_PATTERNS, dry_run=args.dry_run,
+        species=read_species_file(args.species_file)
+        if args.species_file else args.species)
+    for path, file_type in added:
+        print('{}\t{}'.format(file_type, path))
+    logging.info('%d files registered in %s', len(added), args.metadata)
+    return
+
+
+if __name__ == '__main__':
+    main()
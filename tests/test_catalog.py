@@ -0,0 +1,93 @@
+import os
+import json
+import pytest
+from vis.utils import load_metadata
+from vis.isa_index import CharacteristicIndex
+from vis.catalog import open_catalog
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+QUERIES = [
+    dict(),
+    dict(term_sources=['Inter-atom distances']),
+    dict(term_sources=['Aluminate Species', 'Simulated Data']),
+    dict(criteria={'Inter-atom distances': ['Al-Ob']}),
+    dict(criteria={'Inter-atom distances': ['Al-Ob', 'Al-Oh']}),
+    dict(criteria={'Aluminate Species': ['species 1', 'species 2'],
+                   'Inter-atom distances': ['Al-Oh']}),
+    dict(criteria={'Aluminate Species': ['species 1']},
+         term_sources=['Inter-atom distances']),
+    dict(criteria={'Aluminate Species': ['no such species']}),
+]
+
+
+def _characteristic(term_source, value):
+    return dict(characteristicType=dict(
+        termSource=term_source, annotationValue=value))
+
+
+@pytest.fixture
+def metadata_path(tmp_path):
+    assays = [
+        dict(
+            measurementType=dict(annotationValue='Simulated RDF'),
+            characteristicCategories=[
+                _characteristic('Aluminate Species',
+                                'species {}'.format(idx % 3)),
+                _characteristic('Simulated Data', 'Simulated RDF'),
+                _characteristic('Inter-atom distances', 'Al-Ob'),
+                _characteristic('Inter-atom distances', 'Al-Oh'),
+            ] if idx % 4 else [],
+            dataFiles=[dict(name='run_{}.RDF'.format(idx),
+                            type='Maxime-RDF')],
+        )
+        for idx in range(12)
+    ]
+    metadata = dict(studies=[
+        dict(identifier='first', publications=[], assays=assays[:5]),
+        dict(identifier='second', publications=[], assays=assays[5:]),
+    ])
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(metadata))
+    return str(path)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_catalog_matches_index(metadata_path, tmp_path, query):
+    index = CharacteristicIndex(load_metadata(metadata_path))
+    catalog = open_catalog(metadata_path, cache_dir=str(tmp_path / 'cache'))
+    try:
+        expected = index.query(**query)
+        assert catalog.query(**query) == expected
+        assert catalog.data_files(expected) == index.data_files(expected)
+        for assay_id in expected:
+            assert dict(catalog.characteristics(assay_id)) == \
+                dict(index.characteristics(assay_id))
+    finally:
+        catalog.close()
+
+
+def test_catalog_values(metadata_path, tmp_path):
+    index = CharacteristicIndex(load_metadata(metadata_path))
+    catalog = open_catalog(metadata_path, cache_dir=str(tmp_path / 'cache'))
+    try:
+        for term in ['Aluminate Species', 'Inter-atom distances']:
+            assert catalog.values(term) == index.values(term)
+    finally:
+        catalog.close()
+
+
+def test_read_rdf_with_catalog(tmp_path, monkeypatch):
+    from vis.utils import read_rdf
+    monkeypatch.chdir(ROOT)
+    metadata_path = os.path.join(ROOT, 'data', 'nmr_metadata.json')
+    catalog = open_catalog(metadata_path, cache_dir=str(tmp_path))
+    try:
+        for char_types in [['Aluminate Species'], ['Inter-atom distances']]:
+            expected = read_rdf(metadata_path, char_types, cache_dir=None)
+            found = read_rdf(
+                metadata_path, char_types, cache_dir=None, index=catalog)
+            assert [handle.data_file for handle in found] == \
+                [handle.data_file for handle in expected]
+    finally:
+        catalog.close()
@@ -0,0 +1,61 @@
+import numpy as np
+from vis.decimate import minmax_indices, window_indices, decimate
+
+
+def _columns(n_points=5000):
+    rng = np.random.RandomState(0)
+    x = np.sort(rng.uniform(0.0, 10.0, n_points))
+    ys = [np.sin(3.0 * x) + rng.normal(0.0, 0.3, n_points),
+          rng.normal(0.0, 1.0, n_points)]
+    ys[1][::7] = np.nan
+    return x, ys
+
+
+def test_minmax_keeps_bucket_extremes():
+    x, ys = _columns()
+    n_buckets = 300
+    keep = minmax_indices(x, ys, n_buckets)
+    assert np.array_equal(keep, np.unique(keep))
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+
+    # Brute force over the buckets, the kept points reach the extremes.
+    buckets = [
+        min(int((value - x[0]) / (x[-1] - x[0]) * n_buckets), n_buckets - 1)
+        for value in x]
+    kept = np.zeros(len(x), dtype=bool)
+    kept[keep] = True
+    for idx in range(n_buckets):
+        inside = np.array(buckets) == idx
+        for y in ys:
+            if np.isnan(y[inside]).all():
+                continue
+            assert np.nanmin(y[inside & kept]) == np.nanmin(y[inside])
+            assert np.nanmax(y[inside & kept]) == np.nanmax(y[inside])
+    # At most the first and last point and two per bucket and column.
+    assert len(keep) <= 2 + 2 * n_buckets * len(ys)
+
+
+def test_short_and_flat_columns():
+    x = np.linspace(0.0, 1.0, 50)
+    assert np.array_equal(minmax_indices(x, [x], 25), np.arange(50))
+    assert np.array_equal(
+        minmax_indices(np.zeros(50), [x], 10), np.array([0, 49]))
+
+
+def test_decimate_window():
+    x, ys = _columns()
+    data = dict(x=x, a=ys[0], b=ys[1])
+    first, last = window_indices(x, 2.0, 4.0)
+    assert x[first] < 2.0 <= x[first + 1]
+    assert x[last - 2] <= 4.0 < x[last - 1]
+
+    reduced = decimate(data, 'x', ['a'], 100, start=2.0, end=4.0)
+    assert sorted(reduced) == ['a', 'x']
+    assert reduced['x'][0] == x[first] and reduced['x'][-1] == x[last - 1]
+    keep = minmax_indices(x[first:last], [ys[0][first:last]], 100)
+    assert np.array_equal(reduced['a'], ys[0][first:last][keep])
+
+    # Without a window every point is a candidate.
+    full = decimate(data, 'x', ['a', 'b'], 100)
+    assert np.array_equal(
+        full['x'], x[minmax_indices(x, [ys[0], ys[1]], 100)])
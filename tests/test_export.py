@@ -0,0 +1,79 @@
+import os
+import json
+import functools
+import pytest
+import numpy as np
+from vis.utils import create_pandas_df, load_cached_df
+
+pytest.importorskip('pyarrow')
+import vis.export  # noqa: E402
+from vis.export import export_parquet, study_keys  # noqa: E402
+from vis.utils import read_parquet_dataset  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _assay(names, species):
+    return dict(
+        measurementType=dict(annotationValue='Simulated RDF'),
+        characteristicCategories=[dict(characteristicType=dict(
+            termSource='Aluminate Species', annotationValue=species))],
+        dataFiles=[
+            dict(name=os.path.join(ROOT, 'data', name), type='Maxime-RDF')
+            for name in names],
+    )
+
+
+@pytest.fixture
+def metadata_path(tmp_path, monkeypatch):
+    # Keep the parsed file cache of the RDF files out of the user's.
+    monkeypatch.setattr(vis.export, 'load_cached_df', functools.partial(
+        load_cached_df, cache_dir=str(tmp_path / 'cache')))
+    # Two studies whose identifiers only differ by case.
+    metadata = dict(studies=[
+        dict(identifier='rdf', publications=[dict(doi='10.0/a')],
+             assays=[_assay(['d1.RDF'], 'first'),
+                     _assay(['d2.RDF'], 'second')]),
+        dict(identifier='RDF', publications=[],
+             assays=[_assay(['d3.RDF', 'd4.RDF'], 'third')]),
+    ])
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(metadata))
+    return str(path)
+
+
+def test_study_keys_are_distinct_ignoring_case():
+    metadata = dict(studies=[
+        dict(identifier=name) for name in ['raman', 'Raman', 'a b', 'A_B']])
+    assert study_keys(metadata) == ['raman', 'raman-2', 'a_b', 'a_b-2']
+
+
+def test_export_round_trip(metadata_path, tmp_path):
+    output = str(tmp_path / 'dataset')
+    export_parquet(metadata_path, output)
+    assert sorted(os.listdir(output)) == ['study_key=rdf', 'study_key=rdf-2']
+
+    dataset = read_parquet_dataset(output)
+    assert sorted(dataset['assay'].astype(str).unique()) == \
+        ['assay_0', 'assay_1', 'assay_2']
+    for name in ['d1.RDF', 'd2.RDF', 'd3.RDF', 'd4.RDF']:
+        expected = create_pandas_df(os.path.join(ROOT, 'data', name))
+        rows = dataset[dataset['data_file'] == name]
+        for column in expected.columns:
+            assert np.array_equal(
+                rows[column].values, expected[column].values)
+
+    third = read_parquet_dataset(
+        output, columns=['data_file', 'Aluminate Species'], studies=['RDF'])
+    assert set(third['data_file']) == {'d3.RDF', 'd4.RDF'}
+    assert set(third['Aluminate Species']) == {'third'}
+    assert len(read_parquet_dataset(output, assays=['assay_1'])) == \
+        len(create_pandas_df(os.path.join(ROOT, 'data', 'd2.RDF')))
+
+
+def test_export_does_not_overwrite(metadata_path, tmp_path):
+    output = str(tmp_path / 'dataset')
+    export_parquet(metadata_path, output)
+    with pytest.raises(FileExistsError):
+        export_parquet(metadata_path, output)
+    export_parquet(metadata_path, output, overwrite=True)
@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+import vis.utils
+from vis.utils import (
+    load_metadata, file_fingerprint, recorded_fingerprints, save_metadata)
+from isa.hashes import update_fingerprints, refresh_metadata
+
+
+def _write_metadata(tmp_path, names):
+    metadata = dict(studies=[dict(assays=[dict(dataFiles=[
+        dict(name=name, type='Maxime-RDF') for name in names])])])
+    path = tmp_path / 'metadata.json'
+    path.write_text(json.dumps(metadata))
+    return str(path)
+
+
+def test_refresh_records_and_detects_changes(tmp_path):
+    (tmp_path / 'a.RDF').write_text('# r\n1.0\n')
+    (tmp_path / 'b.RDF').write_text('# r\n2.0\n')
+    metadata_path = _write_metadata(tmp_path, ['a.RDF', 'b.RDF', 'c.RDF'])
+
+    report = refresh_metadata(metadata_path)
+    assert sorted(map(os.path.basename, report['changed'])) == \
+        ['a.RDF', 'b.RDF']
+    assert list(map(os.path.basename, report['missing'])) == ['c.RDF']
+    recorded = recorded_fingerprints(load_metadata(metadata_path))
+    path = str(tmp_path / 'a.RDF')
+    assert recorded[path][2] == hashlib.sha1(b'# r\n1.0\n').hexdigest()
+
+    (tmp_path / 'a.RDF').write_text('# r\n3.0\n')
+    report = update_fingerprints(load_metadata(metadata_path))
+    assert list(map(os.path.basename, report['changed'])) == ['a.RDF']
+
+
+def test_recorded_fingerprint_is_not_read_again(tmp_path, monkeypatch):
+    path = tmp_path / 'a.RDF'
+    path.write_text('# r\n1.0\n')
+    stat = os.stat(str(path))
+    recorded = (stat.st_size, stat.st_mtime_ns, 'recorded sha1')
+
+    def fail(path):
+        raise AssertionError('{} was read.'.format(path))
+
+    monkeypatch.setattr(vis.utils, '_file_hashes', dict())
+    monkeypatch.setattr(vis.utils, '_hash_content', fail)
+    assert file_fingerprint(str(path), recorded=recorded)[2] == \
+        'recorded sha1'
+
+
+def test_load_metadata_does_not_remember_hashes(tmp_path, monkeypatch):
+    (tmp_path / 'a.RDF').write_text('# r\n1.0\n')
+    metadata_path = _write_metadata(tmp_path, ['a.RDF'])
+    metadata = load_metadata(metadata_path)
+    update_fingerprints(metadata)
+    save_metadata(metadata, metadata_path)
+
+    monkeypatch.setattr(vis.utils, '_file_hashes', dict())
+    load_metadata(metadata_path)
+    assert vis.utils._file_hashes == dict()
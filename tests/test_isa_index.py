@@ -0,0 +1,88 @@
+import os
+import copy
+import pickle
+import itertools
+import pytest
+from vis.utils import load_metadata
+from vis.isa_index import Characteristics, CharacteristicIndex
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _assays(metadata):
+    return [
+        assay for study in metadata['studies'] for assay in study['assays']]
+
+
+def _matches(assay, criteria, term_sources):
+    """Walk the characteristics of one assay."""
+    pairs = [
+        (char['characteristicType']['termSource'],
+         char['characteristicType']['annotationValue'])
+        for char in assay['characteristicCategories']]
+    if term_sources is not None and \
+            not any(term in term_sources for term, _ in pairs):
+        return False
+    return all(
+        any((term, value) in pairs for value in values)
+        for term, values in criteria.items())
+
+
+@pytest.fixture
+def metadata(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    return load_metadata(os.path.join('data', 'nmr_metadata.json'))
+
+
+def test_query_matches_metadata_walk(metadata):
+    index = CharacteristicIndex(metadata)
+    assays = _assays(metadata)
+    assert len(index) == len(assays)
+    terms = sorted(set(
+        char['characteristicType']['termSource']
+        for assay in assays for char in assay['characteristicCategories']))
+
+    queries = [(dict(), None), (dict(), ['no such term'])]
+    for term in terms:
+        values = index.values(term)
+        queries.append((dict(), [term]))
+        queries.append(({term: values[:1]}, None))
+        queries.append(({term: values[-2:] + ['no such value']}, terms[:1]))
+        for other in terms:
+            if other != term:
+                queries.append(
+                    ({term: values[:1], other: index.values(other)}, None))
+
+    for criteria, term_sources in queries:
+        expected = [
+            assay_id for assay_id, assay in enumerate(assays)
+            if _matches(assay, criteria, term_sources)]
+        assert index.query(criteria, term_sources) == expected
+        assert index.data_files(expected) == [
+            data_file['name'] for assay_id in expected
+            for data_file in assays[assay_id]['dataFiles']]
+
+
+def test_characteristics_of_assays(metadata):
+    index = CharacteristicIndex(metadata)
+    for assay_id, assay in enumerate(_assays(metadata)):
+        characteristics = index.characteristics(assay_id)
+        pairs = sorted(
+            (char['characteristicType']['termSource'],
+             char['characteristicType']['annotationValue'])
+            for char in assay['characteristicCategories'])
+        assert sorted(
+            (term, value) for term in characteristics
+            for value in characteristics[term]) == pairs
+        for term, values in itertools.groupby(pairs, key=lambda p: p[0]):
+            assert sorted(characteristics[term]) == [v for _, v in values]
+
+
+def test_characteristics_record():
+    record = Characteristics({'Inter-atom distances': ['Al-Ob', 'Al-Oh']})
+    assert record['Inter-atom distances'] == ('Al-Ob', 'Al-Oh')
+    assert copy.copy(record) is record and copy.deepcopy(record) is record
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored == record and hash(restored) == hash(record)
+    with pytest.raises(AttributeError):
+        record.values = {}
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+from vis.pws_bands import smooth_columns, pick_bands, pws_bands, match_raman
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_smooth_columns_matches_loop():
+    values = np.random.RandomState(0).normal(size=(30, 3))
+    for window in [1, 2, 5]:
+        expected = np.array([
+            values[max(row - window // 2, 0):
+                   max(row - window // 2, 0) + window].mean(axis=0)
+            for row in range(len(values))
+        ])
+        assert np.allclose(smooth_columns(values, window), expected)
+
+
+def test_pick_bands_finds_known_peaks():
+    wavenb = np.linspace(0.0, 4000.0, 8001)
+    centres = [(700.0, 3.0), (1650.0, 1.0), (3400.0, 2.0)]
+    spectrum = sum(
+        height * np.exp(-0.5 * ((wavenb - centre) / 20.0) ** 2)
+        for centre, height in centres)
+    spectra = np.column_stack([spectrum, spectrum[::-1]])
+
+    positions, intensities = pick_bands(wavenb, spectra, n_bands=4)
+    assert np.allclose(positions[:3, 0], [700.0, 3400.0, 1650.0], atol=0.1)
+    assert np.allclose(
+        positions[:3, 1], [3300.0, 600.0, 2350.0], atol=0.1)
+    assert np.allclose(intensities[:3, 0], [3.0, 2.0, 1.0], atol=1e-3)
+    # Only three maxima, the fourth band is padding.
+    assert np.isnan(positions[3]).all()
+
+    positions, _ = pick_bands(wavenb, spectra, n_bands=1, wn_min=1000.0)
+    assert np.allclose(positions[0], [3400.0, 3300.0], atol=0.1)
+
+
+def test_pws_bands_of_a_file(tmp_path):
+    path = os.path.join(ROOT, 'data', 'd1.AlO.PWS')
+    bands = pws_bands(path, n_bands=3, cache_dir=None)
+    cached = pws_bands(path, n_bands=3, cache_dir=str(tmp_path))
+    again = pws_bands(path, n_bands=3, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(bands, cached)
+    pd.testing.assert_frame_equal(bands, again)
+
+    # The first band of each column is its highest interior maximum.
+    spectrum = np.loadtxt(path)
+    with open(path) as f:
+        names = f.readline().lstrip('#').split()[1:]
+    for col, name in enumerate(names, start=1):
+        values = spectrum[:, col]
+        maxima = [
+            values[row] for row in range(1, len(values) - 1)
+            if values[row - 1] < values[row] >= values[row + 1]]
+        first = bands[(bands['column'] == name) & (bands['rank'] == 0)]
+        assert first['intensity'].iloc[0] == max(maxima)
+
+
+def test_match_raman_nearest_band():
+    bands = pd.DataFrame(dict(
+        column='Al', rank=[0, 1], wavenumber=[500.0, 620.0],
+        intensity=[2.0, 1.0], data_file='d1'))
+    raman = pd.DataFrame(dict(wavelength=[505.0, 612.0, 900.0, None]))
+    matched = match_raman(raman, bands, tolerance=10.0)
+    assert list(matched['wavelength']) == [505.0, 612.0, 900.0]
+    assert matched['wavenumber'].values[:2].tolist() == [500.0, 620.0]
+    assert np.isnan(matched['wavenumber'].values[2])
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+from scipy.integrate import cumulative_trapezoid
+from vis.utils import create_pandas_df
+from vis.rcn_check import (
+    CHECK_COLUMNS, cumulative_rcn, check_arrays, validate_files)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+NAMES = ['d1.RDF', 'd2.RDF', 'd3.RDF', 'd4.RDF']
+
+
+def _synthetic(n_files=3):
+    """Smooth g(r) of n_files files and two pairs."""
+    r = np.linspace(0.0, 8.0, 401)
+    rdf = np.empty((n_files, len(r), 2))
+    for file_idx in range(n_files):
+        for pair_idx in range(2):
+            peak = 1.8 + 0.2 * file_idx + 0.4 * pair_idx
+            rdf[file_idx, :, pair_idx] = np.where(
+                r < peak - 0.5, 0.0,
+                1.0 + np.exp(-(r - peak)) * np.cos(3.0 * (r - peak)))
+    return r, np.clip(rdf, 0.0, None)
+
+
+def test_cumulative_rcn_matches_trapezoid():
+    r, rdf = _synthetic()
+    density = np.array([[0.03, 0.05], [0.04, 0.06], [0.05, 0.07]])
+    rcn = cumulative_rcn(r, rdf, density)
+    shifted = cumulative_rcn(r, rdf, density, shift=0.5)
+    for file_idx in range(len(rdf)):
+        for pair_idx in range(2):
+            expected = cumulative_trapezoid(
+                4.0 * np.pi * density[file_idx, pair_idx] * r ** 2 *
+                rdf[file_idx, :, pair_idx], r, initial=0.0)
+            assert np.allclose(rcn[file_idx, :, pair_idx], expected)
+            # Half a step past each point, the last step extended.
+            extended = np.append(expected, 2 * expected[-1] - expected[-2])
+            assert np.allclose(
+                shifted[file_idx, :, pair_idx],
+                (extended[:-1] + extended[1:]) / 2.0)
+    assert np.allclose(
+        cumulative_rcn(r, rdf, 0.03),
+        rcn / density[:, np.newaxis, :] * 0.03)
+
+
+def test_check_arrays_flags():
+    r, rdf = _synthetic()
+    density = 0.04
+    rcn = cumulative_rcn(r, rdf, density, shift=0.5)
+    checks = check_arrays(r, rdf, rcn)
+    # The fit is on the unshifted integral, hence the tolerance.
+    assert np.allclose(checks['density'], density, rtol=0.01)
+    assert not checks['truncated'].any()
+    assert not checks['diverges'].any()
+    assert not checks['invalid'].any()
+    assert np.isnan(checks['truncated_r']).all()
+
+    # File 0 stops at point 300, file 1 counts 10% too many Al-Oh
+    # neighbours and file 2 has a missing value.
+    rcn[0, 300:, 0] = 0.0
+    rcn[1, :, 1] *= 1.1
+    rdf[2, 50, 1] = np.nan
+    checks = check_arrays(r, rdf, rcn, density=density)
+    assert checks['truncated'].tolist() == [
+        [True, False], [False, False], [False, False]]
+    assert checks['truncated_r'][0, 0] == r[300]
+    assert checks['diverges'].tolist() == [
+        [False, False], [False, True], [False, False]]
+    assert checks['invalid'].tolist() == [
+        [False, False], [False, False], [False, True]]
+
+
+def test_validate_files_matches_check_arrays(tmp_path):
+    paths = [os.path.join(ROOT, 'data', name) for name in NAMES]
+    missing = os.path.join(str(tmp_path), 'missing.RDF')
+    table = validate_files(
+        paths + [missing], processes=1, cache_dir=str(tmp_path))
+    assert list(table.columns) == CHECK_COLUMNS
+    assert table['data_file'].tolist()[-1] == missing
+    assert table['invalid'].tolist()[-1]
+
+    for path in paths:
+        frame = create_pandas_df(path)
+        pairs = [
+            name[len('RDF_'):] for name in frame.columns
+            if name.startswith('RDF_')]
+        checks = check_arrays(
+            frame['r'].values,
+            frame[['RDF_' + pair for pair in pairs]].values[np.newaxis],
+            frame[['RCN_' + pair for pair in pairs]].values[np.newaxis])
+        rows = table[table['data_file'] == path]
+        assert rows['pair'].tolist() == pairs
+        for name in ('truncated', 'diverges', 'invalid'):
+            assert rows[name].tolist() == checks[name][0].tolist()
+        assert np.allclose(rows['density'], checks['density'][0])
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+from vis.utils import create_pandas_df
+from vis.rdf_tensor import stack_rdfs
+from vis.rdf_analysis import SHELL_COLUMNS, analyze_tensor, rdf_shell_table
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+NAMES = ['d1.RDF', 'd2.RDF', 'd3.RDF', 'd4.RDF']
+
+
+def _frames():
+    frames = list()
+    for name in NAMES:
+        path = os.path.join(ROOT, 'data', name)
+        frame = create_pandas_df(path)
+        frame.attrs['data_file'] = path
+        frame.attrs['characteristics'] = {'Aluminate Species': (name,)}
+        frames.append(frame)
+    return frames
+
+
+def _crossing(r, g, lo, level):
+    return r[lo] + (level - g[lo]) / (g[lo + 1] - g[lo]) * (r[lo + 1] - r[lo])
+
+
+def _first_shell(r, g, rcn, r_min):
+    """One column at a time, as read off a plot."""
+    start = int(np.searchsorted(r, r_min))
+    peak = start + int(np.argmax(g[start:]))
+    half = g[peak] / 2.0
+    shell = dict(peak_r=r[peak], peak_height=g[peak])
+
+    left = [idx for idx in range(peak) if g[idx] < half]
+    right = [idx for idx in range(peak + 1, len(r)) if g[idx] < half]
+    shell['fwhm'] = np.nan
+    if left and right:
+        shell['fwhm'] = _crossing(r, g, right[0] - 1, half) - \
+            _crossing(r, g, left[-1], half)
+
+    minima = [
+        idx for idx in range(peak + 1, len(r) - 1) if g[idx] <= g[idx + 1]]
+    shell['min_r'] = shell['min_height'] = shell['coordination'] = np.nan
+    if minima:
+        shell['min_r'] = r[minima[0]]
+        shell['min_height'] = g[minima[0]]
+        shell['coordination'] = max(rcn[:minima[0] + 1])
+    return shell
+
+
+def _rows(table, data_file):
+    rows = table[table['data_file'] == data_file]
+    return rows.reset_index(drop=True)
+
+
+def test_shell_table_matches_loop():
+    frames = _frames()
+    table = rdf_shell_table(frames, r_min=1.0, cache_dir=None)
+    assert list(table.columns) == \
+        ['species', 'pair'] + SHELL_COLUMNS + ['data_file']
+    for frame in frames:
+        rows = table[table['data_file'] == frame.attrs['data_file']]
+        pairs = [
+            name[len('RDF_'):] for name in frame.columns
+            if name.startswith('RDF_')]
+        assert rows['pair'].tolist() == pairs
+        for pair, (_, row) in zip(pairs, rows.iterrows()):
+            expected = _first_shell(
+                frame['r'].values, frame['RDF_' + pair].values,
+                frame['RCN_' + pair].values, 1.0)
+            for name in SHELL_COLUMNS:
+                assert np.allclose(row[name], expected[name], equal_nan=True)
+
+
+def test_shell_table_cache_and_batches(tmp_path):
+    frames = _frames()
+    computed = rdf_shell_table(frames, r_min=1.0, cache_dir=None)
+    rdf_shell_table(frames, r_min=1.0, cache_dir=str(tmp_path))
+    cached = rdf_shell_table(frames, r_min=1.0, cache_dir=str(tmp_path))
+    assert cached.equals(computed)
+
+    # A file with fewer pairs is batched apart from the others.
+    frames[1] = frames[1][['r', 'RDF_Al-Oh', 'RCN_Al-Oh']]
+    frames[1].attrs['data_file'] = 'd2 subset'
+    mixed = rdf_shell_table(frames, r_min=1.0, cache_dir=None)
+    subset = mixed[mixed['data_file'] == 'd2 subset']
+    assert subset['pair'].tolist() == ['Al-Oh']
+    for idx in (0, 2, 3):
+        data_file = frames[idx].attrs['data_file']
+        assert _rows(mixed, data_file).equals(_rows(computed, data_file))
+
+
+def test_refined_gaussian_peak():
+    r = np.linspace(0.0, 6.0, 61)
+    center, sigma = 2.03, 0.2
+    g = 3.0 * np.exp(-(r - center) ** 2 / (2.0 * sigma ** 2)) + \
+        np.where(r > 3.0, 1.0 - np.exp(-(r - 3.0)), 0.0)
+    frame = pd.DataFrame({'r': r, 'RDF_Al-O': g, 'RCN_Al-O': np.cumsum(g)})
+    tensor = stack_rdfs([frame])
+    coarse = analyze_tensor(tensor)
+    fine = analyze_tensor(tensor, refine=20)
+    assert abs(coarse['peak_r'][0, 0] - center) > 0.02
+    assert abs(fine['peak_r'][0, 0] - center) < 0.005
+    assert abs(fine['fwhm'][0, 0] - 2.3548 * sigma) < 0.01
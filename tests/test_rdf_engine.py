@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from vis.rdf_engine import compute_rdf, pair_distances, read_xyz_frames
+
+
+def test_tiny_negative_coordinates_are_wrapped():
+    # np.mod(-1e-17, box) is box itself, which cKDTree rejects.
+    pytest.importorskip('scipy')
+    symbols = np.array(['O', 'H', 'H'])
+    positions = np.array([
+        [-1e-17, 1.0, 1.0],
+        [0.96, 1.0, 1.0],
+        [18.0, -1e-17, 1.0],
+    ])
+    rdf = compute_rdf(
+        [(symbols, positions, None)], ['O-H'], box=18.64, processes=1)
+    assert rdf['RCN_O-H'].iloc[-1] == 2.0
+
+    kdtree = pair_distances(positions, positions, 18.64, 4.0, use_scipy=True)
+    numpy = pair_distances(positions, positions, 18.64, 4.0, use_scipy=False)
+    assert np.allclose(np.sort(kdtree), np.sort(numpy))
+
+
+def test_empty_xyz_file(tmp_path):
+    path = tmp_path / 'empty.xyz'
+    path.write_text('')
+    with pytest.raises(ValueError):
+        list(read_xyz_frames(str(path)))
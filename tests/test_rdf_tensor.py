@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+from vis.utils import create_pandas_df
+from vis.rdf_tensor import stack_rdfs, layout_groups
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+NAMES = ['d1.RDF', 'd2.RDF', 'd3.RDF', 'd4.RDF']
+
+
+def _frames():
+    frames = list()
+    for idx, name in enumerate(NAMES):
+        frame = create_pandas_df(os.path.join(ROOT, 'data', name))
+        frame.attrs['data_file'] = name
+        frame.attrs['characteristics'] = {
+            'Aluminate Species': ('species {}'.format(idx),)}
+        frames.append(frame)
+    return frames
+
+
+def test_stack_matches_frames():
+    frames = _frames()
+    tensor = stack_rdfs(frames)
+    n_r = min(len(frame) for frame in frames)
+    assert tensor.rdf.shape == (len(frames), n_r, len(tensor.pairs))
+    assert tensor.labels == ['species {}'.format(idx) for idx in range(4)]
+    assert tensor.data_files == NAMES
+    for file_idx, frame in enumerate(frames):
+        for pair_idx, pair in enumerate(tensor.pairs):
+            assert np.array_equal(
+                tensor.rdf[file_idx, :, pair_idx],
+                frame['RDF_' + pair].values[:n_r])
+            assert np.array_equal(
+                tensor.rcn[file_idx, :, pair_idx],
+                frame['RCN_' + pair].values[:n_r])
+
+
+def test_reductions_match_loops():
+    tensor = stack_rdfs(_frames())
+    positions, heights = tensor.first_peaks(r_min=1.0)
+    for file_idx in range(len(tensor)):
+        for pair_idx in range(len(tensor.pairs)):
+            column = tensor.rdf[file_idx, :, pair_idx].copy()
+            column[tensor.r < 1.0] = -np.inf
+            assert heights[file_idx, pair_idx] == column.max()
+            assert positions[file_idx, pair_idx] == \
+                tensor.r[np.argmax(column)]
+    differences = tensor.differences()
+    assert np.array_equal(differences[1, 2], tensor.rdf[1] - tensor.rdf[2])
+    assert np.allclose(tensor.mean(), tensor.rdf.sum(axis=0) / len(tensor))
+
+    selected = tensor.select(files=['species 2', 0], pairs=tensor.pairs[-1:])
+    assert selected.labels == ['species 2', 'species 0']
+    assert np.array_equal(selected.rdf[:, :, 0], tensor.rdf[[2, 0], :, -1])
+
+
+def test_common_pairs_and_grids():
+    frames = _frames()
+    pair = [col for col in frames[0].columns if col.startswith('RDF_')][0]
+    frames[1] = frames[1][['r', pair, 'RCN_' + pair[len('RDF_'):]]]
+    assert stack_rdfs(frames).pairs == [pair[len('RDF_'):]]
+    assert layout_groups(frames) == [[0, 2, 3], [1]]
+
+    shifted = frames[2].copy()
+    shifted['r'] = shifted['r'] + 0.5
+    with pytest.raises(ValueError):
+        stack_rdfs([frames[0], shifted])
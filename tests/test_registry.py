@@ -0,0 +1,39 @@
+import os
+import json
+from vis.registry import get_dataset
+
+
+class Closable(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _load_closable(json_metadata_path):
+    return Closable()
+
+
+def _write_metadata(path, names):
+    metadata = dict(studies=[dict(assays=[dict(dataFiles=[
+        dict(name=name, type='Maxime-RDF') for name in names])])])
+    path.write_text(json.dumps(metadata))
+
+
+def test_reused_until_a_file_changes(tmp_path):
+    data_path = tmp_path / 'a.RDF'
+    data_path.write_text('# r\n1.0\n')
+    metadata_path = tmp_path / 'metadata.json'
+    _write_metadata(metadata_path, ['a.RDF'])
+
+    first = get_dataset(_load_closable, str(metadata_path))
+    assert get_dataset(_load_closable, str(metadata_path)) is first
+
+    data_path.write_text('# r\n1.0\n2.0\n')
+    stat = os.stat(str(data_path))
+    os.utime(str(data_path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = get_dataset(_load_closable, str(metadata_path))
+    assert second is not first
+    assert first.closed and not second.closed
@@ -0,0 +1,85 @@
+import os
+import json
+import shutil
+from vis.utils import (
+    load_metadata, data_file_paths, recorded_fingerprints, file_fingerprint,
+    read_rdf)
+from isa.scan import scan_directory, species_of, read_species_file
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _setup(tmp_path, monkeypatch):
+    """Copy the metadata and some new files under tmp_path."""
+    # The names of the repository metadata are relative to the root.
+    monkeypatch.chdir(ROOT)
+    metadata_path = str(tmp_path / 'metadata.json')
+    shutil.copy(os.path.join(ROOT, 'data', 'nmr_metadata.json'),
+                metadata_path)
+    new = tmp_path / 'new'
+    new.mkdir()
+    shutil.copy(os.path.join(ROOT, 'data', 'd1.RDF'), str(new / 'a.RDF'))
+    shutil.copy(os.path.join(ROOT, 'data', 'd1.AlO.PWS'), str(new / 'a.PWS'))
+    (new / 'b.RDF').write_text('not an RDF file\n')
+    (new / 'notes.txt').write_text('r,RDF_Al-Ob\n')
+    return metadata_path, str(new)
+
+
+def test_scan_registers_new_files(tmp_path, monkeypatch):
+    metadata_path, directory = _setup(tmp_path, monkeypatch)
+    before = data_file_paths(load_metadata(metadata_path))
+
+    added = scan_directory(
+        metadata_path, directory, max_workers=2,
+        species={'a.RDF': 'Al2O(OH)6 2-'})
+    rdf_path = os.path.join(directory, 'a.RDF')
+    pws_path = os.path.join(directory, 'a.PWS')
+    assert added == [
+        (pws_path, 'Maxime Vibrational Spectrum'), (rdf_path, 'Maxime-RDF')]
+
+    # Written relative to the metadata file, with their fingerprints.
+    with open(metadata_path) as f:
+        names = [
+            data_file['name'] for study in json.load(f)['studies']
+            for assay in study['assays'] for data_file in assay['dataFiles']]
+    assert 'new/a.RDF' in names and 'new/a.PWS' in names
+    metadata = load_metadata(metadata_path)
+    assert set(data_file_paths(metadata)) == \
+        set(before) | {rdf_path, pws_path}
+    recorded = recorded_fingerprints(metadata)
+    for path in (rdf_path, pws_path):
+        assert recorded[path] == file_fingerprint(path, rehash=True)
+
+    frames = read_rdf(
+        metadata_path, ['Aluminate Species'], cache_dir=None, lazy=False)
+    new_frames = [
+        frame for frame in frames if frame.attrs['data_file'] == rdf_path]
+    assert len(new_frames) == 1
+    characteristics = new_frames[0].attrs['characteristics']
+    assert characteristics['Aluminate Species'] == ('Al2O(OH)6 2-',)
+    assert set(characteristics['Inter-atom distances']) == {'Al-Ob', 'Al-Oh'}
+
+    # A second scan finds nothing new.
+    assert scan_directory(metadata_path, directory) == []
+
+
+def test_dry_run_and_patterns(tmp_path, monkeypatch):
+    metadata_path, directory = _setup(tmp_path, monkeypatch)
+    with open(metadata_path) as f:
+        content = f.read()
+    added = scan_directory(
+        metadata_path, directory, patterns=('*.RDF',), dry_run=True)
+    assert added == [(os.path.join(directory, 'a.RDF'), 'Maxime-RDF')]
+    with open(metadata_path) as f:
+        assert f.read() == content
+
+
+def test_species_of(tmp_path):
+    species_file = tmp_path / 'species.csv'
+    species_file.write_text('a.RDF,Al(OH)4- + Na+\nshort\nb.RDF,Al2O\n')
+    species = read_species_file(str(species_file))
+    assert species == {'a.RDF': 'Al(OH)4- + Na+', 'b.RDF': 'Al2O'}
+    assert species_of('/data/a.RDF', species) == 'Al(OH)4- + Na+'
+    assert species_of('/data/c.RDF', species) == 'c'
+    assert species_of('/data/c.RDF', 'Al(OH)4-') == 'Al(OH)4-'
+    assert species_of('/data/c.RDF') == 'c'
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+from scipy.integrate import cumulative_trapezoid, trapezoid
+from vis.utils import create_pandas_df
+from vis.structure_factor import (
+    sq_kernel, infer_density, structure_factor, sq_frames)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+NAMES = ['d1.RDF', 'd2.RDF', 'd3.RDF', 'd4.RDF']
+
+
+def _synthetic(densities):
+    """Damped oscillating g(r) and their exact running coordination."""
+    r = np.linspace(0.0, 12.0, 601)
+    rdf = np.empty((len(densities), len(r), 2))
+    rcn = np.empty_like(rdf)
+    for file_idx, rho in enumerate(densities):
+        for pair_idx in range(2):
+            peak = 1.8 + 0.3 * file_idx + 0.5 * pair_idx
+            g = np.where(
+                r < peak - 0.6, 0.0,
+                1.0 + np.exp(-(r - peak)) * np.cos(2.5 * (r - peak)))
+            rdf[file_idx, :, pair_idx] = np.clip(g, 0.0, None)
+            rcn[file_idx, :, pair_idx] = cumulative_trapezoid(
+                4.0 * np.pi * rho[pair_idx] * r ** 2 *
+                rdf[file_idx, :, pair_idx], r, initial=0.0)
+    return r, rdf, rcn
+
+
+def _frames():
+    frames = list()
+    for name in NAMES:
+        path = os.path.join(ROOT, 'data', name)
+        frame = create_pandas_df(path)
+        frame.attrs['data_file'] = path
+        frame.attrs['characteristics'] = {'Aluminate Species': (name,)}
+        frames.append(frame)
+    return frames
+
+
+def test_infer_density_recovers_rho():
+    densities = np.array([[0.03, 0.05], [0.1, 0.002]])
+    r, rdf, rcn = _synthetic(densities)
+    assert np.allclose(infer_density(r, rdf, rcn), densities)
+
+    # The steps where a truncated file has fallen back to zero are left
+    # out of the fit.
+    truncated = rcn.copy()
+    truncated[:, 450:] = 0.0
+    assert np.allclose(infer_density(r, rdf, truncated), densities)
+
+
+def test_structure_factor_matches_integral():
+    densities = np.array([[0.03, 0.05], [0.1, 0.002]])
+    r, rdf, rcn = _synthetic(densities)
+    q = np.linspace(0.5, 15.0, 30)
+    for window in (None, 'lorch'):
+        sq, rho = structure_factor(r, rdf, rcn, q=q, window=window)
+        damping = np.sinc(r / r[-1]) if window == 'lorch' else 1.0
+        for file_idx in range(len(densities)):
+            for pair_idx in range(2):
+                g = rdf[file_idx, :, pair_idx]
+                expected = [
+                    1.0 + 4.0 * np.pi * rho[file_idx, pair_idx] * trapezoid(
+                        r ** 2 * (g - 1.0) * np.sinc(value * r / np.pi) *
+                        damping, r)
+                    for value in q
+                ]
+                assert np.allclose(sq[file_idx, :, pair_idx], expected)
+    assert sq_kernel(r, q) is sq_kernel(r.copy(), q.copy())
+
+
+def test_sq_frames_cache_and_batches(tmp_path):
+    frames = _frames()
+    computed = sq_frames(frames, cache_dir=None)
+    cached = sq_frames(frames, cache_dir=str(tmp_path))
+    reloaded = sq_frames(frames, cache_dir=str(tmp_path))
+    for first, second, third in zip(computed, cached, reloaded):
+        assert first.equals(second) and first.equals(third)
+        assert first.attrs['density'] == third.attrs['density']
+    assert [result.attrs['data_file'] for result in reloaded] == \
+        [frame.attrs['data_file'] for frame in frames]
+
+    # A file with fewer pairs does not drop the pairs of the others.
+    frames[1] = frames[1][['r', 'RDF_Al-Ob', 'RCN_Al-Ob']]
+    frames[1].attrs['data_file'] = 'd2 subset'
+    mixed = sq_frames(frames, cache_dir=None)
+    assert list(mixed[1].columns) == ['q', 'S_Al-Ob']
+    for idx in (0, 2, 3):
+        assert mixed[idx].equals(computed[idx])
+    assert np.allclose(mixed[1]['S_Al-Ob'], computed[1]['S_Al-Ob'])
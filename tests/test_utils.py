@@ -0,0 +1,83 @@
+import os
+import json
+import shutil
+import numpy as np
+import pytest
+from vis.utils import load_metadata, data_file_paths
+from vis.vis_helper import create_dataframes
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_load_repository_metadata(monkeypatch):
+    # The names in data/nmr_metadata.json are relative to the root.
+    monkeypatch.chdir(ROOT)
+    paths = data_file_paths(load_metadata('data/nmr_metadata.json'))
+    assert paths
+    assert all(os.path.isfile(path) for path in paths)
+
+    dataframe = create_dataframes('data/nmr_metadata.json')
+    assert len(dataframe)
+    assert dataframe['doi'].notnull().any()
+
+
+def test_names_relative_to_metadata(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(ROOT, 'data', 'd1.RDF'), str(tmp_path))
+    metadata = dict(studies=[dict(assays=[dict(
+        dataFiles=[dict(name='d1.RDF', type='Maxime-RDF')])])])
+    metadata_path = tmp_path / 'metadata.json'
+    metadata_path.write_text(json.dumps(metadata))
+
+    monkeypatch.chdir(ROOT)
+    assert data_file_paths(load_metadata(str(metadata_path))) == [
+        str(tmp_path / 'd1.RDF')]
+
+
+def test_read_fixed_width_matches_loadtxt():
+    from vis.utils import read_fixed_width
+    path = os.path.join(ROOT, 'data', 'd1.el.PWS')
+    expected = np.loadtxt(path)
+    with open(path) as f:
+        names = f.readline().lstrip('#').split()
+    for block_size in [10, 1000, 1 << 24]:
+        columns, values = read_fixed_width(path, block_size=block_size)
+        assert columns == names
+        assert np.array_equal(values, expected[:, :len(names)])
+
+
+def test_read_fixed_width_errors(tmp_path):
+    from vis.utils import read_fixed_width
+    for text in ['', '# a b\n1 2\n3 x\n', '# a b\n1 2\n3\n']:
+        path = tmp_path / 'bad.RDF'
+        path.write_text(text)
+        with pytest.raises(ValueError):
+            read_fixed_width(str(path))
+
+
+def test_read_pws_matches_iter_pws():
+    from vis.utils import read_pws, iter_pws
+    path = os.path.join(ROOT, 'data', 'd1.AlO.PWS')
+    for downsample in [1, 3]:
+        streamed = np.vstack(list(
+            iter_pws(path, chunksize=999, downsample=downsample)))
+        assert np.allclose(read_pws(path, downsample=downsample).values,
+                           streamed)
+
+
+def test_iter_pws_chunks_and_downsampling():
+    from vis.utils import iter_pws
+    path = os.path.join(ROOT, 'data', 'd1.el.PWS')
+    expected = np.loadtxt(path)[:, :5]
+
+    chunks = list(iter_pws(path, chunksize=3000))
+    assert [len(chunk) for chunk in chunks] == [3000, 3000, 2000]
+    assert np.allclose(np.vstack(chunks), expected)
+
+    # Blocks of 7 rows never span two chunks, the last one is partial.
+    reduced = np.vstack(list(iter_pws(path, chunksize=100, downsample=7)))
+    n_full = len(expected) // 7
+    assert len(reduced) == n_full + 1
+    assert np.allclose(
+        reduced[:n_full],
+        expected[:n_full * 7].reshape(n_full, 7, -1).mean(axis=1))
+    assert np.allclose(reduced[-1], expected[n_full * 7:].mean(axis=0))
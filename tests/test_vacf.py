@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from vis.vacf import compute_vacf, power_spectrum, SPEED_OF_LIGHT
+
+SYMBOLS = np.array(['Al', 'O', 'O', 'H', 'O'])
+
+
+def _trajectory(n_frames, seed=0):
+    rng = np.random.RandomState(seed)
+    velocities = rng.normal(size=(n_frames, len(SYMBOLS), 3))
+    return velocities, [(SYMBOLS, frame, None) for frame in velocities]
+
+
+def test_vacf_matches_direct_lag_sum():
+    velocities, frames = _trajectory(53)
+    max_lag = 9
+    # Small blocks, so that lags span several blocks.
+    vacf = compute_vacf(frames, max_lag, block_size=7)
+    for name in ['Al', 'O', 'H']:
+        atoms = velocities[:, SYMBOLS == name]
+        expected = [
+            np.mean(np.sum(atoms[:len(atoms) - lag] * atoms[lag:], axis=2))
+            / 3.0
+            for lag in range(max_lag)
+        ]
+        assert np.allclose(vacf[name].values, expected)
+
+
+def test_column_names_are_str():
+    _, frames = _trajectory(20)
+    vacf = compute_vacf(frames, 5)
+    spectrum = power_spectrum(vacf, dt=1.0)
+    assert list(vacf.columns) == ['lag', 'Al', 'O', 'H']
+    assert list(spectrum.columns) == ['wavenb', 'Al', 'O', 'H']
+    assert all(type(name) is str for name in spectrum.columns)
+
+
+def test_power_spectrum_peak():
+    # A VACF oscillating at 1000 cm-1 gives a peak there.
+    dt = 1.0
+    lags = np.arange(4000)
+    frequency = 1000.0 * SPEED_OF_LIGHT * 1e-15
+    vacf = dict(lag=lags, Al=np.cos(2 * np.pi * frequency * lags * dt))
+    spectrum = power_spectrum(pd.DataFrame(vacf), dt=dt)
+    peak = spectrum['wavenb'].values[np.argmax(spectrum['Al'].values)]
+    assert abs(peak - 1000.0) < 5.0
@@ -1 +1,61 @@
-test_vis_helper
\ No newline at end of file
+import numpy as np
+import pandas as pd
+from vis.vis_helper import (
+    build_code_cache, palette_lookup, bin_indices, downcast_column,
+    optimize_dtypes)
+
+
+def test_code_cache_matches_direct_codes():
+    rng = np.random.RandomState(0)
+    frame = pd.DataFrame(dict(
+        ion=rng.choice(['Na+', 'K+', None], 200),
+        value=rng.uniform(0, 10, 200),
+    ))
+    codes = build_code_cache(frame, ['ion'], ['value'], 5)
+    assert np.array_equal(codes['ion'], frame['ion'].factorize()[0])
+    assert np.array_equal(
+        codes['value'], pd.qcut(frame['value'].values, 5).codes)
+
+
+def test_palette_lookup_matches_indexing():
+    palette = ['a', 'b', 'c']
+    codes = np.array([0, 2, 1, -1, 0])
+    assert list(palette_lookup(codes, palette)) == \
+        [palette[code] for code in codes]
+
+
+def test_bin_indices_match_histogram():
+    rng = np.random.RandomState(1)
+    values = np.concatenate([
+        rng.normal(size=500), [np.nan, -10.0, 10.0, -3.0, 3.0]])
+    edges = np.linspace(-3.0, 3.0, 13)
+    n_bins = len(edges) - 1
+    indices = bin_indices(values, edges)
+    for subset in [np.arange(len(values)), rng.choice(len(values), 100)]:
+        counts = np.bincount(
+            indices[subset], minlength=n_bins + 1)[:n_bins]
+        finite = values[subset][~np.isnan(values[subset])]
+        assert np.array_equal(counts, np.histogram(finite, bins=edges)[0])
+
+
+def test_downcast_keeps_inexact_floats():
+    measured = pd.Series([535.1, 540.25, np.nan])
+    assert downcast_column(measured).dtype == np.float64
+    assert downcast_column(measured, decimals=2).dtype == np.float32
+    assert downcast_column(pd.Series([0.5, 1.25, np.nan])).dtype == \
+        np.float32
+    assert downcast_column(pd.Series([25.0, 50.0])).dtype == np.int8
+
+
+def test_optimize_dtypes_keeps_values():
+    frame = pd.DataFrame(dict(
+        counter_ion=['Na+', 'K+', 'Na+'],
+        Al_ppm=[80.1, 79.3, np.nan],
+        temperature=[25.0, 50.0, 75.0],
+    ))
+    optimized = optimize_dtypes(frame)
+    assert optimized['counter_ion'].dtype == 'category'
+    assert optimized['temperature'].dtype == np.int8
+    pd.testing.assert_frame_equal(
+        optimized.astype(dict(counter_ion=object, temperature=np.float64)),
+        frame)
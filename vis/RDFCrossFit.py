@@ -10,17 +10,21 @@ This application will create an interactive Bokeh application.
 import os
 import sys
 import collections
+import numpy as np
 # Bokeh imports
 from bokeh.plotting import figure
 from bokeh.layouts import layout, widgetbox, row, column
 from bokeh.client import push_session
-from bokeh.models import ColumnDataSource, HoverTool
-from bokeh.models.widgets import MultiSelect, CheckboxGroup, Div
-from bokeh.palettes import linear_palette, viridis
+from bokeh.models import ColumnDataSource, HoverTool, Range1d
+from bokeh.models.widgets import (
+    MultiSelect, CheckboxGroup, RadioButtonGroup, Div)
+from bokeh.palettes import viridis
 from bokeh.io import curdoc
 # Local, relative module imports
 sys.path.append(os.getcwd())
-from vis.utils import read_rdf
+from vis.registry import get_rdf_frames, get_catalog
+from vis.decimate import decimate
+from vis.structure_factor import sq_frames
 
 # Create the static HTML divs.
 app_intro_div = Div(
@@ -30,12 +34,19 @@ app_intro_div = Div(
         "rdf_title.html")).read(), width=800
 )
 
-# From the metadata, load the desired data into pandas dataframes.
-# Each dataframe has an attribute attached by the read_rdf function.
+# From the metadata, get a handle on each RDF data file. A handle only
+# reads its file when the frame is plotted, and the handles are shared
+# by every session of the server process.
+# Each handle has an attribute attached by the read_rdf function.
 # This characteristics attribute is a dictioary of values. The entires
 # for 'Inter-atom distances' are the bonds within that dataframe.
 metadata_path = os.path.join(os.getcwd(), 'metadata.json')
-dataframes = read_rdf(metadata_path, char_types=['Aluminate Species'])
+dataframes = get_rdf_frames(
+    metadata_path, char_types=['Aluminate Species'], catalog=True)
+
+# The frames of the assays matching a selection are looked up by their
+# data file.
+frames_by_file = {frame.data_file: frame for frame in dataframes}
 
 # Since we can se all the bonds and species at this point, we can build
 # the input lists options. First create an empty dictionary. A collections
@@ -76,6 +87,17 @@ bonds_grp = CheckboxGroup(
     # bonds_grp.active gives the index list of those items selected.
 )
 
+# The plotted function, the RDFs or their structure factors S(q).
+VIEWS = [
+    # (label, x column, y column prefix, hover label)
+    ('g(r)', 'r', 'RDF_', 'Radius'),
+    ('S(q)', 'q', 'S_', 'q'),
+]
+view_sel = RadioButtonGroup(
+    labels=[view[0] for view in VIEWS],
+    active=0,
+)
+
 
 def select_RDFs():
     """
@@ -93,20 +115,22 @@ def select_RDFs():
     # Build the current bonds
     bonds_l = [curr_bnds_labels[ii] for ii in bonds_active_index]
 
-    for frame in dataframes:
-        # Get the frame's compound.
-        df_species = frame.characteristics['Aluminate Species'][0]
-        # Get the selected compound.
-        # active_cmpd_l = data_source.data['active'] PROBLEM <--
-        active_cmpd_l = compound_sel.value
-        print('Checking frame: {}'.format(frame.keys()))
-        print('df_species', df_species)
-        print('active_cmpd_l', active_cmpd_l)
-        if df_species in active_cmpd_l and\
-            bool(
-                set(bonds_l) &
-                set(frame.characteristics['Inter-atom distances'])):
-            displayed_df_l.append(frame)
+    # Get the selected compound.
+    # active_cmpd_l = data_source.data['active'] PROBLEM <--
+    active_cmpd_l = compound_sel.value
+
+    # Find the assays of the selected compounds having one of the selected
+    # bonds, the cost depends on the matches rather than on all assays.
+    # The catalog is asked for each time, as it is closed and replaced
+    # when the metadata changes.
+    characteristic_index = get_catalog(metadata_path)
+    assay_ids = characteristic_index.query({
+        'Aluminate Species': active_cmpd_l,
+        'Inter-atom distances': bonds_l,
+    })
+    for data_file in characteristic_index.data_files(assay_ids):
+        if data_file in frames_by_file:
+            displayed_df_l.append(frames_by_file[data_file])
 
     # From this, set the data_source active column to the active frames
     data_source.data = dict(active=displayed_df_l)
@@ -114,10 +138,152 @@ def select_RDFs():
     return
 
 
+# One figure per view, created once by create_figures(). Each holds a
+# hidden line for every file and bond, so changing the selection or the
+# view only toggles visibility and fills the sources of newly shown
+# lines, instead of sending a new figure to the browser.
+figures = list()
+# (view index, data file, bond) -> (line renderer, source)
+lines = dict()
+# (view index, data file) -> full resolution frame of the view. Only a
+# decimated copy matching the visible x range is sent to the browser, it
+# is recomputed from these frames whenever the x range changes.
+plotted_frames = dict()
+# View index -> the lines its ranges were last fitted to.
+fitted_lines = dict()
+
+# Line dash of each bond of a file, the color tells the files apart.
+LINE_DASHES = ['solid', 'dashed', 'dotted', 'dotdash', 'dashdot']
+
+
+def fill_source(view_idx, data_file, bond):
+    """
+    Decimate the column of a line to the current x range of its figure,
+    keeping about two points per horizontal pixel.
+    """
+    _, x, prefix, _ = VIEWS[view_idx]
+    fig = figures[view_idx]
+    _, source = lines[(view_idx, data_file, bond)]
+    source.data = decimate(
+        plotted_frames[(view_idx, data_file)], x, [prefix + bond],
+        n_buckets=fig.plot_width, start=fig.x_range.start,
+        end=fig.x_range.end)
+    return
+
+
+def full_extent(keys):
+    """
+    Return the (x start, x end, y start, y end) of the full resolution
+    columns of the given lines, or None if none of them is loaded.
+    """
+    xs = list()
+    ys = list()
+    for view_idx, data_file, bond in keys:
+        frame = plotted_frames.get((view_idx, data_file))
+        _, x, prefix, _ = VIEWS[view_idx]
+        if frame is None or prefix + bond not in frame:
+            continue
+        xs.append(np.asarray(frame[x], dtype=np.float64))
+        ys.append(np.asarray(frame[prefix + bond], dtype=np.float64))
+    if not xs:
+        return None
+    xs = np.concatenate(xs)
+    ys = np.concatenate(ys)
+    return np.nanmin(xs), np.nanmax(xs), np.nanmin(ys), np.nanmax(ys)
+
+
+def fit_ranges(view_idx, keys):
+    """
+    Set the ranges of the figure of a view to the full extent of the
+    given lines. The sources only hold the points of the visible x
+    range, so automatic ranges, or a reset to them, would fit the last
+    zoomed window instead of the whole curves.
+    """
+    extent = full_extent(keys)
+    if extent is None:
+        return
+    fig = figures[view_idx]
+    for fig_range, start, end in [
+            (fig.x_range, extent[0], extent[1]),
+            (fig.y_range, extent[2], extent[3])]:
+        fig_range.start = start
+        fig_range.end = end
+        # The reset tool goes back to these, in the Bokeh versions that
+        # have them.
+        if 'reset_start' in fig_range.properties():
+            fig_range.reset_start = start
+            fig_range.reset_end = end
+    return
+
+
+def refresh_sources(view_idx):
+    """Re-decimate every visible line of a view to its x range."""
+    for (line_view, data_file, bond), (renderer, _) in lines.items():
+        if line_view == view_idx and renderer.visible:
+            fill_source(view_idx, data_file, bond)
+    return
+
+
 def create_figures():
     """
-    Creates the figure to be returned. Right now this function is in
-    a testing state, and much of it should change.
+    Creates the figure of each view, with a hidden line for every bond
+    of every file. show_lines() then picks the figure and lines shown.
+    """
+
+    # Declare the colors to be used, one per file.
+    color_break = viridis(len(dataframes))
+
+    for view_idx, (label, x, prefix, x_label) in enumerate(VIEWS):
+
+        # Declare the figure, with explicit ranges covering the loaded
+        # frames of the view, see fit_ranges().
+        extent = full_extent([
+            (view_idx, df.data_file, bond) for df in dataframes
+            for bond in df.characteristics['Inter-atom distances']])
+        if extent is None:
+            extent = (0.0, 1.0, 0.0, 1.0)
+        fig = figure(
+            width=800, title=label,
+            x_range=Range1d(extent[0], extent[1]),
+            y_range=Range1d(extent[2], extent[3]))
+
+        # Add the hover tool:
+        # TODO: needs to take from the characteristics metadata dict.
+        fig.add_tools(HoverTool(tooltips=[
+            (x_label, "@" + x),
+        ]))
+
+        for idx, df in enumerate(dataframes):
+            bonds = df.characteristics['Inter-atom distances']
+            for bond_idx, bond in enumerate(bonds):
+                source = ColumnDataSource(data={x: [], prefix + bond: []})
+                renderer = fig.line(  # Draw a line plot
+                    source=source,
+                    x=x,
+                    y=prefix + bond,
+                    legend=df.characteristics['Aluminate Species'][0],
+                    color=color_break[idx],
+                    line_dash=LINE_DASHES[bond_idx % len(LINE_DASHES)],
+                    line_width=1.5,
+                    visible=False,
+                )
+                lines[(view_idx, df.data_file, bond)] = (renderer, source)
+
+        # Serve finer detail when the user zooms or pans.
+        fig.x_range.on_change(
+            'start', lambda attr, old, new, v=view_idx: refresh_sources(v))
+        fig.x_range.on_change(
+            'end', lambda attr, old, new, v=view_idx: refresh_sources(v))
+
+        figures.append(fig)
+
+    return figures
+
+
+def show_lines():
+    """
+    Shows the figure of the selected view and, in it, the lines of the
+    active frames and selected bonds.
     """
 
     # Get the current/active compounds from data_source.data.active
@@ -129,70 +295,38 @@ def create_figures():
     # Get the selected bonds to be plotted:
     bonds_l = [curr_bnds_labels[ii] for ii in bonds_active_index]
 
-    # Declare the figure:
-    fig = figure(width=800)
-
-    # Add the hover tool:
-    # TODO: needs to take from the characteristics metadata dict.
-    fig.add_tools(HoverTool(tooltips=[
-        ("Radius", "@r"),
-    ]))
-
-    # Declare the colors to be used:
-    # TODO: look for a more robust way to handle colors
-    # To generate an intuitive color palette:
-    # Each dataframes should each have a
-    df_count = len(active_frames)
-
-    # Create sub-sets of colors, outputs a list of colors
-    color_break = viridis(df_count)
-
-    # enumerate through the data frames to be used and the index value.
-    # enumerate() is used as zip() failes when there is only one item.
-    for idx, df in enumerate(active_frames):
-
-        # Declare the source from the current frame:
-        fig_source = ColumnDataSource(df)
-
-        # Count the number of bonds to generate the color sub-set
-        bond_count = len(bonds_l)
-        # Get the 'pair' or range of color palettes to use
-        if idx == 0:
-            col_start = 0
-            col_end = 1
-        else:
-            col_start = idx - 1
-            col_end = idx
-        # use the start and end to generate intermediate colors.
-        bond_pallet = linear_palette(
-            color_break[col_start:col_end], bond_count)
-
-        # Iterate over the bonds selected.
-        # TODO: iterates over all available bonds, rather than the selected
-        for idxx, bond in enumerate(bonds_l):
-
-            # Count the number of bonds for color generation
-            bond_color = bond_pallet[idx]
-
-            active_bond = 'RDF_' + bond
-            fig.line(  # Draw a line plot
-                source=fig_source,
-                x='r',
-                y=active_bond,
-                legend=df.characteristics['Aluminate Species'][0],
-                color=bond_color,
-                line_width=1.5
-            )
-
-            fig.circle(  # Draw a circle/dot plot
-                source=fig_source,
-                x='r',
-                y=active_bond,
-                legend=df.characteristics['Aluminate Species'][0],
-                color=bond_color,
-            )
-
-    return fig
+    # Get the frames of the view not loaded yet. The structure factors
+    # of these files are computed together, and cached by file content.
+    view_idx = view_sel.active
+    new_frames = [
+        df for df in active_frames
+        if (view_idx, df.data_file) not in plotted_frames
+    ]
+    if VIEWS[view_idx][1] == 'q':
+        loaded = sq_frames(new_frames)
+    else:
+        loaded = [df.frame for df in new_frames]
+    for df, frame in zip(new_frames, loaded):
+        plotted_frames[(view_idx, df.data_file)] = frame
+
+    shown = set(
+        (view_idx, df.data_file, bond)
+        for df in active_frames for bond in bonds_l)
+    # A new selection is shown whole, zooming keeps the fitted ranges.
+    refit = bool(shown) and fitted_lines.get(view_idx) != shown
+    if refit:
+        fit_ranges(view_idx, shown)
+        fitted_lines[view_idx] = shown
+    for key, (renderer, _) in lines.items():
+        if key in shown and (refit or not renderer.visible):
+            # The x range may have changed while the line was hidden.
+            fill_source(*key)
+        renderer.visible = key in shown
+
+    for idx, fig in enumerate(figures):
+        fig.visible = idx == view_idx
+
+    return
 
 
 # Create a widget box for the inputs to be carried in.
@@ -201,7 +335,8 @@ sizing_mode = 'fixed'
 
 # Create a widget box for the static widgets, and one for the dynamnic.
 static_widgets = widgetbox(compound_sel, width=400, height=100)
-dynamnic_widgets = widgetbox(bonds_grp, sizing_mode=sizing_mode)
+dynamnic_widgets = widgetbox(
+    view_sel, bonds_grp, sizing_mode=sizing_mode)
 
 
 def create_div():
@@ -221,7 +356,7 @@ def create_div():
     return div
 
 
-def create_layout(fig, div):
+def create_layout(figs, div):
     """
     Creates the layout of the application. This funciton controls where
     the created objects appear on the webpage. This function should take
@@ -230,7 +365,7 @@ def create_layout(fig, div):
     my_layout = layout([
         [app_intro_div],
         [static_widgets, dynamnic_widgets],
-        [fig, div],
+        figs + [div],
     ], sizing_mode=sizing_mode)
 
     return my_layout
@@ -251,6 +386,9 @@ def update():
     select_RDFs()
     # data_source.data.active = compound_sel.value
 
+    # Show the lines of the new selection and view.
+    show_lines()
+
     return
 
 
@@ -276,17 +414,17 @@ def click_update(new):
 
 compound_sel.on_change('value', selector_update)
 bonds_grp.on_click(click_update)
+view_sel.on_click(click_update)
 
 # INITIALIZE THE APPLICATION
-select_RDFs()
-# Create the figures based on the retrieved dataframe list.
-initial_fig = create_figures()
+# Create the figures of every view, their lines are hidden until shown.
+create_figures()
 # Create the new info div
 initial_div = create_div()
-# Add the new layout to the curdoc() function.
+# Select the dataframes and show their lines.
 update()
 
-curdoc().add_root(create_layout(initial_fig, initial_div))
+curdoc().add_root(create_layout(figures, initial_div))
 
 # Run update to load the default dataset
 curdoc().title = "RDV Viewer"
@@ -1,90 +1,75 @@
 
 import pandas as pd
 import numpy as np
-import json
 import os
+import sys
 import bokeh
 
 from bokeh.layouts import row, widgetbox
 from bokeh.palettes import Spectral5
 from bokeh.io import output_notebook, output_file, save
 import bokeh.plotting as bk
-from bokeh.models import Select
+from bokeh.models import ColumnDataSource, Select
 from bokeh.plotting import curdoc, figure
+# Add the parent path so that bokeh --serve can see the `vis`
+# module and import it.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.registry import get_dataframes, get_code_cache
+from vis.vis_helper import palette_lookup
 
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
-    # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as f:
-        metadata = json.load(f)
-    # create a dataframes for each csv found
-    dataFrame_list = []
-    for study in metadata['studies']:
-        # Store the doi/link
-        for publication in study['publications']:
-            doi = publication['doi']
-        for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                data = pd.read_csv(filename['name'])
-                data['doi'] = doi
-                dataFrame_list.append(data)
-    return pd.concat(dataFrame_list, ignore_index=True)
-
-data = create_dataframes('data/nmr_metadata.json')
-data['counter_ion'].factorize()
-colormap = {
-    'Na+': '#0072B2',
-    'Li+': '#56B4E9',
-    'K+': '#E69F00',
-    'Cs+': '#009E73',
-}
-data['ion_colors'] = [colormap[x] for x in data['counter_ion']]
+
+data = get_dataframes('data/nmr_metadata.json')
 
 SIZES = list(range(6, 22, 3))
 COLORS = Spectral5
 
 columns = sorted(data.columns)
-discrete = [x for x in columns if data[x].dtype == object]
+discrete = [x for x in columns if not pd.api.types.is_numeric_dtype(data[x])]
 continuous = [x for x in columns if x not in discrete]
 quantileable = [x for x in continuous if len(data[x].unique()) > 5]
 
-def create_figure():
-    xs = data[x.value].values
-    ys = data[y.value].values
-    x_title = x.value.title()
-    y_title = y.value.title()
+# Quantile codes of the size columns, computed once.
+size_columns = ['Al_concentration', 'OH_concentration']
+codes = get_code_cache('data/nmr_metadata.json', [], size_columns, len(SIZES))
+
+# One source for the session, widget changes replace its columns in place.
+source = ColumnDataSource(data=dict(x=[], y=[], size=[]))
 
-    kw = dict()
-    if x.value in discrete:
-        kw['x_range'] = sorted(set(xs))
-    if y.value in discrete:
-        kw['y_range'] = sorted(set(ys))
-    kw['title'] = "%s vs %s" % (x_title, y_title)
+def point_sizes():
+    if size.value == 'None':
+        return [9] * len(data)
+    return palette_lookup(codes[size.value], SIZES)
 
-    p = figure(plot_height=600, plot_width=800, tools='pan,box_zoom,reset', **kw)
-    p.xaxis.axis_label = x_title
-    p.yaxis.axis_label = y_title
+def create_figure():
+    # The axes only ever hold continuous columns, so the figure is created
+    # once and its source is updated afterwards.
+    p = figure(plot_height=600, plot_width=800, tools='pan,box_zoom,reset', title='')
 
     # if x.value in discrete:
     #     p.xaxis.major_label_orientation = pd.np.pi / 4
 
-    sz = 9
-    if size.value != 'None':
-        groups = pd.qcut(data[size.value].values, len(SIZES), duplicates='drop')
-        sz = [SIZES[xx] for xx in groups.codes]
-
     c = "#31AADE"
     # if color.value != 'None':
     #     groups = pd.qcut(data[color.value].values, len(COLORS), duplicates='drop')
     #     c = [COLORS[xx] for xx in groups.codes]
 
-        
-    p.circle(x=xs, y=ys, color=c, size=sz, line_color="white", alpha=0.6, hover_color='white', hover_alpha=0.5)
+    p.circle(x='x', y='y', color=c, size='size', source=source, line_color="white", alpha=0.6, hover_color='white', hover_alpha=0.5)
 
     return p
 
-def update(attr, old, new):
-    layout.children[1] = create_figure()
+def update_axes(attr, old, new):
+    x_title = x.value.title()
+    y_title = y.value.title()
+    plot.title.text = "%s vs %s" % (x_title, y_title)
+    plot.xaxis.axis_label = x_title
+    plot.yaxis.axis_label = y_title
+    # Both columns are replaced in a single change event.
+    source.data.update(x=data[x.value].values, y=data[y.value].values)
+
+def update_size(attr, old, new):
+    source.data['size'] = point_sizes()
 
 
 x = Select(title='X-Axis', value='OH_concentration', 
@@ -95,7 +80,7 @@ x = Select(title='X-Axis', value='OH_concentration',
         'CI_concentration',
         'wavelength'
         ])
-x.on_change('value', update)
+x.on_change('value', update_axes)
 
 y = Select(title='Y-Axis', value='Al_ppm', 
     options=[
@@ -105,11 +90,11 @@ y = Select(title='Y-Axis', value='Al_ppm',
         'CI_concentration',
         'wavelength'
         ])
-y.on_change('value', update)
+y.on_change('value', update_axes)
 
 size = Select(title='Size', value='None', 
-    options=['Al_concentration', 'OH_concentration', 'None'])
-size.on_change('value', update)
+    options=size_columns + ['None'])
+size.on_change('value', update_size)
 
 # color = Select(title='Color', value='None', 
 #     options=['ion_colors', 'Al_ppm'])
@@ -117,7 +102,10 @@ size.on_change('value', update)
 
 # controls = widgetbox([x, y, color, size], width=200)
 controls = widgetbox([x, y, size], width=200)
-layout = row(controls, create_figure())
+source.data = dict(x=data[x.value].values, y=data[y.value].values, size=point_sizes())
+plot = create_figure()
+update_axes('value', None, None)
+layout = row(controls, plot)
 
 curdoc().add_root(layout)
 curdoc().title = "Aluminate Crossfilter"
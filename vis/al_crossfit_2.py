@@ -1,34 +1,20 @@
-import pandas as pd
-import json
+import os
+import sys
 
 from bokeh.plotting import figure
 from bokeh.models import ColumnDataSource, HoverTool, Div
 from bokeh.models.widgets import Select
 from bokeh.layouts import layout, widgetbox
 from bokeh.io import curdoc
+# Add the parent path so that bokeh --serve can see the `vis`
+# module and import it.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.registry import get_dataframes
 
 
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
-    # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as f:
-        metadata = json.load(f)
-    # create a dataframes for each csv found
-    data_frame_list = []
-    for study in metadata['studies']:
-        # Store the doi/link
-        for publication in study['publications']:
-            doi = publication['doi']
-        for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                data = pd.read_csv(filename['name'])
-                data['doi'] = doi
-                data_frame_list.append(data)
-    return pd.concat(data_frame_list, ignore_index=True)
-
-
-al_data_frame = create_dataframes('data/nmr_metadata.json')
-al_data_frame["counter_ion"].factorize()
+al_data_frame = get_dataframes('data/nmr_metadata.json')
 
 # Create an empty column data source to be used by the plot.
 source = ColumnDataSource(
@@ -1,29 +1,16 @@
 import pandas as pd
 import numpy as np
-import json
 import os
+import sys
 import bokeh
 from bokeh.io import output_notebook, output_file
 import bokeh.plotting as bk
-
-
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
-    # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as f:
-        metadata = json.load(f)
-    # create a dataframes for each csv found
-    dataFrame_list = []
-    for study in metadata['studies']:
-        # Store the doi/link
-        for publication in study['publications']:
-            doi = publication['doi']
-        for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                df = pd.read_csv(filename['name'])
-                df['doi'] = doi
-                dataFrame_list.append(df)
-    return pd.concat(dataFrame_list, ignore_index=True)
+# Add the parent path so that the script can see the `vis`
+# module and import it.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.vis_helper import create_dataframes
 
 
 data = create_dataframes('data/nmr_metadata.json')
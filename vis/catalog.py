@@ -0,0 +1,414 @@
+"""
+=======================
+SQLite Metadata Catalog
+=======================
+
+A SQLite copy of an ISA-JSON investigation (as written by
+isa.generateISA.create_metadata), for metadata too large to walk as a
+dictionary. The catalog holds one table per kind of entry:
+
+    studies             identifier, title and description,
+    publications        DOI, title and authors of each study publication,
+    assays              study, measurement and technology type,
+    data_files          name, type and recorded sha1 of each data file,
+    characteristics     termSource and annotationValue of the assay
+                        characteristic categories,
+
+with indexes on (termSource, annotationValue) and on the DOI, so finding
+e.g. the assays of some species with some bonds is an indexed query.
+
+MetadataCatalog answers the queries of isa_index.CharacteristicIndex
+(query, characteristics, data_files, values) with the same assay ids,
+the assays being numbered in the order they appear in the metadata, so
+utils.read_rdf() accepts either as its index.
+
+The database is kept in the cache directory, and rebuilt when the size
+or modification time of the metadata file changes.
+
+Run from the repository root:
+
+    python -m vis.catalog metadata.json \\
+        [--where 'Aluminate Species=(OH)2Al-O2-Al(OH)2- + 181 H2O + 2 Na+']
+"""
+
+import os
+import sqlite3
+import hashlib
+import argparse
+import threading
+import collections
+from vis.utils import CACHE_DIR, load_metadata, recorded_fingerprint
+from vis.isa_index import Characteristics
+
+# Version of the tables below, a catalog of another version is rebuilt.
+SCHEMA_VERSION = '1'
+
+SCHEMA = """
+CREATE TABLE catalog_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE studies (
+    study_id INTEGER PRIMARY KEY,
+    identifier TEXT,
+    title TEXT,
+    description TEXT
+);
+CREATE TABLE publications (
+    publication_id INTEGER PRIMARY KEY,
+    study_id INTEGER REFERENCES studies,
+    doi TEXT,
+    title TEXT,
+    author_list TEXT,
+    pubmed_id TEXT
+);
+CREATE TABLE assays (
+    assay_id INTEGER PRIMARY KEY,
+    study_id INTEGER REFERENCES studies,
+    measurement_type TEXT,
+    technology_type TEXT
+);
+CREATE TABLE data_files (
+    data_file_id INTEGER PRIMARY KEY,
+    assay_id INTEGER REFERENCES assays,
+    name TEXT,
+    type TEXT,
+    sha1 TEXT
+);
+CREATE TABLE characteristics (
+    assay_id INTEGER REFERENCES assays,
+    position INTEGER,
+    term_source TEXT,
+    annotation_value TEXT
+);
+CREATE INDEX characteristics_value
+    ON characteristics (term_source, annotation_value);
+CREATE INDEX characteristics_assay ON characteristics (assay_id);
+CREATE INDEX publications_doi ON publications (doi);
+CREATE INDEX publications_study ON publications (study_id);
+CREATE INDEX assays_measurement ON assays (measurement_type);
+CREATE INDEX data_files_assay ON data_files (assay_id);
+"""
+
+# Most values bound in a single statement, below the SQLite limit.
+MAX_PARAMETERS = 500
+
+
+def _annotation_value(annotation):
+    """annotationValue of an ontology annotation dictionary, or None."""
+    return (annotation or {}).get('annotationValue')
+
+
+def _metadata_state(json_metadata_path):
+    """(size, mtime_ns) of the metadata file, as strings."""
+    stat = os.stat(json_metadata_path)
+    return str(stat.st_size), str(stat.st_mtime_ns)
+
+
+def default_database_path(json_metadata_path, cache_dir=CACHE_DIR):
+    """Catalog path in cache_dir for a metadata file."""
+    digest = hashlib.sha1(
+        os.path.abspath(json_metadata_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'catalog-{}.sqlite'.format(digest))
+
+
+def _rows(metadata):
+    """
+    Yield (table, row) for every entry of the metadata, the ids being
+    numbered in the order of the metadata.
+    """
+    assay_id = 0
+    data_file_id = 0
+    publication_id = 0
+    for study_id, study in enumerate(metadata['studies']):
+        yield 'studies', (
+            study_id, study.get('identifier'), study.get('title'),
+            study.get('description'))
+        for publication in study.get('publications', []):
+            yield 'publications', (
+                publication_id, study_id, publication.get('doi'),
+                publication.get('title'), publication.get('authorList'),
+                publication.get('pubMedID'))
+            publication_id += 1
+        for assay in study['assays']:
+            yield 'assays', (
+                assay_id, study_id,
+                _annotation_value(assay.get('measurementType')),
+                _annotation_value(assay.get('technologyType')))
+            for position, char in enumerate(
+                    assay['characteristicCategories']):
+                yield 'characteristics', (
+                    assay_id, position,
+                    char['characteristicType']['termSource'],
+                    char['characteristicType']['annotationValue'])
+            for data_file in assay['dataFiles']:
+                fingerprint = recorded_fingerprint(data_file)
+                yield 'data_files', (
+                    data_file_id, assay_id, data_file['name'],
+                    data_file.get('type'),
+                    fingerprint[2] if fingerprint else None)
+                data_file_id += 1
+            assay_id += 1
+
+
+def build_catalog(json_metadata_path, database_path):
+    """
+    Write the catalog of a metadata file to database_path. The database
+    is written under a temporary name and moved into place, so readers
+    never see a partial catalog.
+    """
+    size, mtime_ns = _metadata_state(json_metadata_path)
+    metadata = load_metadata(json_metadata_path)
+
+    directory = os.path.dirname(os.path.abspath(database_path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = database_path + '.{}.tmp'.format(os.getpid())
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(SCHEMA)
+        # Group the rows by table, one executemany per table.
+        tables = collections.defaultdict(list)
+        for table, row in _rows(metadata):
+            tables[table].append(row)
+        for table, rows in tables.items():
+            connection.executemany(
+                'INSERT INTO {0} VALUES ({1})'.format(
+                    table, ', '.join('?' * len(rows[0]))),
+                rows)
+        connection.executemany(
+            'INSERT INTO catalog_info VALUES (?, ?)', [
+                ('schema_version', SCHEMA_VERSION),
+                ('metadata_path', os.path.abspath(json_metadata_path)),
+                ('metadata_size', size),
+                ('metadata_mtime_ns', mtime_ns),
+            ])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, database_path)
+    return
+
+
+def _is_current(json_metadata_path, database_path):
+    """True if the catalog exists and matches the metadata file."""
+    if not os.path.exists(database_path):
+        return False
+    try:
+        connection = sqlite3.connect(database_path)
+        try:
+            info = dict(connection.execute(
+                'SELECT key, value FROM catalog_info'))
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError:
+        return False
+    size, mtime_ns = _metadata_state(json_metadata_path)
+    return info.get('schema_version') == SCHEMA_VERSION and \
+        info.get('metadata_size') == size and \
+        info.get('metadata_mtime_ns') == mtime_ns
+
+
+def open_catalog(json_metadata_path, database_path=None, cache_dir=CACHE_DIR):
+    """
+    Return the MetadataCatalog of a metadata file, building it first if
+    it is missing or older than the metadata. By default the database is
+    kept in cache_dir, see default_database_path().
+    """
+    if database_path is None:
+        database_path = default_database_path(
+            json_metadata_path, cache_dir=cache_dir)
+    if not _is_current(json_metadata_path, database_path):
+        build_catalog(json_metadata_path, database_path)
+    return MetadataCatalog(database_path)
+
+
+def _placeholders(values):
+    """'?, ?, ...' for the values of an IN clause."""
+    return ', '.join('?' * len(values))
+
+
+class MetadataCatalog(object):
+    """
+    Read-only view of a catalog database, see the module documentation.
+
+    Example::
+
+        catalog = open_catalog('metadata.json')
+        assay_ids = catalog.query(
+            {'Aluminate Species': ['(OH)2Al-O2-Al(OH)2- + 181 H2O + 2 Na+'],
+             'Inter-atom distances': ['Al-Ob']},
+            dois=['10.1016/j.talanta.2006.02.008'])
+        paths = catalog.data_files(assay_ids)
+    """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        # Shared by the sessions of a server, which may run in several
+        # threads, the connection is only used under the lock.
+        self._connection = sqlite3.connect(
+            database_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Characteristics records by assay id, built on first use so
+        # that an assay always gives the same record.
+        self._characteristics = dict()
+
+    def _execute(self, sql, parameters=()):
+        """Return all the rows of a query."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+        return
+
+    def __len__(self):
+        """Number of assays in the catalog."""
+        return self._execute('SELECT COUNT(*) FROM assays')[0][0]
+
+    def query(self, criteria=None, term_sources=None, measurement_types=None,
+              dois=None):
+        """
+        Return the sorted ids of the assays matching every criterion.
+
+        criteria is a dictionary of termSource to a list of accepted
+        annotation values: an assay matches if, for every termSource, it
+        has at least one of the listed values. term_sources is a list of
+        termSources of which the assay must have at least one.
+        measurement_types and dois restrict the assays to those of the
+        given measurement types and to the studies of publications with
+        the given DOIs.
+
+        With no criterion at all every assay is returned.
+        """
+        selects = list()
+        parameters = list()
+
+        if term_sources is not None:
+            selects.append(
+                'SELECT DISTINCT assay_id FROM characteristics '
+                'WHERE term_source IN ({})'.format(
+                    _placeholders(term_sources)))
+            parameters.extend(term_sources)
+
+        for term, values in (criteria or {}).items():
+            selects.append(
+                'SELECT DISTINCT assay_id FROM characteristics '
+                'WHERE term_source = ? AND annotation_value IN ({})'.format(
+                    _placeholders(values)))
+            parameters.append(term)
+            parameters.extend(values)
+
+        if measurement_types is not None:
+            selects.append(
+                'SELECT DISTINCT assay_id FROM assays '
+                'WHERE measurement_type IN ({})'.format(
+                    _placeholders(measurement_types)))
+            parameters.extend(measurement_types)
+
+        if dois is not None:
+            selects.append(
+                'SELECT DISTINCT assays.assay_id FROM assays '
+                'JOIN publications ON publications.study_id = assays.study_id '
+                'WHERE publications.doi IN ({})'.format(_placeholders(dois)))
+            parameters.extend(dois)
+
+        if not selects:
+            selects.append('SELECT assay_id FROM assays')
+
+        rows = self._execute(
+            ' INTERSECT '.join(selects) + ' ORDER BY 1', parameters)
+        return [row[0] for row in rows]
+
+    def characteristics(self, assay_id):
+        """
+        Return the Characteristics of an assay, a mapping of termSource to
+        the tuple of its annotation values.
+        """
+        if assay_id not in self._characteristics:
+            char_dict = collections.defaultdict(list)
+            for term, value in self._execute(
+                    'SELECT term_source, annotation_value '
+                    'FROM characteristics WHERE assay_id = ? '
+                    'ORDER BY position', (assay_id,)):
+                char_dict[term].append(value)
+            self._characteristics[assay_id] = Characteristics(char_dict)
+        return self._characteristics[assay_id]
+
+    def data_files(self, assay_ids):
+        """Return the data file names of the given assays, in order."""
+        assay_ids = list(assay_ids)
+        names = collections.defaultdict(list)
+        for start in range(0, len(assay_ids), MAX_PARAMETERS):
+            chunk = sorted(set(assay_ids[start:start + MAX_PARAMETERS]))
+            for assay_id, name in self._execute(
+                    'SELECT assay_id, name FROM data_files '
+                    'WHERE assay_id IN ({}) ORDER BY data_file_id'.format(
+                        _placeholders(chunk)), chunk):
+                names[assay_id].append(name)
+        return [
+            name
+            for assay_id in assay_ids
+            for name in names.get(assay_id, ())
+        ]
+
+    def values(self, term):
+        """Return the sorted annotation values used for a termSource."""
+        return [
+            row[0] for row in self._execute(
+                'SELECT DISTINCT annotation_value FROM characteristics '
+                'WHERE term_source = ? ORDER BY 1', (term,))
+        ]
+
+    def publications(self, doi=None):
+        """
+        Return the publications, or those with the given DOI, as
+        dictionaries with the study identifier.
+        """
+        sql = (
+            'SELECT studies.identifier, doi, publications.title, '
+            'author_list, pubmed_id FROM publications '
+            'JOIN studies ON studies.study_id = publications.study_id')
+        parameters = ()
+        if doi is not None:
+            sql += ' WHERE doi = ?'
+            parameters = (doi,)
+        names = ['study', 'doi', 'title', 'author_list', 'pubmed_id']
+        return [
+            dict(zip(names, row))
+            for row in self._execute(sql + ' ORDER BY 1', parameters)
+        ]
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Build the SQLite catalog of an ISA-JSON metadata file '
+                    'and list the data files of the matching assays.')
+    parser.add_argument('metadata', help='path to the ISA-JSON metadata')
+    parser.add_argument(
+        '--database', help='catalog path (default: in the cache directory)')
+    parser.add_argument(
+        '--where', action='append', default=[],
+        help="'termSource=annotationValue' criterion, may be repeated")
+    parser.add_argument('--doi', action='append', help='publication DOI')
+    args = parser.parse_args()
+
+    criteria = collections.defaultdict(list)
+    for criterion in args.where:
+        term, _, value = criterion.partition('=')
+        criteria[term].append(value)
+
+    catalog = open_catalog(args.metadata, database_path=args.database)
+    for name in catalog.data_files(catalog.query(criteria, dois=args.doi)):
+        print(name)
+    catalog.close()
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,22 @@
-import pandas as pd
-import json
+import os
+import sys
+import numpy as np
 from bokeh.palettes import Category20
-from bokeh.models import Select
+from bokeh.models import ColumnDataSource, FactorRange, Select
 # from bokeh.layouts import layout
 from bokeh.layouts import row, widgetbox
 from bokeh.plotting import curdoc, figure
+# Add the parent path so that bokeh --serve can see the `vis`
+# module and import it.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.registry import get_dataframes, get_code_cache
+from vis.vis_helper import palette_lookup
 
 
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
-    # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as f:
-        metadata = json.load(f)
-    # create a dataframes for each csv found
-    dataFrame_list = []
-    for study in metadata['studies']:
-        # Store the doi/link
-        for publication in study['publications']:
-            doi = publication['doi']
-        for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                data = pd.read_csv(filename['name'])
-                data['doi'] = doi
-                dataFrame_list.append(data)
-    return pd.concat(dataFrame_list, ignore_index=True)
-
-
-# Load the data from the metadata:
-df = create_dataframes('data/nmr_metadata.json')
+# Load the data from the metadata, shared by every session.
+df = get_dataframes('data/nmr_metadata.json')
 
 # Create some general variables for size and colors.
 SIZES = list(range(6, 22, 3))
@@ -39,49 +28,68 @@ discrete = ['counter_ion', 'doi']
 continuous = ['Al_concentration', 'Al_ppm', 'CI_concentration', 'OH_concentration',
               'temperature', 'wavelength']
 quantileable = [x for x in continuous if len(df[x].unique()) > 20]
+# Factorize and quantile codes of every mappable column, computed once.
+codes = get_code_cache(
+    'data/nmr_metadata.json', discrete, quantileable, len(SIZES))
 # discrete = [x for x in columns if df[x].dtype == object]
 # continuous = [x for x in columns if x not in discrete]
 # quantileable = [x for x in continuous if len(df[x].unique()) > 20]
 
 
-def create_figure():
+# A single data source is kept for the whole session. Widget changes
+# replace columns of this source in place, which only sends the changed
+# columns to the browser instead of a whole new figure.
+source = ColumnDataSource(data=dict(x=[], y=[], color=[], size=[]))
 
-    # Assign the x and y values to those selected.
-    xs = df[x_sel.value].values
-    ys = df[y_sel.value].values
 
-    # Get the titles from those selected.
-    x_title = x_sel.value.title()
-    y_title = y_sel.value.title()
+def point_sizes():
+    """Return the size column for the current size selection."""
 
-    # Create a dictionary to pass to the bokeh plot.
-    kw = dict()
+    # Set a default size for the points
+    if size.value == 'None':
+        return [9] * len(df)
 
-    # Check if the x and y axis values are discrete.
-    # if so use the low level dict key word to set the range appropriately.
-    if x_sel.value in discrete:
-        kw['x_range'] = sorted(set(xs))
-    if y_sel.value in discrete:
-        kw['y_range'] = sorted(set(ys))
+    return palette_lookup(codes[size.value], SIZES)
 
-    # Set a default size for the points
-    sz = 9
 
-    if size.value != 'None':
-        if size.value in discrete:
-            sz = [SIZES[xx] for xx in df[size.value].factorize()[0]]
-        else:
-            groups = pd.qcut(df[size.value].values, len(SIZES), duplicates='drop')
-            sz = [SIZES[xx] for xx in groups.codes]
+def point_colors():
+    """Return the color column for the current color selection."""
 
     # Set the default color
-    c = '#31AADE'
-    if color.value != 'None':
-        if color.value in discrete:
-            c = [COLORS[xx] for xx in df[color.value].factorize()[0]]
-        else:
-            groups = pd.qcut(df[color.value].values, len(SIZES), duplicates='drop')
-            c = [COLORS[xx] for xx in groups.codes]
+    if color.value == 'None':
+        return ['#31AADE'] * len(df)
+
+    return palette_lookup(codes[color.value], COLORS)
+
+
+def axis_factors(column):
+    """
+    Return the sorted factors of a discrete column, or None if the
+    column is continuous.
+    """
+    if column in discrete:
+        return sorted(set(np.asarray(df[column])))
+    return None
+
+
+def create_figure():
+    """
+    Create the figure drawing the shared source. This is only needed
+    when an axis switches between discrete and continuous values, as
+    the range type of a figure cannot be changed afterwards.
+    """
+
+    # Create a dictionary to pass to the bokeh plot.
+    kw = dict()
+
+    # Check if the x and y axis values are discrete.
+    # if so use the low level dict key word to set the range appropriately.
+    x_factors = axis_factors(x_sel.value)
+    y_factors = axis_factors(y_sel.value)
+    if x_factors is not None:
+        kw['x_range'] = x_factors
+    if y_factors is not None:
+        kw['y_range'] = y_factors
 
     # Assign the titles.
     fig = figure(
@@ -91,14 +99,15 @@ def create_figure():
         **kw,
     )
 
-    fig.xaxis.axis_label = x_title
-    fig.yaxis.axis_label = y_title
+    fig.xaxis.axis_label = x_sel.value.title()
+    fig.yaxis.axis_label = y_sel.value.title()
 
     fig.circle(
-        x=xs,
-        y=ys,
-        color=c,
-        size=sz,
+        x='x',
+        y='y',
+        color='color',
+        size='size',
+        source=source,
         line_color='white',
         alpha=0.7,
         hover_color='white',
@@ -108,26 +117,66 @@ def create_figure():
     return fig
 
 
-# Create the layout handler function:
-def update(attr, old, new):
-    layout.children[1] = create_figure()
+def update_axes(attr, old, new):
+    """Update the plotted x and y columns and the axis titles."""
+    fig = layout.children[1]
+
+    # Rebuild the figure only if an axis changes its range type.
+    x_factors = axis_factors(x_sel.value)
+    y_factors = axis_factors(y_sel.value)
+    if isinstance(fig.x_range, FactorRange) != (x_factors is not None) or \
+            isinstance(fig.y_range, FactorRange) != (y_factors is not None):
+        fig = create_figure()
+        layout.children[1] = fig
+    else:
+        if x_factors is not None:
+            fig.x_range.factors = x_factors
+        if y_factors is not None:
+            fig.y_range.factors = y_factors
+        fig.xaxis.axis_label = x_sel.value.title()
+        fig.yaxis.axis_label = y_sel.value.title()
+
+    # Both columns are replaced in a single change event. np.asarray turns
+    # the categorical columns into plain arrays Bokeh can serialize.
+    source.data.update(
+        x=np.asarray(df[x_sel.value]), y=np.asarray(df[y_sel.value]))
+    return
+
+
+def update_color(attr, old, new):
+    """Replace only the color column of the source."""
+    source.data['color'] = point_colors()
+    return
+
+
+def update_size(attr, old, new):
+    """Replace only the size column of the source."""
+    source.data['size'] = point_sizes()
     return
 
 
 # Create the inputs
 x_sel = Select(title='X-Axis', value='Al_concentration', options=columns)
-x_sel.on_change('value', update)
+x_sel.on_change('value', update_axes)
 
 y_sel = Select(title='Y-Axis', value='OH_concentration', options=columns)
-y_sel.on_change('value', update)
+y_sel.on_change('value', update_axes)
 
 # Create the color input.
 color = Select(title='Color', value='None', options=['None'] + discrete + quantileable)
-color.on_change('value', update)
+color.on_change('value', update_color)
 
 # Create the size input
 size = Select(title='Size', value='None', options=['None'] + quantileable)
-size.on_change('value', update)
+size.on_change('value', update_size)
+
+# Fill the source for the initial widget values.
+source.data = dict(
+    x=np.asarray(df[x_sel.value]),
+    y=np.asarray(df[y_sel.value]),
+    color=point_colors(),
+    size=point_sizes(),
+)
 
 # Create a list of the controls
 controls = widgetbox([x_sel, y_sel, color, size], width=200)
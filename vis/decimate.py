@@ -0,0 +1,95 @@
+"""
+=====================
+Line Plot Decimation
+=====================
+
+Helper functions to reduce long line data (spectra, RDFs) to the number
+of points that can actually be seen on screen.
+
+The x axis of the visible window is split into one bucket per pixel and
+only the minimum and maximum y value of each bucket are kept, along with
+the first and last visible points. Drawn as a line this is identical to
+the full data at screen resolution, peaks are never lost.
+"""
+
+import numpy as np
+
+
+def minmax_indices(x, ys, n_buckets):
+    """
+    Return the sorted indices of the points to keep from the columns ys
+    (a list of arrays sharing the sorted x array) so that each of the
+    n_buckets equal width x buckets keeps its minimum and maximum in
+    every column.
+
+    If there are fewer points than two per bucket every index is kept.
+    """
+    x = np.asarray(x)
+    n_points = len(x)
+    if n_points <= 2 * n_buckets:
+        return np.arange(n_points)
+
+    # Assign a bucket to each point, x is sorted so buckets are contiguous.
+    x_min, x_max = x[0], x[-1]
+    span = x_max - x_min
+    if span <= 0:
+        return np.array([0, n_points - 1])
+    bucket = ((x - x_min) / span * n_buckets).astype(np.int64)
+    np.clip(bucket, 0, n_buckets - 1, out=bucket)
+
+    # Boundaries of each non-empty bucket.
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    segment = np.repeat(
+        np.arange(len(starts)), np.diff(np.r_[starts, n_points]))
+
+    keep = [np.array([0, n_points - 1])]
+    for y in ys:
+        y = np.asarray(y, dtype=np.float64)
+        # The extremes of each bucket (ignoring NaN), then the first point
+        # of each bucket that reaches them.
+        for reduce in (np.fmin, np.fmax):
+            extreme = reduce.reduceat(y, starts)
+            hits = np.flatnonzero(y == extreme[segment])
+            hit_segment = segment[hits]
+            keep.append(
+                hits[np.r_[True, hit_segment[1:] != hit_segment[:-1]]])
+
+    return np.unique(np.concatenate(keep))
+
+
+def window_indices(x, start, end):
+    """
+    Return the (first, last) slice bounds of the sorted x array that
+    cover the window [start, end], with one extra point on each side so
+    the line continues to the edges of the plot.
+    """
+    first = max(np.searchsorted(x, start, side='left') - 1, 0)
+    last = min(np.searchsorted(x, end, side='right') + 1, len(x))
+    return first, last
+
+
+def decimate(data, x, columns, n_buckets, start=None, end=None):
+    """
+    Decimate a dictionary of column arrays for display.
+
+    data is a dictionary (or dataframe) of arrays, x the name of the
+    sorted x column and columns the y columns to reduce. Only the x
+    window [start, end] is kept if given. Returns a new dictionary of
+    arrays holding x and the y columns, suitable for a ColumnDataSource.
+    """
+    x_values = np.asarray(data[x])
+
+    # Restrict to the visible window first.
+    first, last = 0, len(x_values)
+    if start is not None and end is not None:
+        first, last = window_indices(x_values, start, end)
+
+    x_window = x_values[first:last]
+    y_windows = [np.asarray(data[col])[first:last] for col in columns]
+    keep = minmax_indices(x_window, y_windows, n_buckets)
+
+    reduced = {x: x_window[keep]}
+    for col, y in zip(columns, y_windows):
+        reduced[col] = y[keep]
+
+    return reduced
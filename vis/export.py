@@ -0,0 +1,214 @@
+"""
+======================
+Parquet Dataset Export
+======================
+
+Converts every data file referenced by an ISA-JSON investigation into a
+single Parquet dataset, partitioned by study and assay. The assay
+characteristics, measurement type and doi are stored as columns, so the
+exported dataset is self describing.
+
+The partition directories are study_key=<key>/assay=assay_<index>. The
+study keys are the lower case study identifiers with any character
+other than letters, digits, '.', '-' and '_' replaced by '_', and a
+-2, -3... suffix for identifiers that would otherwise share a key, so
+they stay distinct on case-insensitive file systems. The assays are
+numbered across the whole investigation. The identifier itself is kept
+in the study column.
+
+The files are read twice, once to find the columns of the dataset and
+once to write them, so only one file is held in memory at a time. RDF
+files are read through the parsed file cache, see utils.load_cached_df.
+
+The dataset is read back with vis.utils.read_parquet_dataset, which only
+loads the requested columns and partitions.
+
+Run from the repository root:
+
+    python -m vis.export metadata.json exported_data
+
+This requires the optional pyarrow package.
+"""
+
+import os
+import re
+import shutil
+import logging
+import argparse
+import collections
+import numpy as np
+import pandas as pd
+from vis.utils import load_metadata, load_cached_df, read_pws
+from vis.vis_helper import read_data_file
+
+
+def read_any_data_file(data_file, doi):
+    """
+    Read a data file entry of the metadata with the reader matching its
+    type. Returns None for types that have no reader.
+    """
+    path = data_file['name']
+    if data_file['type'] == 'Plot-csv-extract':
+        return read_data_file(path, doi)
+    if data_file['type'] == 'Maxime-RDF':
+        return load_cached_df(path)
+    if data_file['type'] == 'Maxime Vibrational Spectrum':
+        return read_pws(path)
+    return None
+
+
+def study_keys(metadata):
+    """
+    Return the partition key of every study of the metadata, in order,
+    see the module documentation.
+    """
+    keys = list()
+    for study in metadata['studies']:
+        base = re.sub(r'[^a-z0-9._-]', '_', study['identifier'].lower())
+        key = base
+        suffix = 1
+        while key in keys:
+            suffix += 1
+            key = '{}-{}'.format(base, suffix)
+        keys.append(key)
+    return keys
+
+
+def assay_columns(study, study_key, assay_key, assay):
+    """
+    Return the dictionary of constant columns describing an assay: its
+    study identifier, study and assay partition values, measurement type
+    and one column per characteristic category (multiple values are
+    joined by '; ').
+    """
+    characteristics = collections.OrderedDict()
+    for char in assay['characteristicCategories']:
+        char_type = char['characteristicType']
+        characteristics.setdefault(char_type['termSource'], []).append(
+            char_type['annotationValue'])
+
+    columns = collections.OrderedDict()
+    columns['study'] = study['identifier']
+    columns['study_key'] = study_key
+    columns['assay'] = assay_key
+    columns['measurement_type'] = assay['measurementType']['annotationValue']
+    for term_source, values in characteristics.items():
+        columns[term_source] = '; '.join(values)
+
+    return columns
+
+
+def collect_frames(metadata):
+    """
+    Read every data file of the investigation. Yields one dataframe per
+    file with the assay columns and the data file name added.
+    """
+    assay_idx = 0
+    for study, study_key in zip(metadata['studies'], study_keys(metadata)):
+        # Studies without a publication have no doi.
+        doi = None
+        for publication in study['publications']:
+            doi = publication['doi']
+        for assay in study['assays']:
+            constants = assay_columns(
+                study, study_key, 'assay_{}'.format(assay_idx), assay)
+            assay_idx += 1
+            for data_file in assay['dataFiles']:
+                frame = read_any_data_file(data_file, doi)
+                if frame is None:
+                    logging.warning(
+                        'No reader for data file %s of type %s, skipped.',
+                        data_file['name'], data_file['type'])
+                    continue
+                frame = frame.assign(
+                    data_file=os.path.basename(data_file['name']),
+                    doi=doi,
+                    **constants)
+                yield frame
+
+
+def common_schema(frames):
+    """
+    Build one pyarrow schema holding the columns of every frame, so all
+    the files of the dataset can be read together. Columns that are
+    numeric in every frame are stored as float64, all others as strings.
+    """
+    import pyarrow as pa
+
+    numeric = collections.OrderedDict()
+    for frame in frames:
+        for column in frame.columns:
+            values = frame[column]
+            if values.isnull().all():
+                # An empty column says nothing about the type.
+                numeric.setdefault(column, True)
+            else:
+                numeric[column] = numeric.get(column, True) and \
+                    pd.api.types.is_numeric_dtype(values)
+
+    return pa.schema([
+        pa.field(column, pa.float64() if is_numeric else pa.string())
+        for column, is_numeric in numeric.items()
+    ])
+
+
+def export_parquet(json_metadata_path, output_path, overwrite=False):
+    """
+    Write every data file of the investigation to a Parquet dataset in
+    output_path, partitioned as study_key=<key>/assay=assay_<index>, see
+    the module documentation. Each file is written as soon as it is read.
+
+    An existing output_path is replaced only if overwrite is True.
+    Returns the list of the dataset columns.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.exists(output_path):
+        if not overwrite:
+            raise FileExistsError(
+                '{} already exists, use overwrite=True to replace it.'
+                .format(output_path))
+        shutil.rmtree(output_path)
+
+    metadata = load_metadata(json_metadata_path)
+    schema = common_schema(collect_frames(metadata))
+
+    for frame in collect_frames(metadata):
+        # Give every frame the full set of columns, missing ones are null.
+        frame = frame.reindex(columns=schema.names)
+        for field in schema:
+            if field.type == pa.string():
+                values = frame[field.name]
+                frame[field.name] = values.astype(str).where(
+                    values.notnull(), None)
+            else:
+                frame[field.name] = frame[field.name].astype(np.float64)
+        table = pa.Table.from_pandas(
+            frame, schema=schema, preserve_index=False)
+        pq.write_to_dataset(
+            table, output_path, partition_cols=['study_key', 'assay'])
+
+    return schema.names
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Export the data files of an ISA-JSON investigation '
+                    'to a partitioned Parquet dataset.')
+    parser.add_argument('metadata', help='path to the ISA-JSON metadata')
+    parser.add_argument('output', help='directory of the Parquet dataset')
+    parser.add_argument(
+        '--overwrite', action='store_true',
+        help='replace the output directory if it exists')
+    args = parser.parse_args()
+
+    columns = export_parquet(
+        args.metadata, args.output, overwrite=args.overwrite)
+    logging.info('Exported %d columns to %s', len(columns), args.output)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -8,37 +8,23 @@ in your browser.
 # from vis_helper import create_dataframes
 
 import os
+import sys
 import numpy as np
-import pandas as pd
-import json
 
 from bokeh.layouts import row, column
 from bokeh.models import BoxSelectTool, LassoSelectTool, Spacer
 from bokeh.plotting import figure, curdoc
+# Add the parent path so that bokeh --serve can see the `vis`
+# module and import it.
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from vis.registry import get_dataframes
+from vis.vis_helper import bin_indices
 
 
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
-    # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as md_file:
-        metadata = json.load(md_file)
-    # create a dataframes for each csv found
-    dataframe_list = []
-    for study in metadata['studies']:
-        # Store the doi/link
-        for publication in study['publications']:
-            doi = publication['doi']
-            # This is buggy, just picks the last one.
-            # They should all be the same the way I implemented it.
-        for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                dataframe = pd.read_csv(filename['name'])
-                dataframe['doi'] = doi
-                dataframe_list.append(dataframe)
-    return pd.concat(dataframe_list)
-
-
-dataframes = create_dataframes('data/nmr_metadata.json')
+
+dataframes = get_dataframes('data/nmr_metadata.json')
 
 # print(dataframes)
 
@@ -52,8 +38,8 @@ p.background_fill_color = "#fafafa"
 p.select(BoxSelectTool).select_every_mousemove = False
 p.select(LassoSelectTool).select_every_mousemove = False
 
-x = dataframes['Al_ppm'].dropna()
-y = dataframes['wavelength'].dropna()
+x = dataframes['Al_ppm'].dropna().values
+y = dataframes['wavelength'].dropna().values
 
 r = p.scatter(x, y, size=3, color="#3A5785", alpha=0.6)
 
@@ -61,6 +47,8 @@ r = p.scatter(x, y, size=3, color="#3A5785", alpha=0.6)
 hhist, hedges = np.histogram(x, bins=20)
 hzeros = np.zeros(len(hedges)-1)
 hmax = max(hhist)*1.1
+# The edges never change, so the bin of every point is found once.
+hbins = bin_indices(x, hedges)
 
 LINE_ARGS = dict(color="#3A5785", line_color=None)
 
@@ -79,6 +67,7 @@ hh2 = ph.quad(bottom=0, left=hedges[:-1], right=hedges[1:], top=hzeros, alpha=0.
 vhist, vedges = np.histogram(y, bins=20)
 vzeros = np.zeros(len(vedges)-1)
 vmax = max(vhist)*1.1
+vbins = bin_indices(y, vedges)
 
 pv = figure(toolbar_location=None, plot_width=200, plot_height=p.plot_height, x_range=(-vmax, vmax),
             y_range=p.y_range, min_border=10, y_axis_location="right")
@@ -96,17 +85,19 @@ curdoc().add_root(layout)
 curdoc().title = "Selection Histogram"
 
 def update(attr, old, new):
-    inds = np.array(new['1d']['indices'])
+    inds = np.asarray(new['1d']['indices'], dtype=np.intp)
     if len(inds) == 0 or len(inds) == len(x):
         hhist1, hhist2 = hzeros, hzeros
         vhist1, vhist2 = vzeros, vzeros
     else:
-        neg_inds = np.ones_like(x, dtype=np.bool)
-        neg_inds[inds] = False
-        hhist1, _ = np.histogram(x[inds], bins=hedges)
-        vhist1, _ = np.histogram(y[inds], bins=vedges)
-        hhist2, _ = np.histogram(x[neg_inds], bins=hedges)
-        vhist2, _ = np.histogram(y[neg_inds], bins=vedges)
+        # Count the selected points per bin, the unselected ones are
+        # what remains of the full histograms.
+        hhist1 = np.bincount(
+            hbins[inds], minlength=len(hhist) + 1)[:len(hhist)]
+        vhist1 = np.bincount(
+            vbins[inds], minlength=len(vhist) + 1)[:len(vhist)]
+        hhist2 = hhist - hhist1
+        vhist2 = vhist - vhist1
 
     hh1.data_source.data["top"]   =  hhist1
     hh2.data_source.data["top"]   = -hhist2
@@ -0,0 +1,153 @@
+"""
+========================
+ISA Characteristic Index
+========================
+
+An inverted index over the assay characteristics of an ISA-JSON
+investigation. Every (termSource, annotationValue) pair of the assay
+characteristic categories is mapped to the set of assays carrying it,
+so finding e.g. the assays of some species with some bonds only touches
+the matching assays instead of walking the whole metadata.
+
+Assays are numbered in the order they appear in the metadata.
+"""
+
+import collections
+import collections.abc
+
+
+class Characteristics(collections.abc.Mapping):
+    """
+    Immutable record of the characteristics of an assay, a mapping of
+    termSource to the tuple of its annotation values.
+
+    As it cannot change, copying it returns the same object. It can then
+    be stored in DataFrame.attrs and follow a frame through slicing,
+    copies and the concatenation of frames of the same assay at no cost.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values=()):
+        object.__setattr__(self, '_values', {
+            term: tuple(term_values)
+            for term, term_values in dict(values).items()
+        })
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Characteristics are immutable.')
+
+    def __getitem__(self, term):
+        return self._values[term]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __hash__(self):
+        return hash(frozenset(self._values.items()))
+
+    def __repr__(self):
+        return 'Characteristics({!r})'.format(self._values)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Characteristics, (self._values,))
+
+
+class CharacteristicIndex(object):
+    """
+    Inverted index of the characteristics of the assays in a metadata
+    dictionary (as loaded from an ISA-JSON file).
+
+    Example::
+
+        index = CharacteristicIndex(metadata)
+        assay_ids = index.query({
+            'Aluminate Species': ['(OH)2Al-O2-Al(OH)2- + 181 H2O + 2 Na+'],
+            'Inter-atom distances': ['Al-Ob'],
+        })
+        paths = index.data_files(assay_ids)
+    """
+
+    def __init__(self, metadata):
+        # Per assay, its Characteristics record and data file names.
+        self._characteristics = list()
+        self._data_files = list()
+        # (termSource, annotationValue) -> assay ids
+        self._by_value = collections.defaultdict(set)
+        # termSource -> assay ids
+        self._by_term = collections.defaultdict(set)
+
+        for study in metadata['studies']:
+            for assay in study['assays']:
+                assay_id = len(self._characteristics)
+                char_dict = collections.defaultdict(list)
+                for char in assay['characteristicCategories']:
+                    term = char['characteristicType']['termSource']
+                    value = char['characteristicType']['annotationValue']
+                    char_dict[term].append(value)
+                    self._by_value[(term, value)].add(assay_id)
+                    self._by_term[term].add(assay_id)
+                self._characteristics.append(Characteristics(char_dict))
+                self._data_files.append(
+                    [data_file['name'] for data_file in assay['dataFiles']])
+
+    def __len__(self):
+        """Number of assays in the index."""
+        return len(self._characteristics)
+
+    def query(self, criteria=None, term_sources=None):
+        """
+        Return the sorted ids of the assays matching every criterion.
+
+        criteria is a dictionary of termSource to a list of accepted
+        annotation values: an assay matches if, for every termSource, it
+        has at least one of the listed values. term_sources is a list of
+        termSources of which the assay must have at least one.
+
+        With no criterion at all every assay is returned.
+        """
+        candidates = list()
+
+        if term_sources is not None:
+            candidates.append(set().union(
+                *[self._by_term.get(term, ()) for term in term_sources]))
+
+        for term, values in (criteria or {}).items():
+            candidates.append(set().union(
+                *[self._by_value.get((term, value), ()) for value in values]))
+
+        if not candidates:
+            return list(range(len(self)))
+
+        # Intersect starting from the smallest set.
+        candidates.sort(key=len)
+        result = candidates[0].intersection(*candidates[1:])
+        return sorted(result)
+
+    def characteristics(self, assay_id):
+        """
+        Return the Characteristics of an assay, a mapping of termSource to
+        the tuple of its annotation values.
+        """
+        return self._characteristics[assay_id]
+
+    def data_files(self, assay_ids):
+        """Return the data file names of the given assays, in order."""
+        return [
+            name
+            for assay_id in assay_ids
+            for name in self._data_files[assay_id]
+        ]
+
+    def values(self, term):
+        """Return the sorted annotation values used for a termSource."""
+        return sorted(value for key, value in self._by_value if key == term)
@@ -8,7 +8,7 @@ import os
 import sys
 import pandas as pd
 from bokeh.palettes import Category20
-from bokeh.models import Select
+from bokeh.models import ColumnDataSource, FactorRange, Select
 from bokeh.layouts import row, widgetbox
 from bokeh.plotting import curdoc, figure
 # Add the parent path so that bokeh --serve can see the `vis`
@@ -16,29 +16,54 @@ from bokeh.plotting import curdoc, figure
 sys.path.insert(
     0,
     os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from vis.utils import read_rdf
+from vis.registry import get_rdf_frames
+from vis.vis_helper import build_code_cache, palette_lookup
 
 # Read the desired metadata file:
-# This returns a list of dataframes.
-data_frames = read_rdf('metadata.json', char_types=['Aluminate Species'])
+# This returns a list of handles on the data files, shared by every
+# session.
+data_frames = get_rdf_frames(
+    'metadata.json', char_types=['Aluminate Species'])
 
 # Define colors and sizes to be used later.
 SIZES = list(range(6, 22, 3))
 COLORS = Category20[20]
 
-# Data wrangling.
-ysl = [df['RDF_Al-Ob'] for df in dataframes]
-xsl = [df['r'] for df in dataframes]
+# Data wrangling. Stack the frames into one, labelled by species.
+df = pd.concat(
+    [handle.frame.assign(
+        species=handle.characteristics['Aluminate Species'][0])
+     for handle in data_frames],
+    ignore_index=True)
+
+# Organize the columns.
+columns = sorted(df.columns)
+discrete = ['species']
+quantileable = [x for x in columns if x not in discrete]
+
+# Factorize and quantile codes of every column, computed once.
+codes = build_code_cache(df, discrete, quantileable, len(SIZES))
+
+# A single source is kept for the session, widget changes replace its
+# columns in place rather than rebuilding the figure.
+source = ColumnDataSource(data=dict(x=[], y=[], color=[]))
 
-def create_figure():
 
-    # Assign the x and y values to those selected.
-    xs = df[x_sel.value].values
-    ys = df[y_sel.value].values
+def point_colors():
+    """Return the color column for the current color selection."""
 
-    # Get the titles from those selected.
-    x_title = x_sel.value.title()
-    y_title = y_sel.value.title()
+    # Set the default color
+    if color.value == 'None':
+        return ['#31AADE'] * len(df)
+    return palette_lookup(codes[color.value], COLORS)
+
+
+def create_figure():
+    """
+    Create the figure drawing the shared source. This is only needed
+    when an axis switches between discrete and continuous values, as
+    the range type of a figure cannot be changed afterwards.
+    """
 
     # Create a dictionary to pass to the bokeh plot.
     kw = dict()
@@ -46,27 +71,10 @@ def create_figure():
     # Check if the x and y axis values are discrete.
     # if so use the low level dict key word to set the range appropriately.
     if x_sel.value in discrete:
-        kw['x_range'] = sorted(set(xs))
+        kw['x_range'] = sorted(set(df[x_sel.value].values))
     if y_sel.value in discrete:
-        kw['y_range'] = sorted(set(ys))
-
-    # Set a default size for the points
-    # sz = 9
-    # if size.value != 'None':
-    #     if size.value in discrete:
-    #         sz = [SIZES[xx] for xx in df[size.value].factorize()[0]]
-    #     else:
-    #         groups = pd.qcut(df[size.value].values, len(SIZES), duplicates='drop')
-    #         sz = [SIZES[xx] for xx in groups.codes]
-    # Set the default color
-    c = '#31AADE'
-    if color.value != 'None':
-        if color.value in discrete:
-            c = [COLORS[xx] for xx in df[color.value].factorize()[0]]
-        else:
-            groups = pd.qcut(
-                df[color.value].values, len(SIZES), duplicates='drop')
-            c = [COLORS[xx] for xx in groups.codes]
+        kw['y_range'] = sorted(set(df[y_sel.value].values))
+
     # Assign the titles.
     fig = figure(
         plot_height=600,
@@ -74,13 +82,13 @@ def create_figure():
         tools='pan,box_zoom,reset',
         **kw,
     )
-    fig.xaxis.axis_label = x_title
-    fig.yaxis.axis_label = y_title
+    fig.xaxis.axis_label = x_sel.value.title()
+    fig.yaxis.axis_label = y_sel.value.title()
     fig.circle(
-        x=xs,
-        y=ys,
-        color=c,
-        # size=sz,
+        x='x',
+        y='y',
+        color='color',
+        source=source,
         line_color=None,
         alpha=0.7,
         hover_color='white',
@@ -90,8 +98,26 @@ def create_figure():
     return fig
 
 
-def update(attr, old, new):
-    layout.children[1] = create_figure()
+def update_axes(attr, old, new):
+    """Update the plotted columns, rebuilding the figure if needed."""
+    fig = layout.children[1]
+
+    # Only a change between discrete and continuous needs a new figure.
+    if isinstance(fig.x_range, FactorRange) != (x_sel.value in discrete) or \
+            isinstance(fig.y_range, FactorRange) != (y_sel.value in discrete):
+        layout.children[1] = create_figure()
+    else:
+        fig.xaxis.axis_label = x_sel.value.title()
+        fig.yaxis.axis_label = y_sel.value.title()
+
+    # Both columns are replaced in a single change event.
+    source.data.update(x=df[x_sel.value].values, y=df[y_sel.value].values)
+    return
+
+
+def update_color(attr, old, new):
+    """Replace only the color column of the source."""
+    source.data['color'] = point_colors()
     return
 
 
@@ -100,20 +126,20 @@ x_sel = Select(
     title='X-Axis',
     value='r',
     options=columns)
-x_sel.on_change('value', update)
+x_sel.on_change('value', update_axes)
 
 y_sel = Select(
     title='Y-Axis',
-    value='inter atom distance',
+    value='RDF_Al-Ob',
     options=columns)
-y_sel.on_change('value', update)
+y_sel.on_change('value', update_axes)
 
 # Create the color input.
 color = Select(
     title='Color',
     value='None',
     options=['None'] + discrete + quantileable)
-color.on_change('value', update)
+color.on_change('value', update_color)
 
 # Create the size input
 # size = Select(title='Size', value='None', options=['None'] + quantileable)
@@ -122,6 +148,13 @@ color.on_change('value', update)
 # Create a list of the controls
 controls = widgetbox([x_sel, y_sel, color], width=200)
 
+# Fill the source for the initial widget values.
+source.data = dict(
+    x=df[x_sel.value].values,
+    y=df[y_sel.value].values,
+    color=point_colors(),
+)
+
 # Create the layout
 layout = row(controls, create_figure())
 
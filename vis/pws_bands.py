@@ -0,0 +1,183 @@
+"""
+================
+PWS Band Picking
+================
+
+The PWS files hold vibrational power spectra obtained from the velocity
+autocorrelation function. Their intensities are not those of the IR or
+Raman spectra, but the frequencies of the most intense bands are very
+likely found in them.
+
+This module picks the most intense bands of every column of the PWS
+files, all the columns of a file at once, and matches them against the
+Raman peak wavelengths of the experimental tables.
+
+The bands of each file are cached by the hash of its content, so only
+new or edited files are read and analysed again.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from vis.utils import (
+    CACHE_DIR, load_metadata, read_pws, read_cached_result,
+    write_cached_result, remember_file_hashes)
+
+# DataFile type of the PWS files in the ISA metadata.
+PWS_FILE_TYPE = 'Maxime Vibrational Spectrum'
+
+
+def smooth_columns(values, window):
+    """
+    Moving average of every column of a (rows x columns) array over
+    `window` rows, centred, with the ends averaged over the rows they
+    have.
+    """
+    if window <= 1:
+        return values
+    padded = np.vstack([np.zeros((1, values.shape[1])), values])
+    cumulative = np.cumsum(padded, axis=0)
+    n_rows = len(values)
+    lo = np.clip(np.arange(n_rows) - window // 2, 0, n_rows)
+    hi = np.clip(lo + window, 0, n_rows)
+    counts = (hi - lo)[:, np.newaxis]
+    return (cumulative[hi] - cumulative[lo]) / counts
+
+
+def pick_bands(wavenb, spectra, n_bands=5, smooth=1, wn_min=None,
+               wn_max=None):
+    """
+    Find the n_bands most intense local maxima of every column of the
+    (rows x columns) spectra array, with wavenb the wavenumber of each
+    row.
+
+    The spectra are first smoothed with a moving average of `smooth`
+    rows, and only the maxima between wn_min and wn_max are kept. The
+    band positions are refined by a parabola through the maximum and its
+    two neighbours.
+
+    Returns the (n_bands x columns) arrays (wavenumbers, intensities),
+    ordered by decreasing intensity. Columns with fewer bands are padded
+    with NaN.
+    """
+    values = smooth_columns(np.asarray(spectra, dtype=np.float64), smooth)
+    wavenb = np.asarray(wavenb, dtype=np.float64)
+    n_rows = len(values)
+
+    # Interior points higher than the previous and not lower than the
+    # next one, which keeps a single point of flat topped maxima.
+    is_max = np.zeros(values.shape, dtype=bool)
+    is_max[1:-1] = (values[1:-1] > values[:-2]) & (values[1:-1] >= values[2:])
+    if wn_min is not None:
+        is_max &= (wavenb >= wn_min)[:, np.newaxis]
+    if wn_max is not None:
+        is_max &= (wavenb <= wn_max)[:, np.newaxis]
+
+    heights = np.where(is_max, values, -np.inf)
+    n_bands = min(n_bands, n_rows)
+    # The n_bands highest rows of each column, then sorted among them.
+    top = np.argpartition(-heights, n_bands - 1, axis=0)[:n_bands]
+    top_heights = np.take_along_axis(heights, top, axis=0)
+    order = np.argsort(-top_heights, axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    top_heights = np.take_along_axis(top_heights, order, axis=0)
+    valid = np.isfinite(top_heights)
+
+    # Parabolic interpolation of the position of each maximum.
+    idx = np.clip(top, 1, n_rows - 2)
+    left = np.take_along_axis(values, idx - 1, axis=0)
+    centre = np.take_along_axis(values, idx, axis=0)
+    right = np.take_along_axis(values, idx + 1, axis=0)
+    curvature = left - 2.0 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(
+            curvature < 0, 0.5 * (left - right) / curvature, 0.0)
+    step = wavenb[idx + 1] - wavenb[idx]
+    positions = wavenb[idx] + shift * step
+
+    return (np.where(valid, positions, np.nan),
+            np.where(valid, top_heights, np.nan))
+
+
+def pws_bands(path, n_bands=5, smooth=1, wn_min=None, wn_max=None,
+              cache_dir=CACHE_DIR):
+    """
+    Return the bands of every column of a PWS file as a dataframe with
+    the columns column, rank (0 is the most intense), wavenumber and
+    intensity. The result is cached per file content.
+    """
+    result_name = 'pws-bands-{0}-{1}-{2}-{3}'.format(
+        n_bands, smooth, wn_min, wn_max)
+    bands = read_cached_result(path, result_name, cache_dir=cache_dir)
+    if bands is not None:
+        return bands
+
+    spectrum = read_pws(path)
+    columns = list(spectrum.columns[1:])
+    positions, intensities = pick_bands(
+        spectrum.values[:, 0], spectrum.values[:, 1:], n_bands=n_bands,
+        smooth=smooth, wn_min=wn_min, wn_max=wn_max)
+
+    # One row per (column, rank), in column order.
+    n_ranks = positions.shape[0]
+    bands = pd.DataFrame(dict(
+        column=np.repeat(columns, n_ranks),
+        rank=np.tile(np.arange(n_ranks), len(columns)),
+        wavenumber=positions.T.ravel(),
+        intensity=intensities.T.ravel(),
+    ))
+    bands = bands.dropna(subset=['wavenumber']).reset_index(drop=True)
+
+    write_cached_result(path, result_name, bands, cache_dir=cache_dir)
+    return bands
+
+
+def pws_band_table(json_metadata_path, n_bands=5, smooth=1, wn_min=None,
+                   wn_max=None, cache_dir=CACHE_DIR):
+    """
+    Pick the bands of every PWS file of an ISA-JSON investigation, see
+    pws_bands(). Returns one dataframe with a data_file column.
+    """
+    metadata = load_metadata(json_metadata_path)
+    # The recorded hashes spare hashing the files for the cache keys.
+    remember_file_hashes(metadata)
+    tables = list()
+    for study in metadata['studies']:
+        for assay in study['assays']:
+            for data_file in assay['dataFiles']:
+                if data_file['type'] != PWS_FILE_TYPE:
+                    continue
+                bands = pws_bands(
+                    data_file['name'], n_bands=n_bands, smooth=smooth,
+                    wn_min=wn_min, wn_max=wn_max, cache_dir=cache_dir)
+                tables.append(bands.assign(data_file=data_file['name']))
+
+    if not tables:
+        logging.warning('No PWS files in %s.', json_metadata_path)
+        return pd.DataFrame(columns=[
+            'column', 'rank', 'wavenumber', 'intensity', 'data_file'])
+    return pd.concat(tables, ignore_index=True)
+
+
+def match_raman(raman, bands, tolerance=10.0, on='wavelength'):
+    """
+    Match every Raman peak (rows of the raman dataframe with a value in
+    the `on` column, in cm-1) to the nearest band of the band table,
+    within `tolerance` cm-1.
+
+    Returns the raman rows with the band columns added, NaN where no
+    band is close enough.
+    """
+    raman = raman[raman[on].notnull()]
+    raman = raman.assign(**{on: raman[on].astype(np.float64)})
+    bands = bands.rename(columns=dict(data_file='band_file'))
+    bands = bands.assign(
+        wavenumber=bands['wavenumber'].astype(np.float64))
+    return pd.merge_asof(
+        raman.sort_values(on),
+        bands.sort_values('wavenumber'),
+        left_on=on,
+        right_on='wavenumber',
+        direction='nearest',
+        tolerance=tolerance,
+    )
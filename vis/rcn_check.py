@@ -0,0 +1,268 @@
+"""
+=======================
+RDF Consistency Checker
+=======================
+
+Recomputes the running coordination numbers (RCN) of RDF files from
+their RDFs and compares them with the RCN columns the files carry, to
+catch truncated or inconsistent outputs:
+
+    RCN(r) = \\int_0^r 4 pi rho s^2 g(s) ds
+
+The integral is a cumulative trapezoid over all files and pairs at once.
+The RCN columns of the RDF files (and of vis.rdf_engine) count the
+neighbours up to the end of the bin of each point, half a step past r,
+so the recomputed values are read at r + shift * dr (shift=0.5).
+
+The neighbour density rho is not recorded in the files. Unless given, it
+is fitted to the recorded RCN, see structure_factor.infer_density().
+
+Each (file, pair) is flagged as
+
+    truncated   the recorded RCN decreases, as when a file falls back to
+                zero where its data stops (truncated_r is the first
+                point of the drop),
+    diverges    the recomputed RCN differs from the recorded one by more
+                than atol + rtol * RCN before any truncation,
+    invalid     the file has missing or non-finite values, or could not
+                be read (the error is in the message column).
+
+Run from the repository root:
+
+    python -m vis.rcn_check metadata.json [--processes 4]
+"""
+
+import logging
+import argparse
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from vis.utils import (
+    CACHE_DIR, load_metadata, load_cached_df, remember_file_hashes)
+from vis.structure_factor import infer_density
+
+# Order of the columns of the table returned by validate_files().
+CHECK_COLUMNS = [
+    'data_file', 'pair', 'n_points', 'r_max', 'density', 'max_deviation',
+    'max_deviation_r', 'truncated_r', 'truncated', 'diverges', 'invalid',
+    'message']
+
+# Default tolerances on the coordination numbers. The files print the
+# RCN with four decimals and the RDF with about four significant digits.
+DEFAULT_RTOL = 0.02
+DEFAULT_ATOL = 0.1
+
+# Files handed to each worker process at a time.
+POOL_CHUNK = 16
+
+
+def cumulative_rcn(r, rdf, density, shift=0.0):
+    """
+    Return the running coordination numbers of the (n_files x n_r x
+    n_pairs) rdf array on the grid r, by cumulative trapezoid
+    integration of 4 pi rho r^2 g(r). density is a number or an
+    (n_files x n_pairs) array.
+
+    The values are read shift steps past each point of r (linearly
+    interpolated, the last step is extended past the end of the grid).
+    """
+    integrand = 4.0 * np.pi * (r ** 2)[np.newaxis, :, np.newaxis] * rdf
+    steps = (integrand[:, 1:] + integrand[:, :-1]) / 2.0 * \
+        np.diff(r)[np.newaxis, :, np.newaxis]
+    rcn = np.concatenate(
+        [np.zeros_like(rdf[:, :1]), np.cumsum(steps, axis=1)], axis=1)
+    if shift:
+        steps = np.concatenate([steps, steps[:, -1:]], axis=1)
+        rcn = rcn + shift * steps
+    density = np.asarray(density, dtype=np.float64)
+    if density.ndim == 2:
+        density = density[:, np.newaxis, :]
+    return rcn * density
+
+
+def check_arrays(r, rdf, rcn, density=None, shift=0.5, rtol=DEFAULT_RTOL,
+                 atol=DEFAULT_ATOL):
+    """
+    Check the recorded rcn of (n_files x n_r x n_pairs) arrays against
+    the one recomputed from rdf, see cumulative_rcn(). density defaults
+    to the fitted one.
+
+    Returns a dictionary of (n_files x n_pairs) arrays: density,
+    max_deviation and max_deviation_r (largest difference before any
+    truncation and where it is), truncated_r (NaN if not truncated) and
+    the truncated, diverges and invalid flags.
+    """
+    n_r = len(r)
+    positions = np.arange(n_r)[np.newaxis, :, np.newaxis]
+    invalid = ~(np.isfinite(rdf).all(axis=1) & np.isfinite(rcn).all(axis=1))
+    rdf = np.where(np.isfinite(rdf), rdf, 0.0)
+    rcn = np.where(np.isfinite(rcn), rcn, 0.0)
+
+    if density is None:
+        density = infer_density(r, rdf, rcn)
+    density = np.broadcast_to(
+        np.asarray(density, dtype=np.float64), rdf[:, 0, :].shape)
+
+    # The first point past a decrease of the recorded RCN.
+    drops = np.zeros(rcn.shape, dtype=bool)
+    drops[:, 1:] = np.diff(rcn, axis=1) < -atol
+    truncated = drops.any(axis=1)
+    first_drop = np.where(truncated, np.argmax(drops, axis=1), n_r)
+
+    recomputed = cumulative_rcn(r, rdf, density, shift=shift)
+    excess = np.abs(recomputed - rcn) - rtol * np.abs(rcn)
+    excess = np.where(positions < first_drop[:, np.newaxis, :], excess, 0.0)
+    worst = np.argmax(excess, axis=1)
+    max_deviation = np.take_along_axis(
+        np.abs(recomputed - rcn), worst[:, np.newaxis, :], axis=1)[:, 0, :]
+
+    return dict(
+        density=density,
+        max_deviation=max_deviation,
+        max_deviation_r=r[worst],
+        truncated_r=np.where(
+            truncated, r[np.minimum(first_drop, n_r - 1)], np.nan),
+        truncated=truncated,
+        diverges=excess.max(axis=1) > atol,
+        invalid=invalid,
+    )
+
+
+def _read_arrays(path, cache_dir):
+    """
+    Return (path, r, rdf, rcn, pairs, error) of an RDF file, the arrays
+    being (n_r x n_pairs), or None with the error message if it cannot
+    be read. Top level so it can run in a worker process.
+    """
+    try:
+        df = load_cached_df(path, cache_dir=cache_dir)
+    except (OSError, ValueError) as error:
+        return path, None, None, None, None, str(error)
+
+    pairs = [
+        name[len('RDF_'):] for name in df.columns
+        if name.startswith('RDF_') and 'RCN_' + name[len('RDF_'):] in df]
+    if 'r' not in df or not pairs or len(df) < 2:
+        return path, None, None, None, None, 'No r, RDF_ and RCN_ columns.'
+    return (
+        path,
+        np.asarray(df['r'], dtype=np.float64),
+        df[['RDF_' + pair for pair in pairs]].values.astype(np.float64),
+        df[['RCN_' + pair for pair in pairs]].values.astype(np.float64),
+        pairs,
+        None,
+    )
+
+
+def validate_files(paths, density=None, shift=0.5, rtol=DEFAULT_RTOL,
+                   atol=DEFAULT_ATOL, processes=None, cache_dir=CACHE_DIR):
+    """
+    Check every RDF file of paths, see check_arrays(). density is None
+    (fitted), a number or a dictionary of numbers by pair.
+
+    The files are read by `processes` worker processes (all CPUs by
+    default, 1 reads in this process), through the parsed file cache of
+    utils.load_cached_df(). The files sharing the same grid and pairs
+    are then checked together in a single call.
+
+    Returns a dataframe of the CHECK_COLUMNS, one row per (file, pair),
+    or one row per unreadable file.
+    """
+    if processes == 1:
+        read = [_read_arrays(path, cache_dir) for path in paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            read = list(executor.map(
+                _read_arrays, paths, [cache_dir] * len(paths),
+                chunksize=POOL_CHUNK))
+
+    rows = list()
+    groups = dict()
+    for path, r, rdf, rcn, pairs, error in read:
+        if error is not None:
+            rows.append(dict(
+                data_file=path, truncated=False, diverges=False, invalid=True,
+                message=error))
+            continue
+        key = (r.tobytes(), tuple(pairs))
+        groups.setdefault(key, list()).append((path, r, rdf, rcn, pairs))
+
+    for members in groups.values():
+        r, pairs = members[0][1], members[0][4]
+        group_density = density
+        if isinstance(density, dict):
+            group_density = [density[pair] for pair in pairs]
+        checks = check_arrays(
+            r, np.stack([member[2] for member in members]),
+            np.stack([member[3] for member in members]),
+            density=group_density, shift=shift, rtol=rtol, atol=atol)
+        for file_idx, member in enumerate(members):
+            for pair_idx, pair in enumerate(pairs):
+                row = dict(
+                    data_file=member[0], pair=pair, n_points=len(r),
+                    r_max=r[-1], message='')
+                for name, values in checks.items():
+                    row[name] = values[file_idx, pair_idx]
+                rows.append(row)
+
+    table = pd.DataFrame(rows, columns=CHECK_COLUMNS)
+    # Keep the order of the given paths.
+    order = {path: idx for idx, path in enumerate(paths)}
+    table = table.sort_values(
+        'data_file', key=lambda column: column.map(order), kind='stable')
+    return table.reset_index(drop=True)
+
+
+def rdf_data_files(metadata, file_type='Maxime-RDF'):
+    """Names of the data files of the given type in the metadata."""
+    return [
+        data_file['name']
+        for study in metadata['studies']
+        for assay in study['assays']
+        for data_file in assay['dataFiles']
+        if data_file.get('type') == file_type
+    ]
+
+
+def validate_investigation(json_metadata_path, **kwargs):
+    """
+    Check every RDF data file of a metadata file, see validate_files()
+    for the keyword arguments.
+    """
+    metadata = load_metadata(json_metadata_path)
+    # The recorded hashes spare hashing the files for the cache keys.
+    remember_file_hashes(metadata)
+    paths = rdf_data_files(metadata)
+    return validate_files(paths, **kwargs)
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Check the coordination numbers of the RDF files of '
+                    'an ISA-JSON metadata file against their RDFs.')
+    parser.add_argument('metadata', help='path to the ISA-JSON metadata')
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL)
+    parser.add_argument('--atol', type=float, default=DEFAULT_ATOL)
+    parser.add_argument(
+        '--processes', type=int, help='worker processes (default: CPUs)')
+    parser.add_argument(
+        '--all', action='store_true', help='also list the files passing')
+    args = parser.parse_args()
+
+    table = validate_investigation(
+        args.metadata, rtol=args.rtol, atol=args.atol,
+        processes=args.processes)
+    failed = table['truncated'] | table['diverges'] | table['invalid']
+    shown = table if args.all else table[failed]
+    if len(shown):
+        print(shown.to_string(index=False))
+    logging.info(
+        '%d of %d file pairs flagged', failed.sum(), len(table))
+    if failed.any():
+        parser.exit(1)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+========================
+RDF First Shell Analysis
+========================
+
+Extracts the first coordination shell of every pair of every RDF file
+at once, from the stacked arrays of vis.rdf_tensor:
+
+    peak_r          position of the first peak (highest point past r_min),
+    peak_height     RDF value at the peak,
+    fwhm            full width at half maximum of the peak,
+    min_r           position of the first minimum after the peak, where
+                    the RDF stops decreasing,
+    min_height      RDF value at the minimum,
+    coordination    cumulative coordination number (RCN) at the minimum.
+
+The results of each file are cached by the hash of its content, so only
+new or edited files are analysed again.
+
+The optional spline refinement requires scipy.
+"""
+
+import numpy as np
+import pandas as pd
+from vis.utils import CACHE_DIR, read_cached_result, write_cached_result
+from vis.rdf_tensor import data_file_of, layout_groups, stack_rdfs
+
+# Order of the columns of the table returned by rdf_shell_table().
+SHELL_COLUMNS = [
+    'peak_r', 'peak_height', 'fwhm', 'min_r', 'min_height', 'coordination']
+
+
+def _take(values, idx):
+    """values[f, idx[f, p], p] for every file f and pair p."""
+    return np.take_along_axis(values, idx[:, np.newaxis, :], axis=1)[:, 0, :]
+
+
+def _first_true(mask, default):
+    """
+    Index of the first True along axis 1 of a (files x r x pairs) mask,
+    or default where there is none.
+    """
+    idx = np.argmax(mask, axis=1)
+    return np.where(mask.any(axis=1), idx, default)
+
+
+def _crossing(r, g, lo, level):
+    """
+    r where the RDF crosses level between the points lo and lo + 1,
+    by linear interpolation.
+    """
+    g_lo = _take(g, lo)
+    g_hi = _take(g, lo + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(g_hi != g_lo, (level - g_lo) / (g_hi - g_lo), 0.0)
+    return r[lo] + frac * (r[lo + 1] - r[lo])
+
+
+def first_shell(r, rdf, rcn, r_min=0.0):
+    """
+    Return a dictionary of the SHELL_COLUMNS (n_files x n_pairs) arrays
+    for the (n_files x n_r x n_pairs) rdf and rcn arrays on the grid r.
+
+    Features that cannot be found (e.g. no minimum before the end of
+    the grid) are NaN.
+    """
+    n_r = len(r)
+    positions = np.arange(n_r)[np.newaxis, :, np.newaxis]
+
+    # First peak, the highest point past r_min.
+    start = np.searchsorted(r, r_min)
+    peak = start + np.argmax(rdf[:, start:, :], axis=1)
+    peak_height = _take(rdf, peak)
+    after_peak = positions > peak[:, np.newaxis, :]
+
+    # First minimum, the first point past the peak that is not above the
+    # next one. This also finds the start of a flat zero region.
+    not_decreasing = np.zeros_like(after_peak)
+    not_decreasing[:, :-1, :] = rdf[:, :-1, :] <= rdf[:, 1:, :]
+    minimum = _first_true(not_decreasing & after_peak, -1)
+    found = minimum >= 0
+    minimum = np.where(found, minimum, 0)
+
+    # Some files fall back to zero RCN where their data stops, use the
+    # running maximum of the cumulative number instead.
+    running_rcn = np.maximum.accumulate(rcn, axis=1)
+
+    # Half maximum crossings on each side of the peak.
+    half = peak_height / 2.0
+    below = rdf < half[:, np.newaxis, :]
+    left_mask = below & (positions < peak[:, np.newaxis, :])
+    # Last point below half before the peak.
+    left = n_r - 1 - _first_true(left_mask[:, ::-1, :], n_r)
+    right = _first_true(below & after_peak, -1)
+    has_width = (left >= 0) & (right >= 0)
+    left = np.clip(left, 0, n_r - 2)
+    right = np.clip(right, 1, n_r - 1)
+    fwhm = _crossing(r, rdf, right - 1, half) - _crossing(r, rdf, left, half)
+
+    return dict(
+        peak_r=r[peak],
+        peak_height=peak_height,
+        fwhm=np.where(has_width, fwhm, np.nan),
+        min_r=np.where(found, r[minimum], np.nan),
+        min_height=np.where(found, _take(rdf, minimum), np.nan),
+        coordination=np.where(found, _take(running_rcn, minimum), np.nan),
+    )
+
+
+def refine_grid(r, rdf, rcn, factor):
+    """
+    Resample the rdf and rcn arrays on a grid factor times finer than r.
+    The RDF goes through a cubic spline, so the peak can fall between
+    the points of r, the RCN is interpolated linearly.
+    Returns (r, rdf, rcn) on the new grid.
+    """
+    from scipy.interpolate import CubicSpline
+
+    fine_r = np.linspace(r[0], r[-1], (len(r) - 1) * factor + 1)
+    fine_rdf = CubicSpline(r, rdf, axis=1)(fine_r)
+
+    lo = np.clip(np.searchsorted(r, fine_r, side='right') - 1, 0, len(r) - 2)
+    frac = ((fine_r - r[lo]) / (r[lo + 1] - r[lo]))[np.newaxis, :, np.newaxis]
+    fine_rcn = rcn[:, lo, :] * (1.0 - frac) + rcn[:, lo + 1, :] * frac
+
+    return fine_r, fine_rdf, fine_rcn
+
+
+def analyze_tensor(tensor, r_min=0.0, refine=1):
+    """
+    Run first_shell() on an RDFTensor, optionally on a grid refine times
+    finer (refine > 1 requires scipy).
+    """
+    r, rdf, rcn = tensor.r, tensor.rdf, tensor.rcn
+    if refine > 1:
+        r, rdf, rcn = refine_grid(r, rdf, rcn, refine)
+    return first_shell(r, rdf, rcn, r_min=r_min)
+
+
+def rdf_shell_table(items, r_min=0.0, refine=1, cache_dir=CACHE_DIR):
+    """
+    Return the first shell of every pair of every RDF file as a
+    dataframe, one row per (file, pair), for RDF handles or frames as
+    returned by read_rdf().
+
+    Results are cached per file content. Only the files without cached
+    results are loaded, and those sharing the same pairs and r grid are
+    analysed together in a single call, so every file is analysed over
+    all of its own pairs and points whatever it is batched with.
+    """
+    data_files = [data_file_of(item) for item in items]
+    result_name = 'rdf-shell-{0}-{1}'.format(r_min, refine)
+
+    results = [
+        read_cached_result(data_file, result_name, cache_dir=cache_dir)
+        for data_file in data_files
+    ]
+
+    missing = [idx for idx, result in enumerate(results) if result is None]
+    frames = [getattr(items[idx], 'frame', items[idx]) for idx in missing]
+    for group in layout_groups(frames):
+        tensor = stack_rdfs([frames[member] for member in group])
+        shell = analyze_tensor(tensor, r_min=r_min, refine=refine)
+        for file_idx, member in enumerate(group):
+            result = pd.DataFrame(
+                {name: shell[name][file_idx] for name in SHELL_COLUMNS})
+            result.insert(0, 'pair', tensor.pairs)
+            result.insert(0, 'species', tensor.labels[file_idx])
+            idx = missing[member]
+            results[idx] = result
+            write_cached_result(
+                data_files[idx], result_name, result, cache_dir=cache_dir)
+
+    table = pd.concat(
+        [result.assign(data_file=data_file)
+         for data_file, result in zip(data_files, results)],
+        ignore_index=True)
+    return table
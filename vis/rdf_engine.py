@@ -0,0 +1,312 @@
+"""
+=====================
+Trajectory RDF Engine
+=====================
+
+Computes radial distribution functions and running coordination numbers
+from the atomic positions of XYZ trajectories, in the layout of the RDF
+files of Maxime's simulations:
+
+    # r           RDF_Al-Ob    RDF_Al-Oh  RCN_Al-Ob   RCN_Al-Oh
+
+so RDFs of new pair types can be produced without going back to the
+simulation code, and read by the rest of the package as any RDF file.
+
+The box is orthorhombic and periodic. The neighbours of each frame are
+found with a periodic KD-tree (scipy.spatial.cKDTree with boxsize) if
+scipy is installed, otherwise by a chunked NumPy minimum image search.
+Frames are distributed over a process pool.
+
+Run from the repository root:
+
+    python -m vis.rdf_engine trajectory.xyz out.RDF --box 18.64 \\
+        --pair O-H --pair O-O
+"""
+
+import logging
+import argparse
+import itertools
+import importlib.util
+import concurrent.futures
+import numpy as np
+import pandas as pd
+
+# Default bin width and range, as in the RDF files, in angstroms.
+DEFAULT_DR = 0.02
+DEFAULT_R_MAX = 4.0
+
+# Reference atoms handled at once by the NumPy neighbour search, this
+# bounds its memory to about chunk x atoms x 3 floats.
+NUMPY_CHUNK = 256
+
+# Frames handed to the process pool at a time.
+POOL_BATCH = 64
+
+
+def _parse_lattice(comment):
+    """
+    Return the diagonal of an extended XYZ Lattice="..." entry of a
+    comment line, or None.
+    """
+    if 'Lattice="' not in comment:
+        return None
+    values = comment.split('Lattice="', 1)[1].split('"', 1)[0].split()
+    matrix = np.array(values, dtype=np.float64).reshape(3, 3)
+    return np.diag(matrix).copy()
+
+
+def _parse_atoms(lines):
+    """(symbols, positions) of the 'symbol x y z' lines of a frame."""
+    if not lines:
+        return np.empty(0, dtype=str), np.empty((0, 3))
+    tokens = np.array(' '.join(lines).split()).reshape(len(lines), -1)
+    return tokens[:, 0], tokens[:, 1:4].astype(np.float64)
+
+
+def read_xyz_frames(path):
+    """
+    Yield the frames of an XYZ trajectory as (symbols, positions, box)
+    tuples, box being None unless the comment line has an extended XYZ
+    Lattice entry.
+
+    Standard XYZ files (atom count line, comment line, atom lines,
+    repeated) and bare lists of 'symbol x y z' lines (read as a single
+    frame) are supported. Fortran E-notation is accepted. The file is
+    read one frame at a time, so trajectories larger than memory can be
+    streamed.
+    """
+    with open(path, 'r') as f:
+        line = f.readline()
+        if len(line.split()) != 1:
+            # No count line, a single frame of atom lines.
+            atom_lines = [
+                atom for atom in itertools.chain([line], f) if atom.strip()]
+            if not atom_lines:
+                raise ValueError('{}: no atoms found.'.format(path))
+            symbols, positions = _parse_atoms(atom_lines)
+            yield symbols, positions, None
+            return
+
+        line_number = 1
+        while line.strip():
+            n_atoms = int(line)
+            comment = f.readline()
+            atom_lines = list(itertools.islice(f, n_atoms))
+            if len(atom_lines) != n_atoms:
+                raise ValueError('{}: truncated frame at line {}.'.format(
+                    path, line_number))
+            symbols, positions = _parse_atoms(atom_lines)
+            yield symbols, positions, _parse_lattice(comment)
+            line_number += 2 + n_atoms
+            line = f.readline()
+
+
+def _wrap(positions, box):
+    """
+    Positions folded into [0, box). np.mod gives exactly box for tiny
+    negative values (e.g. -1e-17), which cKDTree rejects.
+    """
+    wrapped = np.mod(positions, box)
+    return np.where(wrapped >= box, wrapped - box, wrapped)
+
+
+def _distances_kdtree(centres, neighbours, box, r_max):
+    """Distances below r_max between the two sets, periodic KD-tree."""
+    from scipy.spatial import cKDTree
+
+    centre_tree = cKDTree(_wrap(centres, box), boxsize=box)
+    neighbour_tree = cKDTree(_wrap(neighbours, box), boxsize=box)
+    pairs = centre_tree.sparse_distance_matrix(
+        neighbour_tree, r_max, output_type='ndarray')
+    return pairs['v']
+
+
+def _distances_numpy(centres, neighbours, box, r_max):
+    """Distances below r_max between the two sets, minimum image."""
+    found = list()
+    for start in range(0, len(centres), NUMPY_CHUNK):
+        diff = centres[start:start + NUMPY_CHUNK, np.newaxis, :] - \
+            neighbours[np.newaxis, :, :]
+        diff -= box * np.round(diff / box)
+        dist = np.sqrt((diff * diff).sum(axis=-1))
+        found.append(dist[dist < r_max])
+    return np.concatenate(found) if found else np.empty(0)
+
+
+def pair_distances(centres, neighbours, box, r_max, use_scipy=None):
+    """
+    Return the distances below r_max between every centre and every
+    neighbour atom in a periodic orthorhombic box (a 3-vector), using the
+    minimum image. Zero distances (an atom and itself) are left out.
+
+    use_scipy selects the KD-tree (True) or NumPy (False) search, by
+    default scipy is used if it can be imported.
+    """
+    if use_scipy is None:
+        use_scipy = importlib.util.find_spec('scipy') is not None
+
+    if use_scipy:
+        distances = _distances_kdtree(centres, neighbours, box, r_max)
+    else:
+        distances = _distances_numpy(centres, neighbours, box, r_max)
+    return distances[distances > 0]
+
+
+def _frame_counts(args):
+    """
+    Histogram of the pair distances of one frame, as a (pairs x bins)
+    array, with the number of centre and neighbour atoms of each pair.
+    Top level so it can run in a worker process.
+    """
+    symbols, positions, box, pairs, edges, use_scipy = args
+    r_max = edges[-1]
+    counts = np.zeros((len(pairs), len(edges) - 1))
+    n_atoms = np.zeros((len(pairs), 2))
+    for idx, (centre, neighbour) in enumerate(pairs):
+        centres = positions[symbols == centre]
+        neighbours = positions[symbols == neighbour]
+        n_atoms[idx] = len(centres), len(neighbours)
+        if len(centres) and len(neighbours):
+            distances = pair_distances(
+                centres, neighbours, box, r_max, use_scipy=use_scipy)
+            counts[idx] = np.histogram(distances, bins=edges)[0]
+    return counts, n_atoms
+
+
+def compute_rdf(frames, pairs, box=None, r_max=DEFAULT_R_MAX, dr=DEFAULT_DR,
+                processes=None, use_scipy=None):
+    """
+    Compute the RDF and running coordination number of each pair type
+    over the frames of a trajectory (an XYZ path, or an iterable of
+    (symbols, positions, box) as from read_xyz_frames()).
+
+    pairs are 'A-B' strings: B atoms around A atoms. box is the periodic
+    box lengths (a number or 3 values), taken from the frames if None.
+    r_max must not exceed half the smallest box length.
+
+    The points are r = 0, dr, 2 dr, ... like the RDF files, the bin of a
+    point spanning r - dr/2 to r + dr/2:
+
+        RDF_A-B(r) = <n_B(bin)> / (rho_B * shell volume)
+        RCN_A-B(r) = <n_B(distance < r + dr/2)>
+
+    averaged over the A atoms and the frames, rho_B being the number
+    density of the B atoms (less the A atom itself when A is B).
+
+    The frames are spread over `processes` worker processes (all CPUs by
+    default, 1 runs in this process). Returns a dataframe with the r,
+    RDF_* and RCN_* columns.
+    """
+    if isinstance(frames, str):
+        frames = read_xyz_frames(frames)
+    pair_types = [tuple(pair.split('-', 1)) for pair in pairs]
+    n_points = int(round(r_max / dr)) + 1
+    r = np.arange(n_points) * dr
+    edges = np.clip(np.arange(n_points + 1) * dr - dr / 2, 0, None)
+
+    def tasks():
+        for symbols, positions, frame_box in frames:
+            frame_box = frame_box if box is None else box
+            if frame_box is None:
+                raise ValueError('No box given nor found in the frames.')
+            frame_box = np.broadcast_to(
+                np.asarray(frame_box, dtype=np.float64), (3,)).copy()
+            if edges[-1] > frame_box.min() / 2:
+                raise ValueError(
+                    'r_max is more than half the box, {}.'.format(frame_box))
+            yield (symbols, positions, frame_box, pair_types, edges,
+                   use_scipy), np.prod(frame_box)
+
+    counts = np.zeros((len(pair_types), n_points))
+    # Sum over the frames of n_A and n_A * rho_B.
+    centres = np.zeros(len(pair_types))
+    centre_density = np.zeros(len(pair_types))
+    n_frames = 0
+
+    def accumulate(result, volume):
+        frame_counts, n_atoms = result
+        counts[:] += frame_counts
+        n_centres, n_neighbours = n_atoms.T
+        same = np.array([a == b for a, b in pair_types])
+        centres[:] += n_centres
+        centre_density[:] += n_centres * (n_neighbours - same) / volume
+
+    if processes == 1:
+        for args, volume in tasks():
+            accumulate(_frame_counts(args), volume)
+            n_frames += 1
+    else:
+        # Frames are sent to the pool in batches, so a long trajectory
+        # is never held in memory at once.
+        task_iter = tasks()
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            batch = list(itertools.islice(task_iter, POOL_BATCH))
+            while batch:
+                results = executor.map(
+                    _frame_counts, [args for args, _ in batch])
+                for result, (_, volume) in zip(results, batch):
+                    accumulate(result, volume)
+                    n_frames += 1
+                batch = list(itertools.islice(task_iter, POOL_BATCH))
+
+    if n_frames == 0:
+        raise ValueError('No frames in the trajectory.')
+
+    shell_volume = 4.0 / 3.0 * np.pi * (edges[1:] ** 3 - edges[:-1] ** 3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rdf = counts / (centre_density[:, np.newaxis] * shell_volume)
+        rcn = np.cumsum(counts, axis=1) / centres[:, np.newaxis]
+    rdf = np.nan_to_num(rdf)
+    rcn = np.nan_to_num(rcn)
+
+    columns = dict(r=r)
+    for idx, pair in enumerate(pairs):
+        columns['RDF_' + pair] = rdf[idx]
+    for idx, pair in enumerate(pairs):
+        columns['RCN_' + pair] = rcn[idx]
+    logging.info('RDF of %s over %d frames.', ', '.join(pairs), n_frames)
+    return pd.DataFrame(columns)
+
+
+def write_rdf(frame, path):
+    """
+    Write an RDF dataframe (r, RDF_* and RCN_* columns) in the fixed
+    width layout of the RDF files, readable by utils.create_pandas_df().
+    """
+    names = list(frame.columns)
+    header = '{:<10}'.format(names[0]) + ''.join(
+        '{:>12}'.format(name) for name in names[1:])
+    np.savetxt(
+        path, frame.values,
+        fmt=['%8.4f'] + ['%12.4f'] * (len(names) - 1),
+        header=header, comments='# ')
+    return
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Compute RDF files from an XYZ trajectory.')
+    parser.add_argument('trajectory', help='XYZ trajectory file')
+    parser.add_argument('output', help='RDF file to write')
+    parser.add_argument(
+        '--pair', action='append', required=True,
+        help="pair type 'A-B', may be repeated")
+    parser.add_argument(
+        '--box', type=float, nargs='+',
+        help='periodic box length(s), if not in the trajectory')
+    parser.add_argument('--r-max', type=float, default=DEFAULT_R_MAX)
+    parser.add_argument('--dr', type=float, default=DEFAULT_DR)
+    parser.add_argument(
+        '--processes', type=int, help='worker processes (default: CPUs)')
+    args = parser.parse_args()
+
+    rdf = compute_rdf(
+        args.trajectory, args.pair, box=args.box, r_max=args.r_max,
+        dr=args.dr, processes=args.processes)
+    write_rdf(rdf, args.output)
+    return
+
+
+if __name__ == '__main__':
+    main()
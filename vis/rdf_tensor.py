@@ -0,0 +1,187 @@
+"""
+==================
+Stacked RDF Arrays
+==================
+
+The RDF files of the simulations share the same r grid, so they can be
+held as one (n_files x n_r x n_pairs) NumPy array instead of a list of
+dataframes. Comparing many runs (averaging, differences, peak positions)
+is then a single array operation.
+"""
+
+import os
+import logging
+import numpy as np
+from vis.utils import read_rdf
+
+
+class RDFTensor(object):
+    """
+    A stack of RDF files on a shared r grid.
+
+    Attributes:
+
+        r:          (n_r,) array of distances, in angstroms.
+        rdf:        (n_files, n_r, n_pairs) array of the RDF_* columns.
+        rcn:        (n_files, n_r, n_pairs) array of the RCN_* columns.
+        pairs:      list of the n_pairs pair types, e.g. 'Al-Ob'.
+        labels:     list of the n_files labels, the aluminate species.
+        data_files: list of the n_files data file paths.
+    """
+
+    def __init__(self, r, rdf, rcn, pairs, labels, data_files):
+        self.r = r
+        self.rdf = rdf
+        self.rcn = rcn
+        self.pairs = list(pairs)
+        self.labels = list(labels)
+        self.data_files = list(data_files)
+
+    def __len__(self):
+        """Number of stacked files."""
+        return self.rdf.shape[0]
+
+    def __repr__(self):
+        return 'RDFTensor({} files, {} points, pairs={})'.format(
+            len(self), len(self.r), self.pairs)
+
+    def select(self, files=None, pairs=None):
+        """
+        Return a new RDFTensor holding only the given files (indices or
+        labels) and pairs (names). None keeps all of them.
+        """
+        if files is None:
+            file_idx = list(range(len(self)))
+        else:
+            file_idx = [
+                self.labels.index(f) if isinstance(f, str) else f
+                for f in files
+            ]
+        if pairs is None:
+            pair_idx = list(range(len(self.pairs)))
+        else:
+            pair_idx = [self.pairs.index(p) for p in pairs]
+
+        return RDFTensor(
+            self.r,
+            self.rdf[np.ix_(file_idx, range(len(self.r)), pair_idx)],
+            self.rcn[np.ix_(file_idx, range(len(self.r)), pair_idx)],
+            [self.pairs[i] for i in pair_idx],
+            [self.labels[i] for i in file_idx],
+            [self.data_files[i] for i in file_idx],
+        )
+
+    def mean(self):
+        """Return the (n_r, n_pairs) RDF averaged over all files."""
+        return self.rdf.mean(axis=0)
+
+    def differences(self):
+        """
+        Return the (n_files, n_files, n_r, n_pairs) array of the RDF of
+        every file minus the RDF of every other file.
+        """
+        return self.rdf[:, np.newaxis] - self.rdf[np.newaxis, :]
+
+    def first_peaks(self, r_min=0.0):
+        """
+        Return the (n_files, n_pairs) arrays (positions, heights) of the
+        highest point of each RDF at r >= r_min.
+        """
+        start = np.searchsorted(self.r, r_min)
+        idx = start + np.argmax(self.rdf[:, start:, :], axis=1)
+        heights = np.take_along_axis(
+            self.rdf, idx[:, np.newaxis, :], axis=1)[:, 0, :]
+        return self.r[idx], heights
+
+
+def _frame_of(item):
+    """Return the dataframe of a read_rdf handle, or the frame itself."""
+    return getattr(item, 'frame', item)
+
+
+def data_file_of(item):
+    """
+    Return the data file of a read_rdf handle without loading it, or the
+    data_file attribute of a frame.
+    """
+    data_file = getattr(item, 'data_file', None)
+    if data_file is None:
+        data_file = item.attrs.get('data_file')
+    return data_file
+
+
+def layout_groups(frames):
+    """
+    Return the indices of the frames grouped by layout: the frames of a
+    group have the same RDF pairs and r grid, so stack_rdfs() keeps all
+    their pairs and points. Groups are in order of first appearance.
+    """
+    groups = dict()
+    for idx, frame in enumerate(frames):
+        key = (
+            tuple(col for col in frame.columns if col.startswith('RDF_')),
+            np.asarray(frame['r'], dtype=np.float64).tobytes(),
+        )
+        groups.setdefault(key, list()).append(idx)
+    return list(groups.values())
+
+
+def stack_rdfs(items, label_type='Aluminate Species', rtol=1e-6):
+    """
+    Stack RDF handles or frames (as returned by read_rdf) into an
+    RDFTensor.
+
+    Only the pairs present in every file are kept. Files of different
+    lengths are cut to the shortest one, as long as their r values agree
+    (within rtol) over that length, otherwise a ValueError is raised.
+    Each file is labelled by the first value of its label_type
+    characteristic, or by its file name if it has none.
+    """
+    frames = [_frame_of(item) for item in items]
+    if not frames:
+        raise ValueError('No RDF files to stack.')
+
+    # The pairs common to every file, in the order of the first one.
+    pairs = [
+        col[len('RDF_'):] for col in frames[0].columns
+        if col.startswith('RDF_')
+    ]
+    for frame in frames[1:]:
+        pairs = [p for p in pairs if 'RDF_' + p in frame.columns]
+
+    # Check the r grids against the first file.
+    n_r = min(len(frame) for frame in frames)
+    r = frames[0]['r'].values[:n_r].astype(np.float64)
+    for frame in frames[1:]:
+        if not np.allclose(frame['r'].values[:n_r], r, rtol=rtol):
+            raise ValueError('{} is not on the same r grid.'.format(
+                frame.attrs.get('data_file', 'An RDF file')))
+    if any(len(frame) != n_r for frame in frames):
+        logging.info('RDF files cut to their common %d points.', n_r)
+
+    rdf_columns = ['RDF_' + p for p in pairs]
+    rcn_columns = ['RCN_' + p for p in pairs]
+    rdf = np.stack(
+        [frame[rdf_columns].values[:n_r] for frame in frames]).astype(
+            np.float64)
+    rcn = np.stack(
+        [frame.reindex(columns=rcn_columns).values[:n_r] for frame in frames]
+    ).astype(np.float64)
+
+    labels = list()
+    data_files = list()
+    for frame in frames:
+        data_file = frame.attrs.get('data_file')
+        characteristics = frame.attrs.get('characteristics') or {}
+        data_files.append(data_file)
+        if characteristics.get(label_type):
+            labels.append(characteristics[label_type][0])
+        else:
+            labels.append(os.path.basename(data_file or ''))
+
+    return RDFTensor(r, rdf, rcn, pairs, labels, data_files)
+
+
+def load_rdf_tensor(json_metadata_path, char_types=('Aluminate Species',)):
+    """Stack every RDF file found by read_rdf() into an RDFTensor."""
+    return stack_rdfs(read_rdf(json_metadata_path, list(char_types)))
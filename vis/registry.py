@@ -0,0 +1,204 @@
+"""
+================
+Dataset Registry
+================
+
+`bokeh serve` executes an application script once for every browser
+session, so any data loaded at module level is loaded again for every
+tab that is opened. This module keeps a process wide registry of loaded
+datasets that the applications ask for their frames instead.
+
+An entry is reused as long as the metadata file and every data file it
+lists are unchanged (same size and modification time). When one of them
+changes the entry is loaded again on the next request.
+
+The returned objects are shared between all sessions of the server, so
+the applications must treat them as read-only.
+"""
+
+import os
+import threading
+from vis.utils import (
+    load_metadata, data_file_paths, read_rdf, remember_file_hashes)
+from vis.vis_helper import create_dataframes, build_code_cache
+from vis.isa_index import CharacteristicIndex
+from vis.catalog import open_catalog
+from vis.rdf_tensor import stack_rdfs
+from vis.rdf_analysis import rdf_shell_table
+from vis.pws_bands import pws_band_table
+
+# Maps a (loader, metadata path, arguments) key to the loaded entry.
+_registry = dict()
+# Sessions may be served from several threads, only one should load.
+# Re-entrant, as a loader may itself ask for another shared dataset.
+_lock = threading.RLock()
+
+
+def _file_signature(paths):
+    """
+    Return a tuple describing the current state of the given files.
+    Missing files are recorded as None so that their creation is seen
+    as a change.
+    """
+    signature = list()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append((path, None))
+        else:
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def get_dataset(loader, json_metadata_path, *args):
+    """
+    Return loader(json_metadata_path, *args), loading it only once per
+    server process.
+
+    The loader is identified by its qualified name rather than by the
+    function object, as `bokeh serve` re-creates the application module
+    for each session. All args must be hashable.
+
+    A value replaced by a new load is closed if it has a close() method,
+    e.g. the database connection of a catalog.MetadataCatalog. Sessions
+    should then ask for such values when they use them rather than keep
+    them.
+    """
+    key = (
+        loader.__module__,
+        loader.__qualname__,
+        os.path.abspath(json_metadata_path),
+        args,
+    )
+
+    with _lock:
+        metadata_signature = _file_signature([json_metadata_path])
+        entry = _registry.get(key)
+
+        # Reuse the entry if neither the metadata nor the data changed.
+        if entry is not None and \
+                entry['metadata'] == metadata_signature and \
+                entry['files'] == _file_signature(entry['paths']):
+            return entry['value']
+
+        # Record the data file paths before loading, so that a file
+        # modified during the load is picked up by the next request.
+        paths = data_file_paths(load_metadata(json_metadata_path))
+        files_signature = _file_signature(paths)
+        value = loader(json_metadata_path, *args)
+        _registry[key] = dict(
+            metadata=metadata_signature,
+            paths=paths,
+            files=files_signature,
+            value=value,
+        )
+        if entry is not None and entry['value'] is not value and \
+                hasattr(entry['value'], 'close'):
+            entry['value'].close()
+
+    return value
+
+
+def get_dataframes(json_metadata_path):
+    """Shared version of vis_helper.create_dataframes()."""
+    return get_dataset(create_dataframes, json_metadata_path)
+
+
+def _load_rdf_frames(json_metadata_path, char_types, catalog=False):
+    """
+    Load the RDF frames through the shared characteristic index, or the
+    shared SQLite catalog if catalog is True.
+    """
+    if catalog:
+        index = get_catalog(json_metadata_path)
+    else:
+        index = get_characteristic_index(json_metadata_path)
+    return read_rdf(json_metadata_path, char_types, index=index)
+
+
+def get_rdf_frames(json_metadata_path, char_types, catalog=False):
+    """
+    Shared version of utils.read_rdf(). With catalog=True the assays are
+    looked up in the catalog of get_catalog() instead of the index of
+    get_characteristic_index().
+    """
+    return get_dataset(
+        _load_rdf_frames, json_metadata_path, tuple(char_types), catalog)
+
+
+def _load_rdf_tensor(json_metadata_path, char_types):
+    """Stack the shared RDF frames into an RDFTensor."""
+    return stack_rdfs(get_rdf_frames(json_metadata_path, char_types))
+
+
+def get_rdf_tensor(json_metadata_path, char_types):
+    """Shared version of rdf_tensor.load_rdf_tensor()."""
+    return get_dataset(
+        _load_rdf_tensor, json_metadata_path, tuple(char_types))
+
+
+def _load_rdf_shell_table(json_metadata_path, char_types, r_min, refine):
+    """First shell table of the shared RDF frames."""
+    return rdf_shell_table(
+        get_rdf_frames(json_metadata_path, char_types),
+        r_min=r_min, refine=refine)
+
+
+def get_rdf_shell_table(json_metadata_path, char_types, r_min=0.0,
+                        refine=1):
+    """Shared version of rdf_analysis.rdf_shell_table()."""
+    return get_dataset(
+        _load_rdf_shell_table, json_metadata_path, tuple(char_types),
+        r_min, refine)
+
+
+def get_pws_band_table(json_metadata_path, n_bands=5, smooth=1, wn_min=None,
+                       wn_max=None):
+    """Shared version of pws_bands.pws_band_table()."""
+    return get_dataset(
+        pws_band_table, json_metadata_path, n_bands, smooth, wn_min, wn_max)
+
+
+def _load_characteristic_index(json_metadata_path):
+    """
+    Build the CharacteristicIndex of a metadata file, and remember the
+    hashes recorded in it for the caches of the data files.
+    """
+    metadata = load_metadata(json_metadata_path)
+    remember_file_hashes(metadata)
+    return CharacteristicIndex(metadata)
+
+
+def get_characteristic_index(json_metadata_path):
+    """Shared CharacteristicIndex of a metadata file."""
+    return get_dataset(_load_characteristic_index, json_metadata_path)
+
+
+def get_catalog(json_metadata_path):
+    """
+    Shared catalog.MetadataCatalog of a metadata file, usable in place
+    of get_characteristic_index().
+    """
+    return get_dataset(open_catalog, json_metadata_path)
+
+
+def _load_code_cache(json_metadata_path, discrete, quantileable, n_bins):
+    """Build the color/size codes of the frame from create_dataframes()."""
+    return build_code_cache(
+        get_dataframes(json_metadata_path), discrete, quantileable, n_bins)
+
+
+def get_code_cache(json_metadata_path, discrete, quantileable, n_bins):
+    """Shared version of vis_helper.build_code_cache() for the frame of
+    vis_helper.create_dataframes()."""
+    return get_dataset(
+        _load_code_cache, json_metadata_path,
+        tuple(discrete), tuple(quantileable), n_bins)
+
+
+def clear():
+    """Drop every loaded dataset."""
+    with _lock:
+        _registry.clear()
+    return
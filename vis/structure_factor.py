@@ -0,0 +1,155 @@
+"""
+=========================
+Structure Factors of RDFs
+=========================
+
+Computes the partial structure factor of every pair of every RDF file,
+
+    S(q) = 1 + 4 pi rho \\int r^2 (g(r) - 1) sin(qr) / (qr) dr
+
+from the stacked arrays of vis.rdf_tensor, so simulated dimers can be
+compared with scattering data. The sin(qr)/(qr) kernel of an r grid and
+q values is computed once and applied to all the files and pairs in a
+single matrix product.
+
+The RDF files do not record the number density rho of the neighbour
+atoms. It is recovered from the running coordination number, which is
+the integral of 4 pi rho r^2 g(r), see infer_density().
+
+The results of each file are cached by the hash of its content.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from vis.utils import CACHE_DIR, read_cached_result, write_cached_result
+from vis.rdf_tensor import data_file_of, layout_groups, stack_rdfs
+
+# Default q values, in inverse angstroms.
+DEFAULT_Q = np.linspace(0.5, 20.0, 196)
+
+# Kernels by (r grid, q values, window), see sq_kernel().
+_kernels = dict()
+
+
+def _trapezoid_weights(x):
+    """Weights w such that sum(w * f) is the trapezoid integral of f."""
+    steps = np.diff(x)
+    weights = np.zeros(len(x))
+    weights[:-1] += steps / 2.0
+    weights[1:] += steps / 2.0
+    return weights
+
+
+def sq_kernel(r, q, window='lorch'):
+    """
+    Return the (n_q x n_r) matrix of sin(qr)/(qr) r^2 dr, with the
+    trapezoid weights of the r grid, so that the integral of S(q) is a
+    product with r^2 (g(r) - 1).
+
+    window='lorch' multiplies the kernel by the Lorch function
+    sin(pi r / r_max) / (pi r / r_max), which damps the ripples due to
+    the end of the r grid, None leaves it out.
+
+    The kernel is computed once per (r, q, window) and then reused.
+    """
+    r = np.ascontiguousarray(r, dtype=np.float64)
+    q = np.ascontiguousarray(q, dtype=np.float64)
+    key = (r.tobytes(), q.tobytes(), window)
+    if key not in _kernels:
+        # np.sinc(x) is sin(pi x) / (pi x), and 1 at 0.
+        kernel = np.sinc(np.outer(q, r) / np.pi) * \
+            (r ** 2 * _trapezoid_weights(r))[np.newaxis, :]
+        if window == 'lorch':
+            kernel = kernel * np.sinc(r / r[-1])[np.newaxis, :]
+        elif window is not None:
+            raise ValueError('Unknown window {}.'.format(window))
+        _kernels[key] = kernel
+    return _kernels[key]
+
+
+def infer_density(r, rdf, rcn):
+    """
+    Return the (n_files x n_pairs) number densities rho (per cubic
+    angstrom) best matching the (n_files x n_r x n_pairs) rdf and rcn
+    arrays, by least squares on the increments of
+
+        RCN(r) = \\int 4 pi rho r^2 g(r) dr
+
+    between consecutive points. Some files fall back to zero where their
+    data stops, so the steps ending below the running maximum of RCN are
+    left out.
+    """
+    running = np.maximum.accumulate(rcn, axis=1)
+    kept = rcn[:, 1:] >= running[:, 1:]
+    increments = np.diff(running, axis=1)
+    # Integral of 4 pi r^2 g(r) over each step, for a unit density.
+    integrand = 4.0 * np.pi * (r ** 2)[np.newaxis, :, np.newaxis] * rdf
+    shells = (integrand[:, 1:] + integrand[:, :-1]) / 2.0 * \
+        np.diff(r)[np.newaxis, :, np.newaxis] * kept
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = (shells * increments).sum(axis=1) / (shells ** 2).sum(axis=1)
+    return np.where(np.isfinite(rho), rho, 0.0)
+
+
+def structure_factor(r, rdf, rcn, q=DEFAULT_Q, window='lorch'):
+    """
+    Return the (n_files x n_q x n_pairs) structure factors and the
+    (n_files x n_pairs) densities of the (n_files x n_r x n_pairs) rdf
+    and rcn arrays on the grid r, see sq_kernel() for the window.
+    """
+    rho = infer_density(r, rdf, rcn)
+    kernel = sq_kernel(r, q, window=window)
+    integral = np.einsum('qr,frp->fqp', kernel, rdf - 1.0)
+    return 1.0 + 4.0 * np.pi * rho[:, np.newaxis, :] * integral, rho
+
+
+def sq_frames(items, q=DEFAULT_Q, window='lorch', cache_dir=CACHE_DIR):
+    """
+    Return the structure factors of RDF handles or frames (as returned
+    by read_rdf()) as one dataframe per file, with the q column and an
+    S_<pair> column per pair, and the attrs of the RDF frame. The
+    inferred densities are in attrs['density'].
+
+    Results are cached per file content. Only the files without cached
+    results are loaded, and those sharing the same pairs and r grid are
+    transformed together in a single call, so every file keeps all of
+    its own pairs whatever it is batched with.
+    """
+    data_files = [data_file_of(item) for item in items]
+    q = np.asarray(q, dtype=np.float64)
+    # 'sq2', as the results cached before infer_density() left out the
+    # truncated steps have wrong densities.
+    result_name = 'sq2-{0}-{1}'.format(
+        hashlib.sha1(q.tobytes()).hexdigest()[:12], window)
+
+    results = [
+        read_cached_result(data_file, result_name, cache_dir=cache_dir)
+        for data_file in data_files
+    ]
+
+    missing = [idx for idx, result in enumerate(results) if result is None]
+    frames = [getattr(items[idx], 'frame', items[idx]) for idx in missing]
+    for group in layout_groups(frames):
+        tensor = stack_rdfs([frames[member] for member in group])
+        sq, rho = structure_factor(
+            tensor.r, tensor.rdf, tensor.rcn, q=q, window=window)
+        for file_idx, member in enumerate(group):
+            columns = dict(q=q)
+            for pair_idx, pair in enumerate(tensor.pairs):
+                columns['S_' + pair] = sq[file_idx, :, pair_idx]
+            result = pd.DataFrame(columns)
+            result.attrs['density'] = dict(zip(tensor.pairs, rho[file_idx]))
+            idx = missing[member]
+            results[idx] = result
+            write_cached_result(
+                data_files[idx], result_name, result, cache_dir=cache_dir)
+
+    for item, data_file, result in zip(items, data_files, results):
+        # Handles carry their characteristics, frames in their attrs.
+        characteristics = getattr(item, 'characteristics', None)
+        if characteristics is None:
+            characteristics = item.attrs.get('characteristics')
+        result.attrs['characteristics'] = characteristics
+        result.attrs['data_file'] = data_file
+    return results
@@ -4,12 +4,231 @@ RDF Reader Utilites
 ===================
 
 This module contains helper functions for importing RDF data by
-reading a metadata file generated by ISA-tools.
+reading a metadata file generated by ISA-tools, as well as readers for
+the PWS vibrational spectra.
 """
 
-import pandas as pd
+import os
+import gzip
 import json
-import collections
+import pickle
+import warnings
+import hashlib
+import functools
+import numpy as np
+import pandas as pd
+from vis.isa_index import CharacteristicIndex
+
+
+# Directory holding the binary copies of parsed RDF files. It can be
+# moved with the PYLUMINATE_CACHE environment variable.
+CACHE_DIR = os.environ.get(
+    'PYLUMINATE_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pyluminate'))
+
+# Most RDF frames kept in memory at once by the RDFHandle objects, the
+# least recently used frame is dropped first.
+MAX_LOADED_FRAMES = 32
+
+# Bytes of text converted at a time by read_fixed_width().
+READ_BLOCK_SIZE = 1 << 24
+
+# Names of the DataFile comments recording the state of a data file when
+# the metadata was written: its size, modification time and content hash.
+SIZE_COMMENT = 'file_size'
+MTIME_COMMENT = 'file_mtime_ns'
+HASH_COMMENT = 'file_sha1'
+
+# sha1 of data files by (absolute path, size, mtime_ns). Filled as files
+# are hashed, and with the hashes recorded in loaded metadata.
+_file_hashes = dict()
+
+
+def _data_file_entries(metadata):
+    """Every DataFile dictionary of a metadata dictionary."""
+    return [
+        data_file
+        for study in metadata['studies']
+        for assay in study['assays']
+        for data_file in assay['dataFiles']
+    ]
+
+
+def metadata_relative_name(path, json_metadata_path):
+    """
+    Name under which a data file is stored in a metadata file: relative
+    to the directory of the metadata file if the data file is inside it,
+    so the two can be moved together, otherwise absolute.
+    """
+    directory = os.path.dirname(os.path.abspath(json_metadata_path))
+    path = os.path.abspath(os.path.join(directory, path))
+    if os.path.commonpath([directory, path]) == directory:
+        return os.path.relpath(path, directory)
+    return path
+
+
+def load_metadata(json_metadata_path):
+    """
+    Load an ISA-JSON metadata file into a dictionary. Files ending with
+    '.gz' are decompressed.
+
+    Relative data file names are taken from the directory of the
+    metadata file, and made absolute in the returned dictionary. Older
+    metadata files, such as data/nmr_metadata.json, hold names relative
+    to the repository root instead: a name that only exists relative to
+    the working directory is taken from there.
+    """
+    if json_metadata_path.endswith('.gz'):
+        with gzip.open(json_metadata_path, 'rt', encoding='utf-8') as f:
+            metadata = json.load(f)
+    else:
+        with open(json_metadata_path, 'r') as f:
+            metadata = json.load(f)
+    directory = os.path.dirname(os.path.abspath(json_metadata_path))
+    for data_file in _data_file_entries(metadata):
+        name = data_file['name']
+        if not os.path.isabs(name):
+            path = os.path.join(directory, name)
+            if not os.path.exists(path) and os.path.exists(name):
+                path = os.path.abspath(name)
+            data_file['name'] = path
+    return metadata
+
+
+def save_metadata(metadata, json_metadata_path):
+    """
+    Write a metadata dictionary to json_metadata_path, gzipped if it ends
+    with '.gz'. The file is written under a temporary name and moved into
+    place, so readers never see a partly written file.
+
+    The data files inside the directory of the metadata file are written
+    with relative names, see metadata_relative_name(). The dictionary
+    itself is left unchanged.
+    """
+    entries = _data_file_entries(metadata)
+    names = [data_file['name'] for data_file in entries]
+    for data_file in entries:
+        data_file['name'] = metadata_relative_name(
+            data_file['name'], json_metadata_path)
+
+    tmp_path = '{}.{}.tmp'.format(json_metadata_path, os.getpid())
+    try:
+        if json_metadata_path.endswith('.gz'):
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(metadata, f, separators=(',', ':'))
+        else:
+            with open(tmp_path, 'w') as f:
+                json.dump(metadata, f, indent=4, separators=(',', ':'))
+    finally:
+        for data_file, name in zip(entries, names):
+            data_file['name'] = name
+    os.replace(tmp_path, json_metadata_path)
+    return
+
+
+def data_file_paths(metadata):
+    """Return the names of every data file listed in a metadata dictionary."""
+    return [data_file['name'] for data_file in _data_file_entries(metadata)]
+
+
+def recorded_fingerprint(data_file):
+    """
+    Return the (size, mtime_ns, sha1) recorded in the comments of a data
+    file entry of the metadata, or None if they are not all there.
+    """
+    comments = {
+        comment.get('name'): comment.get('value')
+        for comment in data_file.get('comments', [])
+    }
+    try:
+        return (int(comments[SIZE_COMMENT]), int(comments[MTIME_COMMENT]),
+                comments[HASH_COMMENT])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def recorded_fingerprints(metadata):
+    """
+    Return a dictionary of the absolute data file names of the metadata
+    to their recorded (size, mtime_ns, sha1), see recorded_fingerprint().
+    The data files without a recorded fingerprint are left out.
+    """
+    fingerprints = dict()
+    for data_file in _data_file_entries(metadata):
+        fingerprint = recorded_fingerprint(data_file)
+        if fingerprint is not None:
+            fingerprints[os.path.abspath(data_file['name'])] = fingerprint
+    return fingerprints
+
+
+def remember_file_hashes(metadata):
+    """
+    Record the content hashes found in the data file comments of a
+    loaded metadata dictionary, so file_hash() does not read these files
+    again in this process. A hash is only used while the file keeps the
+    recorded size and modification time.
+    """
+    for path, (size, mtime_ns, sha1) in recorded_fingerprints(
+            metadata).items():
+        _file_hashes[(path, size, mtime_ns)] = sha1
+    return
+
+
+def _parse_numbers(path, text):
+    """Parse a block of whitespace separated numbers of a text file."""
+    # NumPy only warns when it stops at text it cannot parse.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=np.float64, sep=' ')
+        except (DeprecationWarning, ValueError):
+            raise ValueError('{} has non numeric values.'.format(path))
+
+
+def read_fixed_width(path, block_size=READ_BLOCK_SIZE):
+    """
+    Parse a whitespace separated numeric text file with a leading '#'
+    header line, such as the RDF and PWS files written by Maxime's
+    Fortran codes. Returns (column names, rows x columns float array).
+
+    The body is read in blocks of about block_size bytes, cut at line
+    ends, and each block is converted by NumPy in one call, which avoids
+    the per-field work of the regex based pandas parser. Only one block
+    of text is held in memory at a time. The number of columns is taken
+    from the first body line, some PWS files have more values per line
+    than header names; only the named columns are returned.
+
+    A ValueError is raised if the body is not entirely numeric or does
+    not have the same number of values on every line.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('{} is empty.'.format(path))
+        columns = f.readline().decode('utf-8').lstrip('#').split()
+
+        first_line = f.readline()
+        n_values = len(first_line.split())
+        blocks = [_parse_numbers(path, first_line)]
+        rest = b''
+        while True:
+            text = f.read(block_size)
+            if not text:
+                break
+            text = rest + text
+            cut = text.rfind(b'\n') + 1
+            rest = text[cut:]
+            blocks.append(_parse_numbers(path, text[:cut]))
+        blocks.append(_parse_numbers(path, rest))
+
+    if n_values == 0:
+        return columns, np.empty((0, len(columns)))
+    values = np.concatenate(blocks)
+    if values.size % n_values:
+        raise ValueError(
+            '{} does not have {} values on every line.'.format(
+                path, n_values))
+
+    return columns, values.reshape(-1, n_values)[:, :len(columns)]
 
 
 def create_pandas_df(path):
@@ -17,66 +236,352 @@ def create_pandas_df(path):
     Create a pandas dataframe from a given path. This function is specific
     for the type of RDF data produced by Maxime (and David?).
 
-    It reads the csv, and removes the erroneously created '#' column.
-    Although it may be better to use some string manipulation to remove this
-    character prior to processing with pandas read_csv function.
+    The column names are read from the '#' header line and the values
+    parsed by read_fixed_width().
+    """
+    columns, values = read_fixed_width(path)
+    return pd.DataFrame(values, columns=columns)
+
+
+def read_pws_header(path):
+    """
+    Return the column names of a PWS vibrational spectrum file. These are
+    found in the leading comment line, e.g. '#   wavenb   Al   Ob'.
+    """
+    with open(path, 'r') as f:
+        header = f.readline()
+    return header.lstrip('#').split()
+
+
+def _block_mean(values, size):
+    """
+    Average consecutive blocks of `size` rows of a 2D array. A trailing
+    partial block is averaged over the rows it has.
+    """
+    full = len(values) - len(values) % size
+    reduced = values[:full].reshape(-1, size, values.shape[1]).mean(axis=1)
+    if full < len(values):
+        reduced = np.vstack([reduced, values[full:].mean(axis=0)])
+    return reduced
+
+
+def iter_pws(path, chunksize=10000, downsample=1):
+    """
+    Stream a PWS vibrational spectrum file as (rows x columns) float
+    arrays of at most `chunksize` rows. The column order is given by
+    read_pws_header().
+
+    Only the named columns are read, some files carry extra unnamed
+    columns of zeros after them. The values are written by Fortran in
+    E-notation, which the float parser handles directly.
+
+    If downsample is larger than 1 every block of that many rows is
+    averaged into one row as the file is read. The chunk size is rounded
+    down to a multiple of downsample so no block spans two chunks.
+
+    Only one chunk is held in memory at a time, so files larger than the
+    available memory can be reduced or plotted.
     """
-    # Read the csv file
-    df = pd.read_csv(
-        filepath_or_buffer=path,
-        index_col=False,
-        sep='\s+'  # Split by whitespace
+    columns = read_pws_header(path)
+    chunksize = max(downsample, chunksize - chunksize % downsample)
+
+    reader = pd.read_csv(
+        path,
+        sep=r'\s+',  # Split by whitespace
+        header=None,
+        comment='#',
+        usecols=range(len(columns)),
+        dtype=np.float64,
+        chunksize=chunksize,
     )
 
-    # Move the columns to deal with the leading hashtag
-    df_mod = df[df.columns[:-1]]
-    df_mod.columns = df.columns[1:]
+    for chunk in reader:
+        values = chunk.values
+        if downsample > 1:
+            values = _block_mean(values, downsample)
+        yield values
+
+
+def read_pws(path, downsample=1):
+    """
+    Read a whole PWS vibrational spectrum file into a pandas dataframe,
+    optionally downsampled (see iter_pws()). The file is parsed by
+    read_fixed_width(), use iter_pws() to stream files larger than
+    memory.
+    """
+    columns, values = read_fixed_width(path)
+    if downsample > 1 and len(values):
+        values = _block_mean(values, downsample)
+    return pd.DataFrame(values, columns=columns)
 
-    return df_mod
 
+def read_parquet_dataset(path, columns=None, studies=None, assays=None,
+                         filters=None):
+    """
+    Read a Parquet dataset written by vis.export.export_parquet().
 
-def read_rdf(json_metadata_path, char_types):
-    """Construct dataframes with the needed metadata attached.
-    Returns a list of pandas dataframe objects.
+    Only the listed columns are read (all of them if None). The studies
+    argument restricts the read to those study identifiers, e.g.
+    studies=['maxime_rdf_study'], assays to those assay partitions, e.g.
+    assays=['assay_0'], and filters adds row predicates in the pyarrow
+    form [('column', 'op', value), ...]. All of these are pushed down to
+    pyarrow, which skips the partitions and row groups that cannot match
+    instead of loading and filtering them.
+
+    This requires the optional pyarrow package.
+    """
+    predicates = list(filters or [])
+    if studies is not None:
+        predicates.append(('study', 'in', list(studies)))
+    if assays is not None:
+        predicates.append(('assay', 'in', list(assays)))
+
+    return pd.read_parquet(
+        path,
+        engine='pyarrow',
+        columns=columns,
+        filters=predicates or None,
+    )
+
+
+def _cache_key(path):
+    """
+    Build the cache key for a data file from the hash of its content.
+    Any change to the content gives a new key, so stale cache entries are
+    never read, while a touched or moved file still uses its entry.
+    """
+    return 'rdf-' + file_hash(path)
+
+
+def load_cached_df(path, cache_dir=CACHE_DIR):
+    """
+    Return the dataframe of an RDF file, going through an on-disk cache.
+
+    The first load parses the text with create_pandas_df() and stores the
+    values as a (columns x rows) float array in a .npy file, with the
+    column names in a .json file beside it. Later loads memory-map the
+    .npy file instead of parsing the text again, the frame is a single
+    block over the mapped array, so its values are only read from disk
+    as they are used. The mapping is copy-on-write: the frame can be
+    modified, but the changes never reach the cache file.
+
+    If cache_dir is None the cache is skipped entirely.
+    """
+    if cache_dir is None:
+        return create_pandas_df(path)
+
+    key = _cache_key(path)
+    array_path = os.path.join(cache_dir, key + '.npy')
+    columns_path = os.path.join(cache_dir, key + '.json')
+
+    # Cache hit, both files are written before the entry is used.
+    if os.path.exists(array_path) and os.path.exists(columns_path):
+        with open(columns_path, 'r') as f:
+            columns = json.load(f)
+        values = np.load(array_path, mmap_mode='c')
+        # The transpose is a view, which pandas keeps as its block.
+        return pd.DataFrame(values.T, columns=columns, copy=False)
+
+    # Cache miss, parse the text and write the new entry.
+    df = create_pandas_df(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to temporary names first, then move them into place so a
+        # concurrent reader never sees a half written file.
+        tmp_suffix = '.{}.tmp'.format(os.getpid())
+        with open(array_path + tmp_suffix, 'wb') as f:
+            np.save(f, np.ascontiguousarray(df.values.T, dtype=np.float64))
+        with open(columns_path + tmp_suffix, 'w') as f:
+            json.dump(list(df.columns), f)
+        os.replace(array_path + tmp_suffix, array_path)
+        os.replace(columns_path + tmp_suffix, columns_path)
+    except OSError:
+        # The cache is only an optimization, a read-only or full disk
+        # should not stop the data from loading.
+        pass
+
+    return df
+
+
+def _hash_content(path):
+    """sha1 hex digest of the content of a file."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def file_fingerprint(path, rehash=False, recorded=None):
+    """
+    Return the (size, mtime_ns, sha1) of a file. The content is only
+    read when the size or modification time are not those of a known
+    hash, or if rehash is True. The known hashes are those computed by
+    this process, those of remember_file_hashes() and the one of
+    recorded, a (size, mtime_ns, sha1) recorded earlier for the file.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    sha1 = None
+    if not rehash:
+        sha1 = _file_hashes.get(key)
+        if recorded is not None and \
+                tuple(recorded[:2]) == (stat.st_size, stat.st_mtime_ns):
+            sha1 = recorded[2]
+    if sha1 is None:
+        sha1 = _hash_content(path)
+    _file_hashes[key] = sha1
+    return stat.st_size, stat.st_mtime_ns, sha1
 
-    For each assay generate a list of the characteristic category values.
 
-    For each data file in that assay, create a new column and write all
-    found category values to that column.
+def file_hash(path):
+    """
+    Return the sha1 hex digest of the content of a file, see
+    file_fingerprint().
+
+    The hash does not depend on where the file is nor when it was last
+    touched, so results cached with it survive copies and moves.
+    """
+    return file_fingerprint(path)[2]
+
+
+def _result_path(path, name, cache_dir):
+    """Path of the cached result name of a data file."""
+    return os.path.join(
+        cache_dir, '{0}-{1}.pkl'.format(name, file_hash(path)))
+
+
+def read_cached_result(path, name, cache_dir=CACHE_DIR):
+    """
+    Return the result name computed from the content of a data file, as
+    stored by write_cached_result(), or None if there is none.
+    """
+    if cache_dir is None:
+        return None
+    try:
+        with open(_result_path(path, name, cache_dir), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def write_cached_result(path, name, value, cache_dir=CACHE_DIR):
+    """
+    Store value as the result name computed from the content of a data
+    file. name should include every parameter the value depends on.
+    """
+    if cache_dir is None:
+        return
+    result_path = _result_path(path, name, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Move into place once written, as in load_cached_df.
+        tmp_path = result_path + '.{}.tmp'.format(os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, result_path)
+    except OSError:
+        pass
+    return
+
+
+@functools.lru_cache(maxsize=MAX_LOADED_FRAMES)
+def _load_rdf_frame(path, size, mtime_ns, cache_dir):
+    """
+    Memoized load_cached_df(). The size and modification time of the file
+    are only part of the memo key, so that an edited file is reloaded.
+    """
+    return load_cached_df(path, cache_dir=cache_dir)
+
+
+class RDFHandle(object):
+    """
+    A lightweight reference to an RDF data file and the characteristics
+    of its assay, as returned by read_rdf().
+
+    The dataframe is only read when the frame attribute is first used.
+    At most MAX_LOADED_FRAMES frames are kept loaded across all handles,
+    so memory follows what is being plotted rather than the number of
+    files in the investigation.
+    """
+
+    __slots__ = ('data_file', 'characteristics', 'cache_dir')
+
+    def __init__(self, data_file, characteristics, cache_dir=CACHE_DIR):
+        self.data_file = data_file
+        self.characteristics = characteristics
+        self.cache_dir = cache_dir
+
+    @property
+    def frame(self):
+        """
+        The dataframe of the data file, loaded on demand, with its
+        characteristics and data file in DataFrame.attrs.
+        """
+        stat = os.stat(self.data_file)
+        frame = _load_rdf_frame(
+            self.data_file, stat.st_size, stat.st_mtime_ns, self.cache_dir)
+        # The loaded frame is shared, attach the attributes to a shallow
+        # copy, which shares the data without copying it.
+        frame = frame.copy(deep=False)
+        frame.attrs['characteristics'] = self.characteristics
+        frame.attrs['data_file'] = self.data_file
+        return frame
+
+    def __getitem__(self, key):
+        """Shortcut for handle.frame[key]."""
+        return self.frame[key]
+
+    def __repr__(self):
+        return 'RDFHandle({!r})'.format(self.data_file)
+
+
+def read_rdf(json_metadata_path, char_types, cache_dir=CACHE_DIR,
+             index=None, lazy=True):
+    """Construct dataframes with the needed metadata attached.
+    Returns a list of RDFHandle objects, which only read their data file
+    when its frame is used. With lazy=False the files are read at once
+    and a list of pandas dataframe objects is returned instead.
+
+    The assays having a characteristic category of one of char_types are
+    looked up in a CharacteristicIndex of the metadata (built here unless
+    one is passed as index, which may also be a catalog.MetadataCatalog).
+    Each data file of these assays is loaded and given the
+    Characteristics record of its assay, as the characteristics attribute
+    of a handle or frame.attrs['characteristics'] of a frame.
 
     char_types should be a list.
+
+    Parsed files are cached under cache_dir (see load_cached_df), pass
+    cache_dir=None to always parse the text files.
     """
 
-    # Open the file.
-    with open(json_metadata_path, 'r') as f:
-        metadata = json.load(f)
+    # Build the index from the metadata file, if not given. The hashes
+    # recorded in it spare hashing the files for the cache keys.
+    if index is None:
+        metadata = load_metadata(json_metadata_path)
+        remember_file_hashes(metadata)
+        index = CharacteristicIndex(metadata)
 
     # Create an empty list to append the paths to.
     data_frame_list = []
 
-    # Iterate through the studies.
-    for studies in metadata['studies']:
-        for assays in studies['assays']:
-            # Create the empty assay characteristic list.
-            # assay_char_l = list()
-            assay_char_dict = collections.defaultdict(list)
-            # Iterate through the characteristic_categories assigned.
-            for char in assays['characteristicCategories']:
-                # append the termSource value to the assay_char list.
-                # A colllections defaultdict is used to ensure all entries
-                # are lists, so that append() can be used.
-                assay_char_dict[
-                    char['characteristicType']['termSource']].append(
-                        char['characteristicType']['annotationValue'])
-            # Ensure that the desired values are in this new dictioaries keys.
-            # If so, create a new data frame.
-            if set(char_types).intersection(assay_char_dict.keys()):
-                for data_file in assays['dataFiles']:
-                    new_data_frame = create_pandas_df(data_file['name'])
-                    # append the dict of characteristics as an attribute to
-                    # the pandas dataframe object. This attribute will be
-                    # easily lost upon dataframe manipulations.
-                    new_data_frame.characteristics = assay_char_dict
-                    data_frame_list.append(new_data_frame)
+    # Only the assays with one of the desired characteristic types.
+    for assay_id in index.query(term_sources=char_types):
+        assay_char_dict = index.characteristics(assay_id)
+        for data_file in index.data_files([assay_id]):
+            if lazy:
+                # Only record the file, it is read when first used.
+                data_frame_list.append(RDFHandle(
+                    data_file, assay_char_dict, cache_dir=cache_dir))
+            else:
+                new_data_frame = load_cached_df(
+                    data_file, cache_dir=cache_dir)
+                # Record the characteristics and the data file name in the
+                # frame attrs, which pandas carries through slicing, copies
+                # and concatenation of frames with the same attrs.
+                new_data_frame.attrs['characteristics'] = assay_char_dict
+                new_data_frame.attrs['data_file'] = data_file
+                data_frame_list.append(new_data_frame)
 
     return data_frame_list
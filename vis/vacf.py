@@ -0,0 +1,262 @@
+"""
+==================
+VACF Power Spectra
+==================
+
+Computes vibrational power spectra from velocity trajectories, the way
+the PWS files of Maxime's simulations are obtained: the velocity
+autocorrelation function (VACF) of each group of atoms is windowed and
+Fourier transformed, and written in the PWS layout
+
+    #   wavenb       Al                    Ob                    Oh
+
+The autocorrelation is computed by FFT over blocks of frames, keeping
+only the last max_lag frames of the previous block, so trajectories of
+millions of steps are streamed rather than loaded. All the velocity
+components of a block are transformed together.
+
+Velocity trajectories are read as XYZ files whose three values per atom
+are the velocities, see vis.rdf_engine.read_xyz_frames().
+
+Run from the repository root:
+
+    python -m vis.vacf velocities.xyz out.PWS --dt 1.0 --max-lag 4000
+"""
+
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from vis.rdf_engine import read_xyz_frames
+
+# Speed of light, in cm/s, to turn frequencies into wavenumbers.
+SPEED_OF_LIGHT = 2.99792458e10
+
+# Highest wavenumber written, as in the PWS files, in cm-1.
+DEFAULT_WN_MAX = 4500.0
+
+# Velocity components correlated at once, this bounds the memory of the
+# FFT of a block to about (block + max_lag) x chunk complex values.
+SERIES_CHUNK = 256
+
+
+def _blocks(frames, block_size):
+    """
+    Group the (symbols, velocities, box) frames into (symbols, array of
+    block_size x atoms x 3) blocks, the last one possibly shorter.
+    """
+    symbols = None
+    block = list()
+    for frame_symbols, velocities, _ in frames:
+        if symbols is None:
+            symbols = frame_symbols
+        block.append(velocities)
+        if len(block) == block_size:
+            yield symbols, np.stack(block)
+            block = list()
+    if block:
+        yield symbols, np.stack(block)
+
+
+def _fft_size(n):
+    """Smallest power of two of at least n."""
+    return 1 << int(np.ceil(np.log2(max(n, 1))))
+
+
+def _group_weights(symbols, groups):
+    """
+    Return the group names and the (atoms x 3, groups) matrix averaging
+    the correlations of the velocity components of each group.
+
+    groups maps a name to the atom indices or boolean mask of the group,
+    by default one group per atom symbol, in order of appearance.
+    """
+    if groups is None:
+        # Plain str names, the symbols are NumPy strings.
+        names = [str(name) for name in dict.fromkeys(symbols)]
+        groups = {name: symbols == name for name in names}
+    names = list(groups)
+
+    weights = np.zeros((len(symbols) * 3, len(names)))
+    for col, name in enumerate(names):
+        atoms = np.zeros(len(symbols), dtype=bool)
+        atoms[groups[name]] = True
+        if not atoms.any():
+            raise ValueError('Group {} has no atoms.'.format(name))
+        series = np.repeat(atoms, 3)
+        weights[series, col] = 1.0 / series.sum()
+    return names, weights
+
+
+def compute_vacf(frames, max_lag, groups=None, block_size=None):
+    """
+    Compute the VACF of each group of atoms over the frames of a velocity
+    trajectory (an XYZ path, or an iterable of (symbols, velocities, box)
+    as from read_xyz_frames()), for lags of 0 to max_lag - 1 frames:
+
+        C(lag) = < v(t) . v(t + lag) >
+
+    averaged over the atoms of the group, their three components and all
+    the time origins t. See _group_weights() for the groups.
+
+    The frames are read by blocks of block_size frames (4 max_lag by
+    default), each block being correlated with itself and the last
+    max_lag - 1 frames of the previous one.
+
+    Returns a dataframe with the lag (in frames) and one column per
+    group.
+    """
+    if isinstance(frames, str):
+        frames = read_xyz_frames(frames)
+    block_size = block_size or 4 * max_lag
+
+    names = weights = sums = None
+    counts = np.zeros(max_lag)
+    lags = np.arange(max_lag)
+    tail = None
+    n_frames = 0
+
+    for symbols, block in _blocks(frames, block_size):
+        if weights is None:
+            names, weights = _group_weights(symbols, groups)
+            sums = np.zeros((max_lag, len(names)))
+        values = block.reshape(len(block), -1)
+
+        # The previous frames pair with the start of this block.
+        if tail is None:
+            segment = values
+            offset = 0
+        else:
+            segment = np.vstack([tail, values])
+            offset = len(tail)
+        n_fft = _fft_size(len(segment) + max_lag)
+
+        for start in range(0, values.shape[1], SERIES_CHUNK):
+            stop = start + SERIES_CHUNK
+            earlier = segment[:, start:stop]
+            later = earlier.copy()
+            later[:offset] = 0.0
+            # sum_t earlier(t) later(t + lag), later only in this block.
+            spectrum = np.conj(np.fft.rfft(earlier, n_fft, axis=0)) * \
+                np.fft.rfft(later, n_fft, axis=0)
+            correlation = np.fft.irfft(spectrum, n_fft, axis=0)[:max_lag]
+            sums += correlation.dot(weights[start:stop])
+
+        # Number of time origins of each lag ending in this block.
+        block_end = n_frames + len(values)
+        counts += np.clip(block_end - np.maximum(n_frames, lags), 0, None)
+        n_frames = block_end
+        tail = segment[-(max_lag - 1):] if max_lag > 1 else None
+
+    if n_frames == 0:
+        raise ValueError('No frames in the trajectory.')
+    if n_frames < max_lag:
+        logging.warning(
+            'Only %d frames, lags past them are NaN.', n_frames)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vacf = sums / counts[:, np.newaxis]
+    columns = dict(lag=lags)
+    for col, name in enumerate(names):
+        columns[name] = vacf[:, col]
+    return pd.DataFrame(columns)
+
+
+def power_spectrum(vacf, dt, window='hann', wn_max=DEFAULT_WN_MAX,
+                   n_points=None, normalize=False):
+    """
+    Return the power spectrum of every group of a VACF dataframe (as
+    from compute_vacf()), as a PWS dataframe of the wavenb column (cm-1)
+    and one column per group.
+
+    dt is the time between frames in femtoseconds. The VACF is tapered
+    by the decaying half of a Hann window (window='hann') or used as is
+    (window=None), then cosine transformed. Wavenumbers up to wn_max are
+    kept, on the grid of the transform, or interpolated on n_points
+    evenly spaced wavenumbers from 0 to wn_max if given (the PWS files
+    have 8000). With normalize=True every column has unit area.
+    """
+    names = [name for name in vacf.columns if name != 'lag']
+    values = vacf[names].values
+    values = np.where(np.isfinite(values), values, 0.0)
+    n_lags = len(values)
+
+    if window == 'hann':
+        values = values * (
+            0.5 * (1.0 + np.cos(np.pi * np.arange(n_lags) / n_lags))
+        )[:, np.newaxis]
+    elif window is not None:
+        raise ValueError('Unknown window {}.'.format(window))
+
+    # Even extension, the transform of a symmetric function is real.
+    symmetric = np.vstack([values, values[:0:-1]])
+    spectrum = np.fft.rfft(symmetric, axis=0).real * dt
+    wavenb = np.fft.rfftfreq(len(symmetric), d=dt * 1e-15) / SPEED_OF_LIGHT
+
+    keep = wavenb <= wn_max
+    wavenb, spectrum = wavenb[keep], spectrum[keep]
+    if n_points is not None:
+        grid = np.linspace(0.0, wn_max, n_points)
+        spectrum = np.column_stack([
+            np.interp(grid, wavenb, column) for column in spectrum.T])
+        wavenb = grid
+
+    if normalize:
+        # The wavenumbers are evenly spaced.
+        area = spectrum.sum(axis=0) * (wavenb[1] - wavenb[0])
+        spectrum = spectrum / np.where(area != 0, area, 1.0)
+
+    columns = dict(wavenb=wavenb)
+    for col, name in enumerate(names):
+        columns[str(name)] = spectrum[:, col]
+    return pd.DataFrame(columns)
+
+
+def write_pws(frame, path):
+    """
+    Write a PWS dataframe (wavenb and spectrum columns) in the layout of
+    the PWS files, readable by utils.read_pws().
+    """
+    names = list(frame.columns)
+    header = '   {:<10}'.format(names[0]) + ''.join(
+        '{:<22}'.format(name) for name in names[1:])
+    np.savetxt(
+        path, frame.values,
+        fmt=['%10.4f'] + ['%22.9E'] * (len(names) - 1),
+        header=header.rstrip(), comments='#')
+    return
+
+
+def main():
+    """Command line entry point, see the module documentation."""
+    parser = argparse.ArgumentParser(
+        description='Compute a PWS power spectrum file from a velocity '
+                    'trajectory.')
+    parser.add_argument('trajectory', help='XYZ file of the velocities')
+    parser.add_argument('output', help='PWS file to write')
+    parser.add_argument(
+        '--dt', type=float, required=True,
+        help='time between frames, in femtoseconds')
+    parser.add_argument(
+        '--max-lag', type=int, required=True,
+        help='longest correlation time, in frames')
+    parser.add_argument('--wn-max', type=float, default=DEFAULT_WN_MAX)
+    parser.add_argument(
+        '--points', type=int, help='number of wavenumbers written')
+    parser.add_argument(
+        '--no-window', action='store_true', help='do not taper the VACF')
+    parser.add_argument(
+        '--normalize', action='store_true',
+        help='give every spectrum a unit area')
+    args = parser.parse_args()
+
+    vacf = compute_vacf(args.trajectory, args.max_lag)
+    spectrum = power_spectrum(
+        vacf, args.dt, window=None if args.no_window else 'hann',
+        wn_max=args.wn_max, n_points=args.points, normalize=args.normalize)
+    write_pws(spectrum, args.output)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -9,33 +9,180 @@ A collection of helper scripts for plotting aluminate data.
 """
 
 import os
-import json
 import webbrowser
-# import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 # import bokeh as bk
 # import holoviews as hv
+from vis.utils import load_metadata
 
+# The data file types (ISA DataFile labels) holding csv tables.
+CSV_FILE_TYPES = ('Plot-csv-extract',)
 
-def create_dataframes(json_metadata_path):
-    """Construct dataframes with the needed metadata attached."""
+# Columns holding text, every other column is read as a float.
+TEXT_COLUMNS = ('counter_ion', 'doi')
+
+# Columns holding a few distinct values repeated on every row.
+CATEGORICAL_COLUMNS = ('counter_ion', 'doi')
+
+
+def read_data_file(path, doi):
+    """
+    Read one csv data file and add its doi column.
+
+    Every numeric column is read as float64 and the text columns as
+    strings, so that the frames of all files can be concatenated without
+    any dtype promotion.
+    """
+    dataframe = pd.read_csv(path)
+    for column in dataframe.columns:
+        if column not in TEXT_COLUMNS:
+            dataframe[column] = dataframe[column].astype(np.float64)
+    dataframe['doi'] = doi
+    return dataframe
+
+
+def downcast_column(series, decimals=None):
+    """
+    Return a numeric series stored in the smallest safe dtype.
+
+    Whole numbers without missing values become the smallest integer type
+    that holds them. Other columns become float32 only if converting the
+    values back gives the same float64 values, exactly, or once rounded
+    to `decimals` decimals if given (the precision the values were
+    recorded with). Otherwise they are kept as they are.
+
+    Note that float32 values rounded to their decimals still print with
+    their round-off (535.1 as 535.099976), so decimals should only be
+    given for columns that are not shown as numbers.
+    """
+    values = series.values
+    if series.isnull().any() or not np.array_equal(values, np.round(values)):
+        single = values.astype(np.float32)
+        restored = single.astype(np.float64)
+        if decimals is not None:
+            restored = np.round(restored, decimals)
+            values = np.round(values, decimals)
+        same = (restored == values) | (np.isnan(restored) & np.isnan(values))
+        if same.all():
+            return pd.Series(single, index=series.index, name=series.name)
+        return series
+    return pd.to_numeric(series, downcast='integer')
+
+
+def optimize_dtypes(dataframe, categorical=CATEGORICAL_COLUMNS,
+                    float_decimals=None):
+    """
+    Return a copy of the dataframe using less memory: the categorical
+    columns become pandas Categoricals and every numeric column is
+    downcast with downcast_column().
+
+    Float columns only become float32 when that is exact, unless they are
+    listed in the float_decimals dictionary of column to decimals, which
+    opts them in to float32 within that precision.
+    """
+    float_decimals = float_decimals or dict()
+    columns = dict()
+    for column in dataframe.columns:
+        series = dataframe[column]
+        if column in categorical:
+            columns[column] = series.astype('category')
+        elif pd.api.types.is_numeric_dtype(series):
+            columns[column] = downcast_column(
+                series, decimals=float_decimals.get(column))
+        else:
+            columns[column] = series
+    return pd.DataFrame(columns, index=dataframe.index)
+
+
+def create_dataframes(json_metadata_path, max_workers=None,
+                      file_types=CSV_FILE_TYPES, optimize=True):
+    """
+    Construct a single dataframe from every csv data file listed in the
+    metadata, with the doi of its study attached as a column.
+
+    The files are read concurrently by a pool of max_workers threads
+    (the ThreadPoolExecutor default if None). Only data files whose type
+    is in file_types are read, the simulation outputs are not csv files.
+
+    If optimize is True the text columns are returned as Categoricals and
+    the numeric columns downcast, see optimize_dtypes().
+    """
     # Read the metadata json file constructed by ISASetup.py
-    with open(json_metadata_path, 'r') as md_file:
-        metadata = json.load(md_file)
-    # create a dataframes for each csv found
-    dataframe_list = []
+    metadata = load_metadata(json_metadata_path)
+
+    # List the files to read along with the doi of their study.
+    jobs = []
     for study in metadata['studies']:
-        # Store the doi/link
+        # Store the doi/link, studies without a publication have none.
+        doi = None
         for publication in study['publications']:
             doi = publication['doi']
             # This is buggy, just picks the last one.
             # They should all be the same the way I implemented it.
         for assay in study['assays']:
-            for filename in assay['dataFiles']:
-                dataframe = pd.read_csv(filename['name'])
-                dataframe['doi'] = doi
-                dataframe_list.append(dataframe)
-    return pd.concat(dataframe_list)
+            for data_file in assay['dataFiles']:
+                if data_file['type'] in file_types:
+                    jobs.append((data_file['name'], doi))
+
+    # pandas releases the GIL while parsing, so threads read in parallel.
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        dataframe_list = list(pool.map(lambda job: read_data_file(*job), jobs))
+
+    dataframe = pd.concat(dataframe_list, ignore_index=True)
+    if optimize:
+        dataframe = optimize_dtypes(dataframe)
+
+    return dataframe
+
+
+def build_code_cache(dataframe, discrete, quantileable, n_bins):
+    """
+    Compute the integer codes used to map columns onto colors and sizes.
+
+    Discrete columns are factorized, quantileable columns are split into
+    n_bins quantile bins. Returns a dictionary of column name to code
+    array, computed once so that changing the mapped column is only an
+    array lookup (see palette_lookup). Missing values get the code -1.
+    """
+    codes = dict()
+    for column in discrete:
+        codes[column] = dataframe[column].factorize()[0]
+    for column in quantileable:
+        codes[column] = pd.qcut(
+            dataframe[column].values, n_bins, duplicates='drop').codes
+    return codes
+
+
+def palette_lookup(codes, palette):
+    """
+    Vectorized version of [palette[code] for code in codes]. A code of
+    -1 picks the last palette entry, as list indexing would.
+    """
+    return np.asarray(palette)[codes]
+
+
+def bin_indices(values, edges):
+    """
+    Return the histogram bin index of each value for the given bin edges,
+    following np.histogram: bins are half open except the last, which
+    includes its right edge. Values outside the edges and NaN, which
+    np.histogram leaves out, get the index n_bins, one past the last bin.
+
+    With these indices,
+
+        np.bincount(indices[subset], minlength=n_bins + 1)[:n_bins]
+
+    gives the histogram of any subset without searching the edges again.
+    """
+    values = np.asarray(values)
+    n_bins = len(edges) - 1
+    indices = np.searchsorted(edges, values, side='right') - 1
+    # The right edge belongs to the last bin.
+    indices[values == edges[-1]] = n_bins - 1
+    indices[(indices < 0) | (indices >= n_bins) | np.isnan(values)] = n_bins
+    return indices
 
 
 def show_local_html(filename):